@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+# *_* coding: utf-8 *_*
+
+"""
+Memory-mapped access to the samples of WAV files
+
+The header of a WAV file is parsed once, and the sample data are mapped into
+memory, so that the portion of the recording needed for a vowel can be handed
+to the formant analysis without cutting it out into a separate file.
+"""
+
+__version__ = "2.0.0"
+__author__ = ("Rosenfelder, Ingrid; " +  # Only code writers
+              "Fruehwald, Josef; " +
+              "Evanini, Keelan; " +
+              "Seyfarth, Scott; " +
+              "Gorman, Kyle; " +
+              "Prichard, Hilary; " +
+              "Yuan, Jiahong; " +
+              "Brickhouse, Christian")
+__email__ = "brickhouse@stanford.edu"
+# should be the person who will fix bugs and make improvements
+__maintainer__ = "Christian Brickhouse"
+__copyright__ = "Copyright 2020, FAVE contributors"
+__license__ = "GPLv3"
+__status__ = "Development"  # Prototype, Development or Production
+# also include contributors that wrote no code
+__credits__ = ["Brandon Waldon"]
+
+# --------------------------------------------------------------------------------
+
+# Import built-in modules first
+# followed by third-party modules
+# followed by any changes to the path
+# your own modules.
+
+import struct
+
+import numpy as np
+
+WAVE_FORMAT_PCM = 0x0001
+WAVE_FORMAT_IEEE_FLOAT = 0x0003
+WAVE_FORMAT_EXTENSIBLE = 0xFFFE
+
+
+class WavFile:
+
+    """represents a (PCM or floating point) WAV file with memory-mapped sample data"""
+
+    def __init__(self, filename):
+        self.filename = filename
+        self.formatTag = None  # WAVE_FORMAT_PCM or WAVE_FORMAT_IEEE_FLOAT
+        self.nChannels = None
+        self.sampleRate = None
+        self.sampleWidth = None  # bytes per sample (in one channel)
+        self.nFrames = None  # number of samples (in each channel)
+        self.dataOffset = None  # position of the sample data in the file
+        self.data = None  # memory-mapped sample data
+        self.read_header()
+        self.data = self.map()
+
+    def __len__(self):
+        return self.nFrames
+
+    def __getstate__(self):
+        # the memory map is not pickled (e.g. when the object is sent to a worker process),
+        # but set up again when the object is unpickled
+        state = self.__dict__.copy()
+        state['data'] = None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.data = self.map()
+
+    def duration(self):
+        """returns the duration of the sound file (in seconds)"""
+        return self.nFrames / self.sampleRate
+
+    def read_header(self):
+        """reads the format and the position of the sample data from the RIFF header (ValueError if it is not a valid WAV file)"""
+        f = open(self.filename, 'rb')
+        header = f.read(12)
+        if len(header) < 12:
+            f.close()
+            raise ValueError("truncated WAV header in %s" % self.filename)
+        riff, size, wave = struct.unpack('<4sI4s', header)
+        if riff != b'RIFF' or wave != b'WAVE':
+            f.close()
+            raise ValueError("%s is not a WAV file" % self.filename)
+        dataSize = None
+        while True:
+            header = f.read(8)
+            if len(header) < 8:
+                break
+            chunkId, chunkSize = struct.unpack('<4sI', header)
+            if chunkId == b'fmt ':
+                fmt = f.read(chunkSize)
+                # (the extensible format has the sub-format GUID after the 16 bytes of the basic format)
+                if len(fmt) < 16 or (struct.unpack('<H', fmt[:2])[0] == WAVE_FORMAT_EXTENSIBLE and len(fmt) < 26):
+                    f.close()
+                    raise ValueError("truncated WAV header in %s:  incomplete format chunk" % self.filename)
+                self.formatTag, self.nChannels, self.sampleRate = struct.unpack('<HHI', fmt[:8])
+                bitsPerSample = struct.unpack('<H', fmt[14:16])[0]
+                if self.formatTag == WAVE_FORMAT_EXTENSIBLE:
+                    # the actual format is given by the first two bytes of the sub-format GUID
+                    self.formatTag = struct.unpack('<H', fmt[24:26])[0]
+                self.sampleWidth = (bitsPerSample + 7) // 8
+            elif chunkId == b'data':
+                self.dataOffset = f.tell()
+                dataSize = chunkSize
+                break
+            else:
+                f.seek(chunkSize, 1)
+            # chunks are padded to an even number of bytes
+            if chunkSize % 2:
+                f.seek(1, 1)
+        fileSize = f.seek(0, 2)
+        f.close()
+
+        if self.formatTag is None or self.dataOffset is None:
+            raise ValueError("%s:  no format or data chunk found" % self.filename)
+        if self.formatTag not in [WAVE_FORMAT_PCM, WAVE_FORMAT_IEEE_FLOAT]:
+            raise ValueError("%s:  unsupported WAV format %#06x" % (self.filename, self.formatTag))
+        if not (self.nChannels and self.sampleWidth):
+            raise ValueError("%s:  invalid format chunk (%i channels, %i bytes per sample)" % (self.filename, self.nChannels, self.sampleWidth))
+        # the data chunk size is sometimes not filled in by programs writing to a stream
+        dataSize = min(dataSize, fileSize - self.dataOffset)
+        self.nFrames = dataSize // (self.sampleWidth * self.nChannels)
+
+    def map(self):
+        """returns the sample data as a memory-mapped array (one row per sample, one column per channel)"""
+        if self.nFrames == 0:
+            return np.zeros((0, self.nChannels))
+        if self.sampleWidth == 3:
+            # 24-bit samples have no NumPy type:  map the bytes, and convert when the samples are read
+            return np.memmap(self.filename, dtype=np.uint8, mode='r', offset=self.dataOffset,
+                             shape=(self.nFrames, self.nChannels, 3))
+        if self.formatTag == WAVE_FORMAT_IEEE_FLOAT:
+            dtype = '<f%i' % self.sampleWidth
+        elif self.sampleWidth == 1:  # 8-bit WAV files are unsigned
+            dtype = np.uint8
+        else:
+            dtype = '<i%i' % self.sampleWidth
+        return np.memmap(self.filename, dtype=dtype, mode='r', offset=self.dataOffset,
+                         shape=(self.nFrames, self.nChannels))
+
+    def frames(self, start=0, n=None):
+        """returns a view of the raw sample data of n samples from start on (without copying)"""
+        if n is None:
+            n = self.nFrames - start
+        return self.data[start:start + n]
+
+    def samples(self, start=0, n=None, mono=True):
+        """returns n samples from start on, scaled to [-1, 1] (averaged over channels, or one column per channel if mono is False)"""
+        raw = self.frames(start, n)
+        if self.sampleWidth == 3:
+            # pad each sample to four bytes
+            padded = np.zeros(raw.shape[:2] + (4,), dtype=np.uint8)
+            padded[:, :, 1:] = raw
+            samples = padded.view('<i4')[:, :, 0] / 2 ** 31
+        elif self.formatTag == WAVE_FORMAT_IEEE_FLOAT:
+            samples = raw.astype(float)
+        elif self.sampleWidth == 1:
+            samples = (raw.astype(float) - 128) / 128
+        else:
+            samples = raw / 2 ** (8 * self.sampleWidth - 1)
+        if not mono:
+            return samples
+        # average over channels
+        if self.nChannels == 1:
+            return samples[:, 0]
+        return samples.mean(axis=1)
@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+# *_* coding: utf-8 *_*
+
+"""
+On-disk cache of vowel analyses and measurements for extractFormants.
+
+The candidate formant tracks and the intensity contour of each vowel are
+stored in a directory, under a key that is computed from the contents of the
+sound file, the analysis window of the vowel and all the settings of the
+analysis.  When the same recording is measured again (e.g. with another
+measurementPointMethod, with --remeasurement or with another output format),
+the LPC analysis is skipped for all vowels whose key is found in the cache,
+and only the selection of the measurements and the output are redone.
+
+The cache is capped in size:  when it grows beyond the maximum size, the
+entries that have been used least recently are removed.
+
+For incremental re-extraction (e.g. after hand-correcting a TextGrid), the
+measurements of all vowels of a file are also saved with a manifest, which
+lists the interval, label and key of each vowel together with a hash of its
+measurement.  A later run only measures the vowels whose key is not in the
+manifest, and reuses the measurements of all others.
+"""
+
+__version__ = "2.0.0"
+__author__ = ("Rosenfelder, Ingrid; " +  # Only code writers
+              "Fruehwald, Josef; " +
+              "Evanini, Keelan; " +
+              "Seyfarth, Scott; " +
+              "Gorman, Kyle; " +
+              "Prichard, Hilary; " +
+              "Yuan, Jiahong; " +
+              "Brickhouse, Christian")
+__email__ = "brickhouse@stanford.edu"
+# should be the person who will fix bugs and make improvements
+__maintainer__ = "Christian Brickhouse"
+__copyright__ = "Copyright 2020, FAVE contributors"
+__license__ = "GPLv3"
+__status__ = "Development"  # Prototype, Development or Production
+# also include contributors that wrote no code
+__credits__ = ["Brandon Waldon"]
+
+# --------------------------------------------------------------------------------
+
+# Import built-in modules first
+# followed by third-party modules
+# followed by any changes to the path
+# your own modules.
+
+import hashlib
+import os
+import pickle
+import tempfile
+
+# format of the cached analyses:  change this whenever the analysis code changes the results,
+# so that the entries of earlier versions are no longer used
+CACHE_VERSION = 1
+# format of the measurements saved with manifests:  change this whenever it changes,
+# so that the vowels of manifests written by earlier versions are measured again
+MANIFEST_VERSION = 2
+# default maximum size of the cache (in MB)
+DEFAULT_SIZE = 1024
+# size of the blocks in which sound files are read for hashing
+BLOCK_SIZE = 1 << 20
+
+
+class CandidateCache:
+
+    """represents a directory of cached vowel analyses (candidate formant tracks and intensity contours)"""
+
+    def __init__(self, directory, maxSize=DEFAULT_SIZE):
+        self.directory = directory  # cache directory
+        self.maxSize = int(maxSize * 1024 * 1024)  # maximum size of the cache (in bytes)
+        os.makedirs(directory, exist_ok=True)
+
+    def key(self, *fields):
+        """returns the cache key for a vowel analysis"""
+
+        return hashFields(*fields)
+
+    def path(self, key):
+        """returns the file name of a cache entry"""
+
+        # (entries are spread over subdirectories, so that no directory gets too large)
+        return os.path.join(self.directory, key[:2], key + '.pickle')
+
+    def get(self, key):
+        """returns the cached analysis for a key, or None if there is none"""
+
+        filename = self.path(key)
+        try:
+            with open(filename, 'rb') as f:
+                candidates = pickle.load(f)
+        # (entries that are incomplete or cannot be read any more are analyzed again)
+        except (OSError, EOFError, pickle.UnpicklingError, AttributeError, ImportError):
+            return None
+        # mark the entry as recently used
+        try:
+            os.utime(filename)
+        except OSError:
+            pass
+
+        return candidates
+
+    def put(self, key, candidates):
+        """stores an analysis in the cache"""
+
+        filename = self.path(key)
+        os.makedirs(os.path.dirname(filename), exist_ok=True)
+        # write to a temporary file first, so that other processes never read half-written entries
+        fd, tmpFile = tempfile.mkstemp(dir=os.path.dirname(filename), suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                pickle.dump(candidates, f, pickle.HIGHEST_PROTOCOL)
+            os.replace(tmpFile, filename)
+        except OSError:
+            if os.path.exists(tmpFile):
+                os.remove(tmpFile)
+
+    def trim(self):
+        """removes the least recently used entries until the cache is no larger than its maximum size"""
+
+        entries = []
+        total = 0
+        for sub in os.scandir(self.directory):
+            if not sub.is_dir():
+                continue
+            for entry in os.scandir(sub.path):
+                if entry.name.endswith('.pickle'):
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+                    total += stat.st_size
+        entries.sort()
+        for mtime, size, filename in entries:
+            if total <= self.maxSize:
+                break
+            try:
+                os.remove(filename)
+            except OSError:
+                continue
+            total -= size
+
+
+def hashFields(*fields):
+    """returns a hash of the cache version and all fields"""
+
+    # (fields are numbers, strings and tuples of them, whose repr is exact)
+    return hashlib.sha1(repr((__version__, CACHE_VERSION) + fields).encode('utf-8')).hexdigest()
+
+
+def hashFile(filename):
+    """returns the SHA-1 hash of the contents of a file"""
+
+    h = hashlib.sha1()
+    with open(filename, 'rb') as f:
+        for block in iter(lambda: f.read(BLOCK_SIZE), b''):
+            h.update(block)
+
+    return h.hexdigest()
+
+
+def readManifest(filename):
+    """returns the measurements saved with a manifest, as a dictionary {key: measurement}"""
+
+    # filename = manifest file (tab-delimited:  key, beginning, end, label, word, hash of the measurement);
+    # the pickled measurements are in filename + ".pickle"
+    # (measurements whose hash does not match the manifest are left out, and are measured again)
+    if not os.path.exists(filename) or not os.path.exists(filename + '.pickle'):
+        return {}
+    hashes = {}
+    with open(filename) as f:
+        # (skip the header)
+        f.readline()
+        for line in f:
+            fields = line.rstrip('\n').split('\t')
+            if len(fields) == 6:
+                hashes[fields[0]] = fields[5]
+    try:
+        with open(filename + '.pickle', 'rb') as f:
+            data = pickle.load(f)
+    except (OSError, EOFError, pickle.UnpicklingError):
+        return {}
+    measurements = {}
+    for key, result in hashes.items():
+        if key in data and hashlib.sha1(data[key]).hexdigest() == result:
+            try:
+                measurements[key] = pickle.loads(data[key])
+            except (EOFError, pickle.UnpicklingError, AttributeError, ImportError):
+                continue
+
+    return measurements
+
+
+def writeManifest(filename, entries):
+    """writes a manifest and the measurements of a file"""
+
+    # entries = list of (key, beginning, end, label, word, measurement) tuples
+    data = {}
+    f = open(filename, 'w')
+    f.write("key\tbeg\tend\tlabel\tword\tresult\n")
+    for key, beg, end, label, word, measurement in entries:
+        data[key] = pickle.dumps(measurement, pickle.HIGHEST_PROTOCOL)
+        f.write("%s\t%r\t%r\t%s\t%s\t%s\n" % (key, beg, end, label, word, hashlib.sha1(data[key]).hexdigest()))
+    f.close()
+    with open(filename + '.pickle', 'wb') as f:
+        pickle.dump(data, f, pickle.HIGHEST_PROTOCOL)
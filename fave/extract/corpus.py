@@ -0,0 +1,419 @@
+#!/usr/bin/env python3
+# *_* coding: utf-8 *_*
+
+"""
+Speaker and vowel class statistics, and normalization, over a whole corpus.
+
+extractFormants normalizes the measurements of each file on its own.  This
+module works on the measurement tables (.npz, written with --outputFormat npz)
+of any number of files, in two passes that read the tables in blocks of rows,
+so that the memory needed does not grow with the size of the corpus:
+
+1. accumulate:  the counts, means and co-moments (sums of products of the
+   deviations from the mean) of F1, F2, log F1 and log F2 are accumulated for
+   each speaker (all measured vowels) and for each vowel class of each
+   speaker (the tokens that extractFormants includes in the class means).
+   The statistics can be saved, and the statistics of parts of the corpus
+   (e.g. accumulated on different machines) merged, with the same results
+   as a single pass over all files.
+2. normalize:  the tables are written again, with the normalized values of
+   the speaker statistics of the whole corpus:  Lobanov z-scores (on the
+   ANAE scale, as by extractFormants) or ANAE log-mean normalization (the
+   formants are scaled by exp(G - S), where S is the mean log formant of the
+   speaker and G the grand mean of all speakers).
+
+Usage:
+
+    python -m fave.extract.corpus accumulate part1.stats.npz file1.npz file2.npz ...
+    python -m fave.extract.corpus merge corpus.stats.npz part1.stats.npz part2.stats.npz ...
+    python -m fave.extract.corpus normalize --method anae corpus.stats.npz outputDir file1.npz ...
+    python -m fave.extract.corpus summary corpus.stats.npz statistics.txt
+"""
+
+__version__ = "2.0.0"
+__author__ = ("Rosenfelder, Ingrid; " +  # Only code writers
+              "Fruehwald, Josef; " +
+              "Evanini, Keelan; " +
+              "Seyfarth, Scott; " +
+              "Gorman, Kyle; " +
+              "Prichard, Hilary; " +
+              "Yuan, Jiahong; " +
+              "Brickhouse, Christian")
+__email__ = "brickhouse@stanford.edu"
+# should be the person who will fix bugs and make improvements
+__maintainer__ = "Christian Brickhouse"
+__copyright__ = "Copyright 2020, FAVE contributors"
+__license__ = "GPLv3"
+__status__ = "Development"  # Prototype, Development or Production
+# also include contributors that wrote no code
+__credits__ = ["Brandon Waldon"]
+
+# --------------------------------------------------------------------------------
+
+# Import built-in modules first
+# followed by third-party modules
+# followed by any changes to the path
+# your own modules.
+
+import argparse
+import os
+import sys
+
+import numpy as np
+
+from fave.extract.normalize import FUNCTION_WORDS, SCALE, zScores
+from fave.extract.output import MeasurementTable
+
+# format of the saved statistics:  change this whenever it changes
+STATISTICS_VERSION = 1
+# values of which the statistics are accumulated
+VALUES = ['F1', 'F2', 'log F1', 'log F2']
+# normalized columns of a measurement table, and the columns of their raw values
+NORM_COLUMNS = [('norm_F1', 'F1'), ('norm_F2', 'F2')] + \
+               [('norm_F%d@%d%%' % (i, p), 'F%d@%d%%' % (i, p)) for p in [20, 35, 50, 65, 80] for i in [1, 2]]
+# number of rows of a measurement table that are read at a time
+BLOCK_ROWS = 65536
+
+
+class Accumulator:
+
+    """represents the running count, means and co-moments (sums of products of the deviations from the means) of a set of values"""
+
+    def __init__(self, dims=len(VALUES)):
+        self.n = 0
+        self.mean = np.zeros(dims)
+        self.comoment = np.zeros((dims, dims))
+
+    def add(self, values):
+        """adds the rows of an array of values (one column per value)"""
+
+        if len(values):
+            mean = values.mean(axis=0)
+            deviations = values - mean
+            self.combine(len(values), mean, deviations.T @ deviations)
+
+    def merge(self, other):
+        """adds the values of another accumulator"""
+
+        self.combine(other.n, other.mean, other.comoment)
+
+    def combine(self, n, mean, comoment):
+        """adds the count, means and co-moments of another set of values"""
+
+        # (pairwise update of Chan, Golub & LeVeque, which gives the same results for any
+        # partition of the values, up to rounding)
+        if not n:
+            return
+        total = self.n + n
+        delta = mean - self.mean
+        self.mean = self.mean + delta * (n / total)
+        self.comoment = self.comoment + comoment + np.outer(delta, delta) * (self.n * n / total)
+        self.n = total
+
+    def covariance(self):
+        """returns the sample covariance matrix (N-1 in the denominator; NaN for less than two values)"""
+
+        if self.n < 2:
+            return np.full(self.comoment.shape, np.nan)
+        return self.comoment / (self.n - 1)
+
+    def stdvs(self):
+        """returns the sample standard deviations (0 for a single value, as in normalize.groupStatistics)"""
+
+        if self.n == 1:
+            return np.zeros(len(self.mean))
+        return np.sqrt(np.diag(self.covariance()))
+
+
+class CorpusStatistics:
+
+    """represents the statistics of the speakers and vowel classes of a corpus"""
+
+    def __init__(self):
+        self.files = []  # measurement tables that have been accumulated
+        self.speakers = {}  # speaker -> Accumulator of all measured vowels
+        self.classes = {}  # (speaker, vowel class) -> Accumulator of the tokens of the class means
+
+    def speaker(self, name):
+        """returns the accumulator of a speaker"""
+
+        if name not in self.speakers:
+            self.speakers[name] = Accumulator()
+        return self.speakers[name]
+
+    def vowelClass(self, name, vclass):
+        """returns the accumulator of a vowel class of a speaker"""
+
+        if (name, vclass) not in self.classes:
+            self.classes[(name, vclass)] = Accumulator()
+        return self.classes[(name, vclass)]
+
+    def merge(self, other):
+        """adds the statistics of another (disjoint) part of the corpus"""
+
+        repeated = set(self.files) & set(other.files)
+        if repeated:
+            print("ERROR:  file %s has been accumulated more than once." % sorted(repeated)[0])
+            sys.exit()
+        self.files.extend(other.files)
+        for name, acc in other.speakers.items():
+            self.speaker(name).merge(acc)
+        for (name, vclass), acc in other.classes.items():
+            self.vowelClass(name, vclass).merge(acc)
+
+    def grandMean(self):
+        """returns the mean over all speakers of their mean log F1 and F2 (G of ANAE normalization)"""
+
+        return float(np.mean([logMean(acc) for acc in self.speakers.values()]))
+
+    def save(self, filename):
+        """saves the statistics to an .npz file"""
+
+        arrays = {}
+        # (keys:  speaker, or speaker and vowel class)
+        for prefix, width, keys, accs in [('speaker', 1, [(name,) for name in self.speakers], list(self.speakers.values())),
+                                          ('class', 2, list(self.classes), list(self.classes.values()))]:
+            arrays[prefix + '_keys'] = np.array(keys, dtype=str).reshape(len(keys), width)
+            arrays[prefix + '_n'] = np.array([acc.n for acc in accs], dtype=np.int64)
+            arrays[prefix + '_mean'] = np.array([acc.mean for acc in accs]).reshape(len(accs), len(VALUES))
+            arrays[prefix + '_comoment'] = np.array([acc.comoment for acc in accs]).reshape(len(accs), len(VALUES), len(VALUES))
+        with open(filename, 'wb') as f:
+            np.savez(f, version=STATISTICS_VERSION, values=np.array(VALUES), files=np.array(self.files, dtype=str), **arrays)
+
+    @classmethod
+    def load(cls, filename):
+        """returns the statistics saved to an .npz file"""
+
+        stats = cls()
+        with np.load(filename, allow_pickle=False) as saved:
+            if int(saved['version']) != STATISTICS_VERSION or list(saved['values']) != VALUES:
+                print("ERROR:  %s was saved by another version of fave.extract.corpus." % filename)
+                sys.exit()
+            stats.files = saved['files'].tolist()
+            for prefix, accumulator in [('speaker', lambda key: stats.speaker(key[0])),
+                                        ('class', lambda key: stats.vowelClass(key[0], key[1]))]:
+                for key, n, mean, comoment in zip(saved[prefix + '_keys'].tolist(), saved[prefix + '_n'],
+                                                  saved[prefix + '_mean'], saved[prefix + '_comoment']):
+                    accumulator(key).combine(int(n), mean, comoment)
+
+        return stats
+
+
+def logMean(acc):
+    """returns the mean log formant of a speaker (S of ANAE normalization:  mean of log F1 and log F2)"""
+
+    return (acc.mean[2] + acc.mean[3]) / 2
+
+
+def speakerName(table, filename, byFile=False):
+    """returns the speaker of a measurement table (the name in the speaker information, or the name of the file)"""
+
+    if not byFile and table.speaker.get('name'):
+        return table.speaker['name']
+    return os.path.splitext(os.path.basename(filename))[0]
+
+
+def categoryMask(table, name, test, rows):
+    """returns a mask of the rows of a dictionary-encoded column whose values pass a test"""
+
+    # (the test is applied once to each distinct value, not to each row)
+    passed = np.array([test(c) for c in table.categories[name]], dtype=bool)
+    return passed[table.codes(name)[rows]]
+
+
+def meanTokens(table, rows):
+    """returns a mask of the tokens that are included in the means of the vowel classes (as in extractFormants.calculateMeans)"""
+
+    # only include tokens with primary stress
+    included = categoryMask(table, 'stress', lambda s: s == '1', rows)
+    # exclude tokens with F1 < 200 Hz
+    included &= ~(table.codes('F1')[rows] < 200)
+    # exclude glide measurements
+    included &= categoryMask(table, 'glide', lambda g: g != 'g', rows)
+    # exclude function words
+    included &= categoryMask(table, 'word', lambda w: w.upper() not in FUNCTION_WORDS, rows)
+    # exclude /ae, e, i, aw/ before nasals
+    included &= ~(categoryMask(table, 'plt_vclass', lambda c: c in ['ae', 'e', 'i', 'aw'], rows) &
+                  categoryMask(table, 'plt_manner', lambda m: m == 'nasal', rows))
+    # exclude vowels before /l/
+    included &= ~(categoryMask(table, 'plt_manner', lambda m: m == 'lateral', rows) &
+                  categoryMask(table, 'plt_vclass', lambda c: c != 'aeBR', rows))
+    # exclude vowels after /w, y/ and after obstruent + liquid clusters
+    included &= categoryMask(table, 'plt_preseg', lambda ps: ps not in ['w/y', 'obstruent_liquid'], rows)
+
+    return included
+
+
+def formantValues(f1, f2):
+    """returns the values of the statistics for arrays of F1 and F2 (one row per token, NaN in rows with missing formants)"""
+
+    values = np.column_stack((f1, f2, f1, f2)).astype(float)
+    values[~(values[:, :2] > 0).all(axis=1)] = np.nan
+    values[:, 2:] = np.log(values[:, 2:])
+
+    return values
+
+
+def blocks(table):
+    """returns the slices of the rows of a table that are read at a time"""
+
+    return [slice(start, start + BLOCK_ROWS) for start in range(0, len(table), BLOCK_ROWS)]
+
+
+def accumulateFile(stats, filename, byFile=False):
+    """adds the measurements of a measurement table to the statistics"""
+
+    table = MeasurementTable(filename)
+    name = speakerName(table, filename, byFile)
+    speaker = stats.speaker(name)
+    vclasses = table.categories['plt_vclass']
+    for rows in blocks(table):
+        values = formantValues(table.codes('F1')[rows], table.codes('F2')[rows])
+        valid = ~np.isnan(values).any(axis=1)
+        speaker.add(values[valid])
+        # tokens of the class means, by vowel class
+        selected = valid & meanTokens(table, rows)
+        codes = table.codes('plt_vclass')[rows][selected]
+        for code in np.unique(codes):
+            stats.vowelClass(name, str(vclasses[code])).add(values[selected][codes == code])
+    stats.files.append(os.path.abspath(filename))
+
+
+def normalizeFile(stats, filename, output, method='lobanov', grandMean=None, byFile=False):
+    """writes a measurement table with the values normalized by the statistics of its speaker"""
+
+    table = MeasurementTable(filename)
+    name = speakerName(table, filename, byFile)
+    if name not in stats.speakers:
+        print("ERROR:  speaker %s of %s is not in the corpus statistics." % (name, filename))
+        sys.exit()
+    speaker = stats.speakers[name]
+    if method == 'anae':
+        factor = np.exp((stats.grandMean() if grandMean is None else grandMean) - logMean(speaker))
+    means, stdvs = speaker.mean, speaker.stdvs()
+    arrays = {}
+    for norm, column in NORM_COLUMNS:
+        arrays[norm] = np.empty(len(table), dtype=np.float32)
+    for rows in blocks(table):
+        for norm, column in NORM_COLUMNS:
+            i = int(column[1]) - 1
+            values = table.codes(column)[rows].astype(float)
+            if '@' in column:
+                # (only points of the tracks with both F1 and F2)
+                other = column.replace('F%d' % (i + 1), 'F%d' % (2 - i))
+                values[np.isnan(table.codes(other)[rows])] = np.nan
+            if method == 'anae':
+                arrays[norm][rows] = np.round(factor * values, 0)
+            else:
+                offset, scale = SCALE[i]
+                arrays[norm][rows] = np.round(offset + scale * zScores(values, means[i], stdvs[i]), 0)
+
+    # (all other columns are copied unchanged)
+    for column in table.names:
+        if column not in arrays:
+            arrays[column] = np.asarray(table.codes(column))
+            if column in table.categories:
+                arrays[column + '|categories'] = table.categories[column]
+    s_keys = sorted(table.speaker.keys())
+    with open(output, 'wb') as f:
+        np.savez(f, columns=np.array(table.names), speaker_keys=np.array(s_keys, dtype=str),
+                 speaker_values=np.array([table.speaker[k] for k in s_keys], dtype=str), **arrays)
+
+
+def writeStatistics(filename, stats):
+    """writes the statistics of the speakers and their vowel classes to a tab-delimited file"""
+
+    # (one line for all measured vowels of each speaker (vowel class ''), followed by its vowel classes)
+    f = open(filename, 'w')
+    f.write('\t'.join(['speaker', 'vowel', 'n', 'F1', 'F2', 'sd_F1', 'sd_F2', 'cov_F1_F2', 'logmean']) + '\n')
+    classes = {}
+    for (name, vclass), acc in sorted(stats.classes.items()):
+        classes.setdefault(name, []).append((vclass, acc))
+    for name in sorted(stats.speakers):
+        for vclass, acc in [('', stats.speakers[name])] + classes.get(name, []):
+            stdvs = acc.stdvs()
+            f.write('\t'.join([name, vclass, str(acc.n)] +
+                              ['%.1f' % v for v in [acc.mean[0], acc.mean[1], stdvs[0], stdvs[1], acc.covariance()[0, 1]]] +
+                              ['%.4f' % logMean(acc)]) + '\n')
+    f.close()
+
+
+def readFileList(filenames, multipleFiles=False):
+    """returns the names of the measurement tables (with multipleFiles, read from files with one name per line)"""
+
+    if not multipleFiles:
+        return filenames
+    return [line for listFile in filenames for line in open(listFile, 'r').read().splitlines() if line]
+
+
+def setup_parser():
+    parser = argparse.ArgumentParser(description="Accumulates the statistics of the speakers and vowel classes of a corpus of measurement tables (.npz files written by extractFormants with --outputFormat npz), and normalizes the tables with the statistics of the whole corpus.",
+                                     fromfile_prefix_chars="+")
+    commands = parser.add_subparsers(dest="command")
+    accumulate = commands.add_parser("accumulate", help="Accumulate the statistics of measurement tables.")
+    accumulate.add_argument("--byFile", action="store_true",
+                            help="Treat each file as a separate speaker (instead of grouping the files by the speaker name).")
+    accumulate.add_argument("--multipleFiles", action="store_true",
+                            help="Interpret the files as lists of measurement tables, one per line.")
+    accumulate.add_argument("statistics",
+                            help="output file for the statistics (.npz)")
+    accumulate.add_argument("files", nargs="+",
+                            help="measurement tables (.npz)")
+    merge = commands.add_parser("merge", help="Merge the statistics of parts of a corpus.")
+    merge.add_argument("statistics",
+                       help="output file for the merged statistics (.npz)")
+    merge.add_argument("parts", nargs="+",
+                       help="statistics of the parts of the corpus (.npz)")
+    normalize = commands.add_parser("normalize", help="Write the measurement tables with values normalized by the corpus statistics.")
+    normalize.add_argument("--byFile", action="store_true",
+                           help="Treat each file as a separate speaker (as when the statistics were accumulated).")
+    normalize.add_argument("--grandMean", type=float, default=None,
+                           help="Grand mean G of ANAE normalization (default:  mean of all speakers of the corpus; 6.896874 in ANAE).")
+    normalize.add_argument("--method", choices=["anae", "lobanov"], default="lobanov",
+                           help="Lobanov z-scores on the ANAE scale, or ANAE log-mean normalization.")
+    normalize.add_argument("--multipleFiles", action="store_true",
+                           help="Interpret the files as lists of measurement tables, one per line.")
+    normalize.add_argument("statistics",
+                           help="corpus statistics (.npz)")
+    normalize.add_argument("outputDir",
+                           help="directory for the normalized measurement tables")
+    normalize.add_argument("files", nargs="+",
+                           help="measurement tables (.npz)")
+    summary = commands.add_parser("summary", help="Write the statistics as a tab-delimited table.")
+    summary.add_argument("statistics",
+                         help="corpus statistics (.npz)")
+    summary.add_argument("output",
+                         help="output file")
+
+    return parser
+
+
+def main(opts):
+    """runs a command on the statistics of a corpus"""
+
+    if opts.command == "accumulate":
+        stats = CorpusStatistics()
+        for filename in readFileList(opts.files, opts.multipleFiles):
+            accumulateFile(stats, filename, opts.byFile)
+        stats.save(opts.statistics)
+    elif opts.command == "merge":
+        stats = CorpusStatistics()
+        for part in opts.parts:
+            stats.merge(CorpusStatistics.load(part))
+        stats.save(opts.statistics)
+    elif opts.command == "normalize":
+        stats = CorpusStatistics.load(opts.statistics)
+        for filename in readFileList(opts.files, opts.multipleFiles):
+            output = os.path.join(opts.outputDir, os.path.basename(filename))
+            if os.path.abspath(output) == os.path.abspath(filename):
+                print("ERROR:  the normalized table would overwrite %s." % filename)
+                sys.exit()
+            normalizeFile(stats, filename, output, opts.method, opts.grandMean, opts.byFile)
+    elif opts.command == "summary":
+        writeStatistics(opts.output, CorpusStatistics.load(opts.statistics))
+    else:
+        setup_parser().print_help()
+
+
+if __name__ == '__main__':
+    main(setup_parser().parse_args())
@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+# *_* coding: utf-8 *_*
+
+"""
+In-process intensity analysis for extractFormants.
+
+This module reproduces Praat's "To Intensity..." command (mean energy in a
+Kaiser-Bessel window of 6.4 / minimum pitch seconds, with the mean pressure
+subtracted) with NumPy, together with the settings of getIntensity.praat, so
+that the intensity contours needed for the FAAV intensity cutoffs can be
+computed without starting Praat.  The result is returned as a praat.Intensity
+object, and can be used anywhere an Intensity read from a Praat .Intensity
+file is expected.
+"""
+
+__version__ = "2.0.0"
+__author__ = ("Rosenfelder, Ingrid; " +  # Only code writers
+              "Fruehwald, Josef; " +
+              "Evanini, Keelan; " +
+              "Seyfarth, Scott; " +
+              "Gorman, Kyle; " +
+              "Prichard, Hilary; " +
+              "Yuan, Jiahong; " +
+              "Brickhouse, Christian")
+__email__ = "brickhouse@stanford.edu"
+# should be the person who will fix bugs and make improvements
+__maintainer__ = "Christian Brickhouse"
+__copyright__ = "Copyright 2020, FAVE contributors"
+__license__ = "GPLv3"
+__status__ = "Development"  # Prototype, Development or Production
+# also include contributors that wrote no code
+__credits__ = ["Brandon Waldon"]
+
+# --------------------------------------------------------------------------------
+
+# Import built-in modules first
+# followed by third-party modules
+# followed by any changes to the path
+# your own modules.
+
+import math
+
+import numpy as np
+
+from fave import praat
+
+# settings of getIntensity.praat
+MINIMUM_PITCH = 100
+TIME_STEP = 0.001
+# number of frames that are processed at a time
+BLOCK_SIZE = 512
+
+
+def besselI0(x):
+    """returns the modified Bessel function of the first kind of order 0 (same polynomial approximation as Praat)"""
+
+    x = np.abs(np.asarray(x, dtype=float))
+    with np.errstate(divide='ignore', over='ignore'):
+        # Abramowitz & Stegun 9.8.1 (x < 3.75) and 9.8.2 (x >= 3.75)
+        t = (x / 3.75) ** 2
+        small = 1.0 + t * (3.5156229 + t * (3.0899424 + t * (1.2067492
+                + t * (0.2659732 + t * (0.0360768 + t * 0.0045813)))))
+        t = 3.75 / x
+        large = np.exp(x) / np.sqrt(x) * (0.39894228 + t * (0.01328592
+                + t * (0.00225319 + t * (-0.00157565 + t * (0.00916281
+                + t * (-0.02057706 + t * (0.02635537 + t * (-0.01647633
+                + t * 0.00392377))))))))
+
+    return np.where(x < 3.75, small, large)
+
+
+def soundToIntensity(samples, sampleRate, minimumPitch, timeStep=TIME_STEP, subtractMean=True):
+    """returns a praat.Intensity object for a sound, using the same analysis as Praat's "To Intensity..." """
+
+    # samples = 1D array of (mono) samples, or 2D array with one column per channel
+    # (the energy is averaged over the channels)
+    samples = np.asarray(samples, dtype=float)
+    if samples.ndim == 1:
+        samples = samples[:, None]
+    nx, nChannels = samples.shape
+    # time domain of a sound read from a file
+    dx = 1.0 / sampleRate
+    x1 = 0.5 / sampleRate
+    xmax = nx / sampleRate
+
+    windowDuration = 6.4 / minimumPitch
+    halfWindowDuration = 0.5 * windowDuration
+    halfWindowSamples = int(math.floor(halfWindowDuration / dx))
+    offsets = np.arange(-halfWindowSamples, halfWindowSamples + 1)
+    x = offsets * dx / halfWindowDuration
+    root = 1 - x * x
+    # (Kaiser-Bessel window; as in Praat, the end points keep their weight of I0(0) = 1 if the
+    # half window is a whole number of samples)
+    window = np.where(root < 0.0, 0.0, besselI0((2 * np.pi * np.pi + 0.5) * np.sqrt(np.maximum(root, 0.0))))
+
+    # frame positioning, as in Praat's short-term analysis
+    # (the window is never longer than the sound, except for rounding errors:  at least one frame)
+    duration = dx * nx
+    nFrames = max(int(math.floor((duration - windowDuration) / timeStep)) + 1, 1)
+    midTime = x1 - 0.5 * dx + 0.5 * duration
+    t1 = midTime - 0.5 * (nFrames * timeStep) + 0.5 * timeStep
+    frameTimes = t1 + np.arange(nFrames) * timeStep
+    # (0-based) sample nearest to the centre of each frame
+    midSamples = np.floor((frameTimes - x1) / dx + 1.0 + 0.5).astype(int) - 1
+
+    values = np.empty(nFrames)
+    for first in range(0, nFrames, BLOCK_SIZE):
+        indices = midSamples[first:first + BLOCK_SIZE, None] + offsets[None, :]
+        # the window is cut off at the edges of the sound
+        valid = (indices >= 0) & (indices < nx)
+        weights = np.where(valid, window, 0.0)
+        sumxw = 0.0
+        for channel in range(nChannels):
+            amplitude = np.where(valid, samples[np.clip(indices, 0, nx - 1), channel], 0.0)
+            if subtractMean:
+                mean = amplitude.sum(axis=1) / valid.sum(axis=1)
+                amplitude = np.where(valid, amplitude - mean[:, None], 0.0)
+            sumxw = sumxw + (amplitude * amplitude * weights).sum(axis=1)
+        # mean energy, relative to the auditory threshold (2e-5 Pa) squared
+        intensity = sumxw / (nChannels * weights.sum(axis=1)) / 4e-10
+        with np.errstate(divide='ignore'):
+            values[first:first + len(intensity)] = np.where(intensity < 1e-30, -300.0, 10.0 * np.log10(intensity))
+
+    # (times rounded to milliseconds, as when read from a Praat .Intensity file)
+    intensity = praat.Intensity(xmin=0.0, xmax=round(xmax, 3), dx=round(timeStep, 3))
+    x1 = round(float(t1), 3)
+    intensity.set_frames([round((i * round(timeStep, 3) + x1), 3) for i in range(nFrames)], values)
+
+    return intensity
+
+
+def vowelIntensity(samples, sampleRate):
+    """returns the intensity contour of a vowel, with the same settings as getIntensity.praat"""
+
+    duration = len(samples) / sampleRate
+    # minimum duration to get an intensity contour is 6.4 divided by the cutoff frequency
+    # so for vowels shorter than that, the cutoff frequency is raised
+    if duration >= 0.064:
+        minimumPitch = MINIMUM_PITCH
+    else:
+        minimumPitch = 6.4 / duration
+
+    return soundToIntensity(samples, sampleRate, minimumPitch, TIME_STEP, True)
@@ -0,0 +1,246 @@
+#!/usr/bin/env python3
+# *_* coding: utf-8 *_*
+
+"""
+In-process formant analysis (Burg LPC) for extractFormants.
+
+This module reproduces the steps of Praat's "To Formant (burg)..." command
+(resampling to twice the maximum formant, pre-emphasis, Gaussian windowing,
+Burg LPC and root solving) with NumPy, so that vowels can be measured without
+starting an external program for every token.  The result is returned as a
+praat.Formant object, and can be used anywhere a Formant read from a Praat
+.Formant file is expected.
+"""
+
+__version__ = "2.0.0"
+__author__ = ("Rosenfelder, Ingrid; " +  # Only code writers
+              "Fruehwald, Josef; " +
+              "Evanini, Keelan; " +
+              "Seyfarth, Scott; " +
+              "Gorman, Kyle; " +
+              "Prichard, Hilary; " +
+              "Yuan, Jiahong; " +
+              "Brickhouse, Christian")
+__email__ = "brickhouse@stanford.edu"
+# should be the person who will fix bugs and make improvements
+__maintainer__ = "Christian Brickhouse"
+__copyright__ = "Copyright 2020, FAVE contributors"
+__license__ = "GPLv3"
+__status__ = "Development"  # Prototype, Development or Production
+# also include contributors that wrote no code
+__credits__ = ["Brandon Waldon"]
+
+# --------------------------------------------------------------------------------
+
+# Import built-in modules first
+# followed by third-party modules
+# followed by any changes to the path
+# your own modules.
+
+import math
+
+import numpy as np
+
+from fave import praat
+
+# formants closer than this to 0 Hz or to the Nyquist frequency are discarded
+# (same value as Praat)
+SAFETY_MARGIN = 50.0
+# depth of the windowed sinc interpolation used for resampling
+SINC_DEPTH = 50
+# number of samples (resampling) or frames (LPC analysis) that are processed at a time,
+# so that long stretches of speech do not need huge temporary arrays
+BLOCK_SIZE = 4096
+
+
+def resample(samples, sampleRate, newRate, depth=SINC_DEPTH):
+    """resamples a signal to a new sampling rate (FFT low-pass filter + windowed sinc interpolation)"""
+
+    samples = np.asarray(samples, dtype=float)
+    if abs(newRate / sampleRate - 1) < 1e-6:
+        return samples.copy()
+    duration = len(samples) / sampleRate
+    nOut = int(round(duration * newRate))
+    if newRate < sampleRate:
+        # anti-aliasing:  remove everything above the new Nyquist frequency
+        # (zero padding on both sides keeps the filter from wrapping around)
+        pad = 1000
+        nfft = 1 << int(math.ceil(math.log2(len(samples) + 2 * pad)))
+        spectrum = np.fft.rfft(np.concatenate((np.zeros(pad), samples)), nfft)
+        cutoff = int(math.floor(nfft * newRate / sampleRate / 2))
+        spectrum[cutoff:] = 0.0
+        samples = np.fft.irfft(spectrum, nfft)[pad:pad + len(samples)]
+    # sample times of the new signal, in samples of the old signal
+    # (both signals are centred in the same time domain, as in Praat)
+    x1 = 0.5 * (duration - (nOut - 1) / newRate)
+    offsets = np.arange(-depth + 1, depth + 1)
+    resampled = np.empty(nOut)
+    for first in range(0, nOut, BLOCK_SIZE):
+        positions = (x1 + np.arange(first, min(first + BLOCK_SIZE, nOut)) / newRate) * sampleRate - 0.5
+        left = np.floor(positions).astype(int)
+        indices = left[:, None] + offsets[None, :]
+        phase = positions[:, None] - indices
+        weights = np.sinc(phase) * (0.5 + 0.5 * np.cos(np.pi * phase / (depth + 0.5)))
+        valid = (indices >= 0) & (indices < len(samples))
+        values = np.where(valid, samples[np.clip(indices, 0, len(samples) - 1)], 0.0)
+        resampled[first:first + len(positions)] = (values * weights).sum(axis=1)
+
+    return resampled
+
+
+def preEmphasize(samples, sampleRate, frequency):
+    """applies a 6 dB/octave pre-emphasis filter from the given frequency upwards"""
+
+    if not frequency:
+        return samples
+    alpha = math.exp(-2 * math.pi * frequency / sampleRate)
+    emphasized = samples.copy()
+    emphasized[1:] -= alpha * samples[:-1]
+
+    return emphasized
+
+
+def gaussianWindow(n):
+    """returns Praat's Gaussian analysis window of n samples"""
+
+    imid = 0.5 * (n + 1)
+    edge = math.exp(-12.0)
+    i = np.arange(1, n + 1)
+
+    return (np.exp(-48.0 * (i - imid) ** 2 / (n + 1) ** 2) - edge) / (1.0 - edge)
+
+
+def burg(frames, order, orders=None):
+    """returns the LPC coefficients of each row of frames, estimated with Burg's method"""
+
+    # frames = 2D array (one analysis frame per row)
+    # the coefficients a[k] predict x[n] as sum(a[k] * x[n-k-1])
+    # orders = list of lower orders whose coefficients are also wanted;
+    # since Burg's recursion builds the model order by order, these come
+    # for free, and a dictionary {order: coefficients} is returned instead
+    frames = np.atleast_2d(frames)
+    nFrames, n = frames.shape
+    a = np.zeros((nFrames, order))
+    wkm = np.zeros((nFrames, order))
+    wk1 = frames[:, :-1].copy()
+    wk2 = frames[:, 1:].copy()
+    models = {}
+    with np.errstate(divide='ignore', invalid='ignore'):
+        for k in range(order):
+            m = n - k - 1
+            num = (wk1[:, :m] * wk2[:, :m]).sum(axis=1)
+            denom = (wk1[:, :m] ** 2 + wk2[:, :m] ** 2).sum(axis=1)
+            a[:, k] = np.where(denom > 0, 2 * num / denom, 0.0)
+            a[:, :k] = wkm[:, :k] - a[:, k:k + 1] * wkm[:, k - 1::-1][:, :k]
+            if orders and k + 1 in orders:
+                models[k + 1] = a[:, :k + 1].copy()
+            if k == order - 1:
+                break
+            wkm[:, :k + 1] = a[:, :k + 1]
+            c = wkm[:, k:k + 1]
+            new_wk1 = wk1[:, :m - 1] - c * wk2[:, :m - 1]
+            wk2[:, :m - 1] = wk2[:, 1:m] - c * wk1[:, 1:m]
+            wk1[:, :m - 1] = new_wk1
+
+    if orders:
+        return models
+    return a
+
+
+def formantsFromCoefficients(coefficients, nyquist, safetyMargin=SAFETY_MARGIN):
+    """converts LPC coefficients into lists of formant frequencies and bandwidths (one list per frame)"""
+
+    coefficients = np.atleast_2d(coefficients)
+    nFrames, order = coefficients.shape
+    # roots of z^p - a[0] z^(p-1) - ... - a[p-1], as eigenvalues of the companion matrices
+    companion = np.zeros((nFrames, order, order))
+    companion[:, 0, :] = coefficients
+    companion[:, np.arange(1, order), np.arange(order - 1)] = 1.0
+    roots = np.linalg.eigvals(companion)
+    # reflect roots outside the unit circle back into it
+    radius = np.abs(roots)
+    outside = radius > 1.0
+    roots[outside] = 1.0 / np.conj(roots[outside])
+    radius[outside] = 1.0 / radius[outside]
+
+    formants = []
+    bandwidths = []
+    with np.errstate(divide='ignore'):
+        frequency = np.abs(np.angle(roots)) * nyquist / np.pi
+        bandwidth = -np.log(radius ** 2) * nyquist / np.pi
+    keep = (roots.imag >= 0) & (frequency >= safetyMargin) & (frequency <= nyquist - safetyMargin)
+    for i in range(nFrames):
+        order_i = np.argsort(frequency[i][keep[i]], kind='stable')
+        formants.append(frequency[i][keep[i]][order_i].tolist())
+        bandwidths.append(bandwidth[i][keep[i]][order_i].tolist())
+
+    return formants, bandwidths
+
+
+def soundToFormant(samples, sampleRate, nFormants, maxFormant, windowSize, preEmphasis, timeStep=0.001):
+    """returns a praat.Formant object for a sound, using the same analysis as Praat's "To Formant (burg)..." """
+
+    return soundToFormants(samples, sampleRate, [nFormants], maxFormant, windowSize, preEmphasis, timeStep)[0]
+
+
+def soundToFormants(samples, sampleRate, nFormantsList, maxFormant, windowSize, preEmphasis, timeStep=0.001):
+    """returns a list of praat.Formant objects for a sound, one for each number of formants in nFormantsList"""
+
+    # samples = 1D array of (mono) samples
+    # windowSize = effective window length (the Gaussian window is twice as long)
+    # resampling, framing and windowing are shared by all numbers of formants,
+    # and a single Burg recursion up to the highest order yields all LPC models
+    samples = np.asarray(samples, dtype=float)
+    xmax = len(samples) / sampleRate
+    newRate = 2.0 * maxFormant
+    sound = preEmphasize(resample(samples, sampleRate, newRate), newRate, preEmphasis)
+    dx = 1.0 / newRate
+    nx = len(sound)
+
+    # frame positioning, as in Praat's short-term analysis
+    nsamp_window = int(math.floor(2 * windowSize / dx))
+    halfnsamp_window = nsamp_window // 2 - 1
+    nsamp_window = 2 * halfnsamp_window
+    nFrames = int(math.floor((nx * dx - 2 * windowSize) / timeStep)) + 1
+    fmts = [praat.Formant(xmin=0.0, xmax=round(xmax, 3), dx=round(timeStep, 3), maxFormants=nFormants)
+            for nFormants in nFormantsList]
+    # vowel shorter than the analysis window:  no frames
+    orders = [2 * nFormants for nFormants in nFormantsList if nsamp_window >= 2 * nFormants + 1]
+    if nFrames < 1 or not orders:
+        return fmts
+    sx1 = 0.5 * (xmax - (nx - 1) * dx)
+    t1 = sx1 - 0.5 * dx + 0.5 * nx * dx - 0.5 * (nFrames - 1) * timeStep
+    frameTimes = t1 + np.arange(nFrames) * timeStep
+
+    leftSample = np.floor((frameTimes - sx1) / dx).astype(int)
+    startSample = leftSample + 1 - halfnsamp_window
+    window = gaussianWindow(nsamp_window)
+    x1 = round(float(t1), 3)
+    collected = [([], [], [], []) for fmt in fmts]  # times, intensities, formants, bandwidths
+    for first in range(0, nFrames, BLOCK_SIZE):
+        # cut the (windowed) frames out of the signal
+        indices = startSample[first:first + BLOCK_SIZE, None] + np.arange(nsamp_window)[None, :]
+        valid = (indices >= 0) & (indices < nx)
+        frames = np.where(valid, sound[np.clip(indices, 0, nx - 1)], 0.0)
+        # intensity of each frame = maximum squared amplitude
+        intensities = (frames ** 2).max(axis=1)
+        frames *= window
+
+        models = burg(frames, max(orders), orders)
+        for nFormants, fmt, fmtFrames in zip(nFormantsList, fmts, collected):
+            if 2 * nFormants not in models:
+                continue
+            formants, bandwidths = formantsFromCoefficients(models[2 * nFormants], 0.5 * newRate)
+            for i in range(len(frames)):
+                # Burg cannot stand all zeroes
+                if intensities[i] == 0.0:
+                    formants[i], bandwidths[i] = [], []
+            fmtFrames[0].extend(round((first + i) * fmt.dx() + x1, 3) for i in range(len(frames)))
+            fmtFrames[1].extend(intensities.tolist())
+            fmtFrames[2].extend(formants)
+            fmtFrames[3].extend(bandwidths)
+    for fmt, (times, frameIntensities, formants, bandwidths) in zip(fmts, collected):
+        if times:
+            fmt.set_frames(times, frameIntensities, formants, bandwidths)
+
+    return fmts
@@ -37,10 +37,82 @@ def mahalanobis(u, v, ic):
     >>> mahalanobis(u, v, ic) == mahalanobis_scipy(u, v, ic)
     True
     """
-    # these coercions are free if u and v are already matrices
-    diff = np.asmatrix(np.asarray(u) - np.asarray(v))
-    # ic will be coerced to type matrix if it is not already
-    return float(np.sqrt(diff * ic * diff.T))
+    diff = np.asarray(u, dtype=float) - np.asarray(v, dtype=float)
+    return float(np.sqrt(diff.dot(np.asarray(ic)).dot(diff)))
+
+
+def mahalanobis_batch(U, V, ic, cholesky=False):
+    """
+    Compute the Mahalanobis distances between the rows of the (N x d)
+    array _U_ and _V_, which is either a single 1d mean vector or an
+    (N x d) array holding one mean per row. _ic_ is either one (d x d)
+    inverse covariance matrix or an (N x d x d) stack of them, one per row
+    (e.g., the matrices of the class of each observation).
+
+    If _cholesky_ is true, _ic_ holds the lower-triangular Cholesky factor
+    L of the inverse covariance matrix (L L^T = \sum^{-1}) instead, and the
+    distance is computed as the norm of (u - v) L.
+
+    >>> N = 5
+    >>> U = np.random.random((10, N))
+    >>> v = np.random.random(N)
+    >>> ic = np.linalg.inv(np.cov(np.random.random((N, N * N))))
+    >>> d = mahalanobis_batch(U, v, ic)
+    >>> np.allclose(d, [mahalanobis(u, v, ic) for u in U])
+    True
+    >>> np.allclose(d, mahalanobis_batch(U, v, np.linalg.cholesky(ic), True))
+    True
+    >>> np.allclose(d, mahalanobis_batch(U, np.tile(v, (10, 1)), np.tile(ic, (10, 1, 1))))
+    True
+    """
+    diff = np.atleast_2d(np.asarray(U, dtype=float)) - np.asarray(V, dtype=float)
+    ic = np.asarray(ic, dtype=float)
+    # one matrix for all rows, or one matrix per row
+    subscripts = 'jk' if ic.ndim == 2 else 'ijk'
+    if cholesky:
+        y = np.einsum('ij,%s->ik' % subscripts, diff, ic)
+        return np.sqrt(np.einsum('ij,ij->i', y, y))
+    return np.sqrt(np.einsum('ij,%s,ik->i' % subscripts, diff, ic, diff))
+
+
+class ClassParameters:
+    """
+    Per-class parameters (mean vectors or inverse covariance matrices)
+    packed into a single array, with one row per class. The rows are
+    indexed by the class labels (e.g., Plotnik vowel codes), so that the
+    parameters of many observations can be gathered with one indexing
+    operation:
+
+    >>> means = ClassParameters({'1': [500., 1500.], '2': [600., 1800.]})
+    >>> means['2']
+    array([ 600., 1800.])
+    >>> means.values[means.rows(['2', '1', '2'])][:, 0]
+    array([600., 500., 600.])
+    """
+
+    def __init__(self, params=None):
+        params = params or {}
+        self.labels = sorted(params)
+        self.index = dict((label, i) for i, label in enumerate(self.labels))
+        self.values = np.array([params[label] for label in self.labels], dtype=float)
+
+    def __contains__(self, label):
+        return label in self.index
+
+    def __getitem__(self, label):
+        return self.values[self.index[label]]
+
+    def __iter__(self):
+        return iter(self.labels)
+
+    def __len__(self):
+        return len(self.labels)
+
+    def rows(self, labels):
+        """
+        Return the row numbers of a sequence of class labels.
+        """
+        return np.array([self.index[label] for label in labels], dtype=int)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,296 @@
+#!/usr/bin/env python3
+# *_* coding: utf-8 *_*
+
+"""
+Selection of the point of measurement for extractFormants.
+
+The formant tracks of a vowel are handled as a 2D array (one row per frame,
+one column per formant, padded with NaN where a frame has fewer formants),
+and the time of measurement is found for each measurementPointMethod with
+np.searchsorted and (masked) argmax/argmin over these arrays, instead of
+scanning lists of frames.
+"""
+
+__version__ = "2.0.0"
+__author__ = ("Rosenfelder, Ingrid; " +  # Only code writers
+              "Fruehwald, Josef; " +
+              "Evanini, Keelan; " +
+              "Seyfarth, Scott; " +
+              "Gorman, Kyle; " +
+              "Prichard, Hilary; " +
+              "Yuan, Jiahong; " +
+              "Brickhouse, Christian")
+__email__ = "brickhouse@stanford.edu"
+# should be the person who will fix bugs and make improvements
+__maintainer__ = "Christian Brickhouse"
+__copyright__ = "Copyright 2020, FAVE contributors"
+__license__ = "GPLv3"
+__status__ = "Development"  # Prototype, Development or Production
+# also include contributors that wrote no code
+__credits__ = ["Brandon Waldon"]
+
+# --------------------------------------------------------------------------------
+
+# Import built-in modules first
+# followed by third-party modules
+# followed by any changes to the path
+# your own modules.
+
+import sys
+
+import numpy as np
+
+# vowels whose point of measurement depends on the intensity contour (FAAV method)
+INTENSITY_VOWELS = ["AY", "EY", "OW", "AW"]
+
+
+def anae(v, formants, times):
+    """returns time of measurement according to the ANAE (2006) guidelines"""
+
+    # measure at F1 maximum, except for "AE" (F2 maximum) or "AO" (F2 minimum)
+    # (frames without the formant in question are skipped)
+    if v == 'AE':
+        i = np.nanargmax(getFormant(formants, 1))
+    elif v == 'AO':
+        i = np.nanargmin(getFormant(formants, 1))
+    else:
+        i = np.nanargmax(getFormant(formants, 0))
+    measurementPoint = times[i]
+
+    return measurementPoint
+
+
+def faav(phone, formants, times, intensity):
+    """returns the time of measurement according to the FAAV guidelines"""
+
+    vowel = phone.label[:-1]
+    # get intensity cutoffs for all vowels not measured one third into the
+    # vowel
+    if vowel in INTENSITY_VOWELS or (vowel == "UW" and phone.cd == "73"):
+        # get intensity cutoff at 10% below maximum intensity
+        beg_cutoff, end_cutoff = getIntensityCutoff(intensity.intensities(), intensity.times())
+        # make sure we do have an intensity contour (i.e. several measurement point, and not just one)
+        # if there is only one measurement point in the intensity object, the cutoffs will be identical
+        # in that case, reset the cutoffs to include the whole vowel
+        if beg_cutoff == end_cutoff:
+            beg_cutoff = times[0]
+            end_cutoff = times[-1]
+        # modify cutoffs to make sure we are measuring in the first half of the
+        # vowel
+        beg_cutoff, end_cutoff = modifyIntensityCutoff(beg_cutoff, end_cutoff, phone, intensity.intensities(), intensity.times())
+
+        # measure "AY" and "EY" at F1 maximum
+        # (NOTE:  While "AY" receives extra padding at the beginning to possible go before the segment boundary in the search for an F1 maximum, "EY" does not)
+        if vowel in ["AY", "EY"]:
+            measurementPoint = getTimeOfF1Maximum(formants, times, beg_cutoff, end_cutoff)
+        # measure Tuw at the beginning of the segment
+        elif vowel == "UW":
+            measurementPoint = max([phone.xmin, beg_cutoff])
+        # measure "OW" and "AW" halfway between beginning of segment and F1
+        # maximum
+        else:
+            maxF1time = getTimeOfF1Maximum(formants, times, beg_cutoff, end_cutoff)
+            if maxF1time > phone.xmin:
+                measurementPoint = max([beg_cutoff, phone.xmin + (maxF1time - phone.xmin) / 2])
+            else:
+                measurementPoint = max([beg_cutoff, phone.xmin])
+    # measure all other vowels at 1/3 of the way into the vowel's duration
+    else:
+        measurementPoint = phone.xmin + (phone.xmax - phone.xmin) / 3
+
+    return measurementPoint
+
+
+def getFormant(formants, k):
+    """returns the values of the (k+1)th formant in each frame (NaN for frames with fewer formants)"""
+
+    if k < formants.shape[1]:
+        return formants[:, k]
+    return np.full(len(formants), np.nan)
+
+
+def getFormantTracks(formants, times, xmin, xmax):
+    """returns formant tracks (values at 20%, 35%, 50%, 65% and 80% of the vowel duration)"""
+
+    # total duration of vowel
+    dur = xmax - xmin
+    # get measurement points for formant tracks (20%, 35%, 50%, 65% and 80%
+    # into the vowel)
+    measurement_times = xmin + (0.2 * dur) + (0.15 * dur * np.arange(5))
+    indices = getTimeIndex(measurement_times, times)
+    F1 = getFormant(formants, 0)[indices]
+    F2 = getFormant(formants, 1)[indices]
+
+    tracks = []
+    for f1, f2 in zip(F1.tolist(), F2.tolist()):
+        # if we only have F1 but no matching F2, that measurement is probably not reliable enough
+        # so append nothing for both of them
+        if np.isnan(f1) or np.isnan(f2):
+            tracks.extend(['', ''])
+        else:
+            tracks.extend([f1, f2])
+
+    return tracks
+
+
+def getIntensityCutoff(intensities, times):
+    """returns the beginning and end times for the 10%-below-maximum-intensity interval"""
+
+    intensities = np.asarray(intensities)
+    # get intensity cutoff and index of maximum intensity
+    z_max = int(np.argmax(intensities))
+    below = intensities < 0.9 * intensities[z_max]
+    # get left boundary (after the last frame below the cutoff up to the maximum)
+    left = np.flatnonzero(below[:z_max + 1])
+    z_left = int(left[-1]) + 1 if len(left) else 0
+    # get right boundary (before the first frame below the cutoff from the maximum on)
+    right = np.flatnonzero(below[z_max:])
+    z_right = z_max + int(right[0]) - 1 if len(right) else len(intensities) - 1
+
+    beg_cutoff = times[z_left]
+    end_cutoff = times[z_right]
+
+    return beg_cutoff, end_cutoff
+
+
+def getMeasurementPoint(phone, formants, times, intensity, measurementPointMethod):
+    """returns the point of formant measurement, according to the measurement method selected,
+    and the index of the frame closest to it"""
+
+    # formants = 2D array of formant frequencies (one row per frame, padded with NaN)
+    if measurementPointMethod == 'third':
+        # measure at 1/3 of the way into the vowel's duration
+        measurementPoint = phone.xmin + (phone.xmax - phone.xmin) / 3
+    elif measurementPointMethod == 'fourth':
+        # measure at 1/4 of the way into the vowel's duration
+        measurementPoint = phone.xmin + (phone.xmax - phone.xmin) / 4
+    elif measurementPointMethod == 'mid':
+        # measure at 1/2 of the way into the vowel's duration
+        measurementPoint = phone.xmin + (phone.xmax - phone.xmin) / 2
+    elif measurementPointMethod in ['lennig', 'anae']:
+        transition = getTransitionLength(phone.xmin, phone.xmax)
+        # remove vowel transitions
+        part = trimFrames(times, phone.xmin + transition, phone.xmax - transition)
+        if measurementPointMethod == 'lennig':
+            # measure according to Lennig (1978)
+            measurementPoint = lennig(formants[part], times[part])
+        else:
+            # measure according to the ANAE (2006) guidelines
+            measurementPoint = anae(phone.label[:-1], formants[part], times[part])
+    elif measurementPointMethod == 'faav':
+        measurementPoint = faav(phone, formants, times, intensity)
+    elif measurementPointMethod == 'maxint':
+        measurementPoint = maximumIntensity(intensity.intensities(), intensity.times())
+    else:
+        print("ERROR: Unsupported measurement point selection method %s" % measurementPointMethod)
+        sys.exit()
+
+    return measurementPoint, getTimeIndex(measurementPoint, times)
+
+
+def getTimeIndex(t, times):
+    """gets the index of the nearest time value from an ordered array of times (or an array of indices, for an array of t)"""
+
+    times = np.asarray(times)
+    t = np.asarray(t, dtype=float)
+    # first time value that is not earlier than t, and the one before it
+    # (ties go to the earlier time value)
+    i = np.minimum(np.searchsorted(times, t, side='left'), len(times) - 1)
+    previous = np.where(i > 0, times[i - 1], 0.0)
+    index = np.where(np.abs(t - previous) > np.abs(t - times[i]), i, i - 1)
+    # the two following cases can happen if a short vowel is at the beginning
+    # or end of a file:  return the index of the first or last measurement
+    index = np.where(t < times[0], 0, index)
+    index = np.where(t > times[-1], len(times) - 1, index)
+
+    if index.ndim == 0:
+        return int(index)
+    return index
+
+
+def getTimeOfF1Maximum(formants, times, beg_cutoff, end_cutoff):
+    """returns the time at which F1 reaches it maximum (within the cutoff limits)"""
+
+    # get search interval for F1 maximum
+    part = trimFrames(times, beg_cutoff, end_cutoff)
+    # get F1 maximum
+    # (0 for those weird cases where there is a hole in the formant tracks...)
+    F1 = np.nan_to_num(getFormant(formants, 0)[part], nan=0.0)
+    i = int(np.argmax(F1))
+    measurementPoint = times[part][i]
+
+    return measurementPoint
+
+
+def getTransitionLength(minimum, maximum):
+    """sets the transition time to the surrounding consonants to 20msec; if the vowel is shorter than 40msec, to zero"""
+
+    # needed to remove transitions for Lennig and ANAE measurement methods
+    if round(maximum - minimum, 3) <= 0.04:
+        transition = 0
+    else:
+        transition = 0.02
+
+    return transition
+
+
+def lennig(formants, times):
+    """returns time of measurement according to Lennig's (1978) algorithm"""
+
+    # change coefficient of each frame (except for the first and last one):
+    # relative change of F1 and F2 to both neighbouring frames
+    F1 = getFormant(formants, 0)
+    F2 = getFormant(formants, 1)
+    c = (np.abs(F1[1:-1] - F1[:-2]) + np.abs(F1[1:-1] - F1[2:])) / F1[1:-1] + \
+        (np.abs(F2[1:-1] - F2[:-2]) + np.abs(F2[1:-1] - F2[2:])) / F2[1:-1]
+    # measure where the formants change least
+    # (frames where the coefficient is undefined are skipped)
+    if np.isnan(c).all():
+        i = len(times) // 2
+    else:
+        i = int(np.nanargmin(c)) + 1
+    measurementPoint = times[i]
+
+    return measurementPoint
+
+
+def maximumIntensity(intensities, times):
+    """returns the time of the intensity maximum"""
+
+    i = int(np.argmax(intensities))
+    measurementPoint = times[i]
+
+    return measurementPoint
+
+
+def modifyIntensityCutoff(beg_cutoff, end_cutoff, phone, intensities, times):
+    """modifies initial intensity cutoff to ensure measurement takes place in the first half of the vowel"""
+
+    midpoint = phone.xmin + (phone.xmax - phone.xmin) / 2
+
+    # no matter where the intensity contour drops, we want to measure in the first half of the vowel
+    # (second condition is to ensure that there are still formants in the selected frames -
+    # this might not be the case e.g. with a long segment of
+    # glottalization/silence included at the beginning of the vowel)
+    if end_cutoff > midpoint and midpoint > beg_cutoff:
+        end_cutoff = midpoint
+    # exclude cases where the intensity maximum is at the end of the segment
+    # (because of a following vowel)
+    if beg_cutoff > midpoint:
+        # in this case, look for new intensity maximum and cutoffs in the first
+        # half of the vowel
+        part = trimFrames(times, phone.xmin, midpoint)
+        beg_cutoff, end_cutoff = getIntensityCutoff(intensities[part], times[part])
+
+    return beg_cutoff, end_cutoff
+
+
+def trimFrames(times, minimum, maximum):
+    """returns the slice of frames between minimum and maximum (inclusive) from an ordered array of times"""
+
+    # used to remove vowel transitions for the Lennig and ANAE measurement
+    # methods, and to restrict the search for maxima to the cutoff limits
+    beg = int(np.searchsorted(times, minimum, side='left'))
+    end = int(np.searchsorted(times, maximum, side='right'))
+
+    return slice(beg, end)
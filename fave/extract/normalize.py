@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+# *_* coding: utf-8 *_*
+
+"""
+Grouped statistics and Lobanov normalization over columns of measurements.
+
+The means and standard deviations of the vowel classes of a speaker, and the
+normalized values of all measurements, are computed on arrays (one value per
+measurement, NaN for missing values) instead of measurement by measurement.
+The sums are accumulated value by value, in the order of the measurements,
+so that the results (and their rounding) are exactly the same as those of a
+plain loop over the values.
+"""
+
+__version__ = "2.0.0"
+__author__ = ("Rosenfelder, Ingrid; " +  # Only code writers
+              "Fruehwald, Josef; " +
+              "Evanini, Keelan; " +
+              "Seyfarth, Scott; " +
+              "Gorman, Kyle; " +
+              "Prichard, Hilary; " +
+              "Yuan, Jiahong; " +
+              "Brickhouse, Christian")
+__email__ = "brickhouse@stanford.edu"
+# should be the person who will fix bugs and make improvements
+__maintainer__ = "Christian Brickhouse"
+__copyright__ = "Copyright 2020, FAVE contributors"
+__license__ = "GPLv3"
+__status__ = "Development"  # Prototype, Development or Production
+# also include contributors that wrote no code
+__credits__ = ["Brandon Waldon"]
+
+# --------------------------------------------------------------------------------
+
+# Import built-in modules first
+# followed by third-party modules
+# followed by any changes to the path
+# your own modules.
+
+import numpy as np
+
+# function words (excluded from the means of the vowel classes)
+FUNCTION_WORDS = frozenset(['A', 'AH', 'AM', "AN'", 'AN', 'AND', 'ARE', "AREN'T", 'AS', 'AT', 'AW', 'BECAUSE', 'BUT', 'COULD',
+                            'EH', 'FOR', 'FROM', 'GET', 'GONNA', 'GOT', 'GOTTA', 'GOTTEN',
+                            'HAD', 'HAS', 'HAVE', 'HE', "HE'S", 'HIGH', 'HUH',
+                            'I', "I'LL", "I'M", "I'VE", "I'D", 'IN', 'IS', 'IT', "IT'S", 'ITS', 'JUST', 'MEAN', 'MY',
+                            'NAH', 'NOT', 'OF', 'OH', 'ON', 'OR', 'OUR', 'SAYS', 'SHE', "SHE'S", 'SHOULD', 'SO',
+                            'THAN', 'THAT', "THAT'S", 'THE', 'THEM', 'THERE', "THERE'S", 'THEY', 'TO', 'UH', 'UM', 'UP',
+                            'WAS', "WASN'T", 'WE', 'WERE', 'WHAT', 'WHEN', 'WHICH', 'WHO', 'WITH', 'WOULD',
+                            'YEAH', 'YOU', "YOU'VE"])
+# scaling of the normalized values (ANAE scale):  (offset, factor) for F1 and F2
+SCALE = [(650, 150), (1700, 420)]
+
+
+def valueColumn(values):
+    """returns a list of values as an array, with NaN for missing values ('', None or 0)"""
+
+    return np.array([v if v else np.nan for v in values], dtype=float)
+
+
+def groupStatistics(values, groups, nGroups):
+    """returns the number of values, the arithmetic mean and the sample standard deviation (N-1 in the denominator) of each group"""
+
+    # values = array of values (NaN = missing, left out); groups = group index of each value
+    # (mean and standard deviation are NaN for groups without values; the standard deviation is 0 for a single value)
+    valid = ~np.isnan(values)
+    values = values[valid]
+    groups = groups[valid]
+    n = np.bincount(groups, minlength=nGroups)
+    # (bincount adds the weights one by one, in order)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        means = np.bincount(groups, values, nGroups) / n
+        diffsums = np.bincount(groups, (values - means[groups]) ** 2, nGroups)
+        stdvs = np.sqrt(diffsums / (n - 1))
+    stdvs[n == 1] = 0.0
+
+    return n, means, stdvs
+
+
+def zScores(values, mean, stdv):
+    """returns the z-scores of an array of values (NaN where the value is missing, or the mean or standard deviation is 0 or undefined)"""
+
+    if not (mean and stdv) or np.isnan(mean) or np.isnan(stdv):
+        return np.full(np.shape(values), np.nan)
+
+    return (values - mean) / stdv
+
+
+def roundValues(values):
+    """returns an array of values rounded to integers as a list, with '' for missing values"""
+
+    # (round half to even, as Python's round)
+    rounded = np.round(values, 0)
+    result = rounded.astype(object)
+    result[np.isnan(rounded)] = ''
+
+    return result.tolist()
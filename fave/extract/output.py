@@ -0,0 +1,465 @@
+#!/usr/bin/env python3
+# *_* coding: utf-8 *_*
+
+"""
+Output of vowel measurements and formant tracks for extractFormants.
+
+A MeasurementWriter writes the table of measurements (outputFile.txt) and the
+table of normalized measurements (outputFile_norm.txt) together:  each
+measurement is formatted once per table, with a list of column getters that
+is put together only once for the whole file (according to the speaker, the
+formant prediction method and the --candidates option), and the rows are
+collected and written to the files in large blocks.  Rows can be written as
+soon as the measurements are final, one at a time or all at once.
+
+The formant tracks of all vowels (--tracks) are saved in a track archive
+(outputFile.tracks.npz):  the metadata of the vowels in one table, and the
+frames of all vowels in one contiguous float32 array, with the offset of the
+first frame of each vowel.  A TrackArchive maps the frames into memory, so
+that the tracks of single vowels can be read without loading the whole file.
+
+For --outputFormat npz and arrow, the measurements are saved as a table of
+typed columns (outputFile.npz, or an Arrow IPC file outputFile.arrow, which
+requires pyarrow):  float32 formants and bandwidths, float64 times, and
+dictionary-encoded (categorical) strings for vowels, Plotnik codes, words
+and contexts, which are stored as integer codes into a list of distinct
+values.  A MeasurementTable maps the columns of an .npz table into memory.
+"""
+
+__version__ = "2.0.0"
+__author__ = ("Rosenfelder, Ingrid; " +  # Only code writers
+              "Fruehwald, Josef; " +
+              "Evanini, Keelan; " +
+              "Seyfarth, Scott; " +
+              "Gorman, Kyle; " +
+              "Prichard, Hilary; " +
+              "Yuan, Jiahong; " +
+              "Brickhouse, Christian")
+__email__ = "brickhouse@stanford.edu"
+# should be the person who will fix bugs and make improvements
+__maintainer__ = "Christian Brickhouse"
+__copyright__ = "Copyright 2020, FAVE contributors"
+__license__ = "GPLv3"
+__status__ = "Development"  # Prototype, Development or Production
+# also include contributors that wrote no code
+__credits__ = ["Brandon Waldon"]
+
+# --------------------------------------------------------------------------------
+
+# Import built-in modules first
+# followed by third-party modules
+# followed by any changes to the path
+# your own modules.
+
+import struct
+import zipfile
+from operator import attrgetter
+
+import numpy as np
+
+from fave.extract import plotnik
+
+# number of rows that are collected before they are written to the files
+BLOCK_ROWS = 4096
+
+HEADER = ['vowel', 'stress', 'pre_word', 'word', 'fol_word',
+          'F1', 'F2', 'F3',
+          'B1', 'B2', 'B3', 't', 'beg', 'end', 'dur',
+          'plt_vclass', 'plt_manner', 'plt_place',
+          'plt_voice', 'plt_preseg', 'plt_folseq', 'style',
+          'glide', 'pre_seg', 'fol_seg', 'context',
+          'vowel_index', 'pre_word_trans', 'word_trans',
+          'fol_word_trans', 'F1@20%', 'F2@20%',
+          'F1@35%', 'F2@35%', 'F1@50%', 'F2@50%',
+          'F1@65%', 'F2@65%', 'F1@80%', 'F2@80%']
+# columns of the frames in a track archive
+TRACK_COLUMNS = ['t', 'F1', 'F2', 'F3', 'B1', 'B2', 'B3']
+# columns of the table of vowels in a track archive (strings, except for the numbers of the measurements)
+TOKEN_COLUMNS = ['id', 'vowel', 'stress', 'pre_word', 'word', 'fol_word',
+                 'F1', 'F2', 'F3', 'B1', 'B2', 'B3', 't', 'beg', 'end', 'dur', 'nFormants',
+                 'plt_vclass', 'plt_manner', 'plt_place',
+                 'plt_voice', 'plt_preseg', 'plt_folseq', 'style',
+                 'glide', 'pre_seg', 'fol_seg', 'context',
+                 'vowel_index', 'pre_word_trans', 'word_trans',
+                 'fol_word_trans']
+# columns of a measurement table, and their types:  'f4' = float32, 'f8' = float64, 'i1' = int8,
+# 'cat' = dictionary-encoded strings
+TABLE_COLUMNS = [('vowel', 'cat'), ('stress', 'cat'), ('pre_word', 'cat'), ('word', 'cat'), ('fol_word', 'cat'),
+                 ('F1', 'f4'), ('F2', 'f4'), ('F3', 'f4'), ('B1', 'f4'), ('B2', 'f4'), ('B3', 'f4'),
+                 ('t', 'f8'), ('beg', 'f8'), ('end', 'f8'), ('dur', 'f8'),
+                 ('plt_vclass', 'cat'), ('plt_manner', 'cat'), ('plt_place', 'cat'),
+                 ('plt_voice', 'cat'), ('plt_preseg', 'cat'), ('plt_folseq', 'cat'), ('style', 'cat'),
+                 ('glide', 'cat'), ('pre_seg', 'cat'), ('fol_seg', 'cat'), ('context', 'cat'),
+                 ('vowel_index', 'cat'), ('pre_word_trans', 'cat'), ('word_trans', 'cat'),
+                 ('fol_word_trans', 'cat'), ('nFormants', 'i1'),
+                 ('F1@20%', 'f4'), ('F2@20%', 'f4'), ('F1@35%', 'f4'), ('F2@35%', 'f4'), ('F1@50%', 'f4'),
+                 ('F2@50%', 'f4'), ('F1@65%', 'f4'), ('F2@65%', 'f4'), ('F1@80%', 'f4'), ('F2@80%', 'f4'),
+                 ('norm_F1', 'f4'), ('norm_F2', 'f4'),
+                 ('norm_F1@20%', 'f4'), ('norm_F2@20%', 'f4'), ('norm_F1@35%', 'f4'), ('norm_F2@35%', 'f4'),
+                 ('norm_F1@50%', 'f4'), ('norm_F2@50%', 'f4'), ('norm_F1@65%', 'f4'), ('norm_F2@65%', 'f4'),
+                 ('norm_F1@80%', 'f4'), ('norm_F2@80%', 'f4')]
+NORM_HEADER = ['vowel', 'stress', 'word', 'norm_F1', 'norm_F2', 't', 'beg', 'end', 'dur',
+               'cd', 'fm', 'fp', 'fv', 'ps', 'fs', 'style', 'glide',
+               'norm_F1@20%', 'norm_F2@20%', 'norm_F1@35%', 'norm_F2@35%', 'norm_F1@50%', 'norm_F2@50%',
+               'norm_F1@65%', 'norm_F2@65%', 'norm_F1@80%', 'norm_F2@80%']
+
+
+def textColumn(name):
+    """returns a getter for a column of strings"""
+
+    return attrgetter(name)
+
+
+def valueColumn(name):
+    """returns a getter for a column of values (converted to strings)"""
+
+    get = attrgetter(name)
+    return lambda vm: str(get(vm))
+
+
+def optionalColumn(name):
+    """returns a getter for a column of values that are left empty if they are missing (or zero)"""
+
+    get = attrgetter(name)
+
+    def column(vm):
+        value = get(vm)
+        return str(value) if value else ''
+    return column
+
+
+def plotnikColumn(name, decode):
+    """returns a getter for a column of Plotnik codes, decoded into their descriptions"""
+
+    get = attrgetter(name)
+    return lambda vm: decode(get(vm))
+
+
+def tracksColumn(name):
+    """returns a getter for the formant track columns (values rounded to 0.1 Hz, missing values left empty)"""
+
+    get = attrgetter(name)
+    return lambda vm: '\t'.join([str(round(t, 1)) if t else '' for t in get(vm)])
+
+
+def candidatesColumn(vm):
+    """returns the candidate poles and bandwidths columns (at the point of measurement)"""
+
+    return ','.join([str(p) for p in vm.poles]) + '\t' + ','.join([str(b) for b in vm.bandwidths])
+
+
+class MeasurementWriter:
+
+    """writes vowel measurements and normalized measurements to two tab-delimited files"""
+
+    def __init__(self, filename, normFilename, speaker, outputHeader=True, formantPredictionMethod='mahalanobis', candidates=False):
+        self.filename = filename
+        self.normFilename = normFilename
+        self.rows = []  # formatted rows that have not been written yet
+        self.normRows = []
+        self.file = open(filename, 'w')
+        self.normFile = open(normFilename, 'w')
+
+        # speaker information (the same for all rows)
+        s_dict = speaker.__dict__
+        s_keys = sorted(s_dict.keys())
+        self.prefix = ''.join([str(s_dict[k]) + '\t' for k in s_keys])
+        self.candidates = candidates
+
+        # vowel (ARPABET coding), stress, words, formants and bandwidths, time of measurement,
+        # beginning and end of phone, duration, Plotnik environment codes, style coding, glide coding,
+        # context and formant tracks
+        self.columns = [textColumn('phone'), valueColumn('stress'), textColumn('pre_word'), textColumn('word'),
+                        textColumn('fol_word'), valueColumn('f1'), optionalColumn('f2'), optionalColumn('f3'),
+                        valueColumn('b1'), optionalColumn('b2'), optionalColumn('b3'), valueColumn('t'),
+                        valueColumn('beg'), valueColumn('end'), valueColumn('dur'),
+                        plotnikColumn('cd', plotnik.plt_vowels), plotnikColumn('fm', plotnik.plt_manner),
+                        plotnikColumn('fp', plotnik.plt_place), plotnikColumn('fv', plotnik.plt_voice),
+                        plotnikColumn('ps', plotnik.plt_preseg), plotnikColumn('fs', plotnik.plt_folseq),
+                        textColumn('style'), textColumn('glide'), textColumn('pre_seg'), textColumn('fol_seg'),
+                        textColumn('context'), textColumn('p_index'), textColumn('pre_word_trans'),
+                        textColumn('word_trans'), textColumn('fol_word_trans'), tracksColumn('tracks')]
+        self.normColumns = [textColumn('phone'), valueColumn('stress'), textColumn('word'), valueColumn('norm_f1'),
+                            valueColumn('norm_f2'), valueColumn('t'), valueColumn('beg'), valueColumn('end'),
+                            valueColumn('dur'), textColumn('cd'), textColumn('fm'), textColumn('fp'), textColumn('fv'),
+                            textColumn('ps'), textColumn('fs'), textColumn('style'), textColumn('glide'),
+                            tracksColumn('norm_tracks')]
+
+        if outputHeader:
+            header = s_keys + HEADER
+            if formantPredictionMethod == 'mahalanobis':
+                header.append('nFormants')
+            if candidates:
+                header.extend(['poles', 'bandwidths'])
+            self.file.write('\t'.join(header) + '\n')
+            normHeader = list(NORM_HEADER)
+            if formantPredictionMethod == 'mahalanobis':
+                normHeader.append('nFormants')
+            self.normFile.write(', '.join([speaker.name, speaker.age, speaker.sex, speaker.ethnicity,
+                                           speaker.years_of_schooling, speaker.location, speaker.year]) + '\n\n')
+            self.normFile.write('\t'.join(normHeader) + '\n')
+
+    def write(self, vm):
+        """formats a measurement for both tables"""
+
+        row = self.prefix + '\t'.join([column(vm) for column in self.columns])
+        # nFormants selected (if Mahalanobis method)
+        if vm.nFormants:
+            row += '\t' + str(vm.nFormants)
+        if self.candidates:
+            row += '\t' + candidatesColumn(vm)
+        self.rows.append(row + '\n')
+
+        normRow = '\t'.join([column(vm) for column in self.normColumns]) + '\t'
+        if vm.nFormants:
+            normRow += str(vm.nFormants) + '\t'
+        self.normRows.append(normRow + '\n')
+
+        if len(self.rows) >= BLOCK_ROWS:
+            self.flush()
+
+    def write_all(self, measurements):
+        """formats a list of measurements for both tables"""
+
+        for vm in measurements:
+            self.write(vm)
+
+    def flush(self):
+        """writes the rows collected so far to the files"""
+
+        self.file.write(''.join(self.rows))
+        self.normFile.write(''.join(self.normRows))
+        self.rows = []
+        self.normRows = []
+
+    def close(self):
+        self.flush()
+        self.file.close()
+        self.normFile.close()
+
+
+def number(value):
+    """returns a value as a float, or NaN if it is missing"""
+
+    if value is None or value == '':
+        return np.nan
+    return float(value)
+
+
+def getTrackFrames(vm, arena):
+    """returns the frames of the (winning) formant tracks of a measurement as a float32 array
+    (one row per frame:  time, F1, F2, F3, B1, B2, B3; NaN where a formant is missing)"""
+
+    if vm.candidates is None:
+        return np.full((0, len(TRACK_COLUMNS)), np.nan, dtype=np.float32)
+    times, poles, bandwidths = arena.frames(vm, vm.winner)
+    frames = np.full((len(times), len(TRACK_COLUMNS)), np.nan, dtype=np.float32)
+    frames[:, 0] = times
+    n = min(poles.shape[1], 3)
+    frames[:, 1:1 + n] = poles[:, :n]
+    frames[:, 4:4 + n] = bandwidths[:, :n]
+
+    return frames
+
+
+def writeTrackArchive(filename, measurements, speaker, arena):
+    """writes the formant tracks of all measurements to a track archive (.npz)"""
+
+    # arena = CandidateArena with the candidate formant tracks of the measurements
+
+    # token id = position of the measurement in the output file
+    columns = {name: [] for name in TOKEN_COLUMNS}
+    frames = []
+    offsets = [0]
+    for i, vm in enumerate(measurements):
+        values = [i, vm.phone, vm.stress, vm.pre_word, vm.word, vm.fol_word,
+                  number(vm.f1), number(vm.f2), number(vm.f3), number(vm.b1), number(vm.b2), number(vm.b3),
+                  number(vm.t), number(vm.beg), number(vm.end), number(vm.dur), vm.nFormants or 0,
+                  plotnik.plt_vowels(vm.cd), plotnik.plt_manner(vm.fm), plotnik.plt_place(vm.fp),
+                  plotnik.plt_voice(vm.fv), plotnik.plt_preseg(vm.ps), plotnik.plt_folseq(vm.fs),
+                  vm.style, vm.glide, vm.pre_seg, vm.fol_seg, vm.context, vm.p_index,
+                  vm.pre_word_trans, vm.word_trans, vm.fol_word_trans]
+        for name, value in zip(TOKEN_COLUMNS, values):
+            columns[name].append(value)
+        trackFrames = getTrackFrames(vm, arena)
+        frames.append(trackFrames)
+        offsets.append(offsets[-1] + len(trackFrames))
+
+    # one table (structured array) for the vowels
+    dtypes = []
+    for name in TOKEN_COLUMNS:
+        if name in ['id', 'nFormants']:
+            dtypes.append((name, np.int32))
+        elif name in ['F1', 'F2', 'F3', 'B1', 'B2', 'B3']:
+            dtypes.append((name, np.float32))
+        elif name in ['t', 'beg', 'end', 'dur']:
+            dtypes.append((name, np.float64))
+        else:
+            width = max([len(str(v)) for v in columns[name]] + [1])
+            dtypes.append((name, 'U%i' % width))
+    tokens = np.zeros(len(measurements), dtype=dtypes)
+    for name in TOKEN_COLUMNS:
+        tokens[name] = [str(v) if tokens.dtype[name].kind == 'U' else v for v in columns[name]]
+
+    s_keys = sorted(speaker.__dict__.keys())
+    # (uncompressed, so that the frames can be mapped into memory)
+    np.savez(filename, tokens=tokens,
+             offsets=np.array(offsets, dtype=np.int64),
+             frames=np.concatenate(frames) if frames else np.zeros((0, len(TRACK_COLUMNS)), dtype=np.float32),
+             columns=np.array(TRACK_COLUMNS),
+             speaker_keys=np.array(s_keys, dtype=str),
+             speaker_values=np.array([str(speaker.__dict__[k]) for k in s_keys], dtype=str))
+
+
+def mapArray(filename, name):
+    """returns an array of an .npz file, mapped into memory (or read, if the file is compressed)"""
+
+    member = name + '.npy'
+    with zipfile.ZipFile(filename) as z:
+        info = z.getinfo(member)
+        if info.compress_type != zipfile.ZIP_STORED:
+            return np.load(z.open(member), allow_pickle=False)
+    with open(filename, 'rb') as f:
+        # skip the local file header of the member, and the header of the .npy file
+        f.seek(info.header_offset + 26)
+        nameLength, extraLength = struct.unpack('<HH', f.read(4))
+        f.seek(nameLength + extraLength, 1)
+        version = np.lib.format.read_magic(f)
+        if version == (1, 0):
+            shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(f)
+        else:
+            shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(f)
+        offset = f.tell()
+    if not np.prod(shape):
+        return np.zeros(shape, dtype=dtype)
+
+    return np.memmap(filename, dtype=dtype, mode='r', offset=offset, shape=shape,
+                     order='F' if fortran_order else 'C')
+
+
+class TrackArchive:
+
+    """represents a track archive (the table of vowels is read, the frames are mapped into memory)"""
+
+    def __init__(self, filename):
+        self.filename = filename
+        with np.load(filename, allow_pickle=False) as archive:
+            self.tokens = archive['tokens']  # table of vowels (structured array)
+            self.offsets = archive['offsets']  # first frame of each vowel (and total number of frames)
+            self.columns = list(archive['columns'])  # columns of the frames
+            self.speaker = dict(zip(archive['speaker_keys'], archive['speaker_values']))
+        self.frames = mapArray(filename, 'frames')
+
+    def __len__(self):
+        return len(self.tokens)
+
+    def token(self, i):
+        """returns the metadata of a vowel"""
+
+        return self.tokens[i]
+
+    def tracks(self, i):
+        """returns the frames of a vowel (one row per frame, with the columns of the archive)"""
+
+        return self.frames[self.offsets[i]:self.offsets[i + 1]]
+
+
+def getTableColumns(measurements):
+    """returns the columns of the measurement table, as a list of (name, type, values) tuples
+    (for dictionary-encoded columns, values = (codes, categories))"""
+
+    values = {name: [] for name, kind in TABLE_COLUMNS}
+    for vm in measurements:
+        row = [vm.phone, vm.stress, vm.pre_word, vm.word, vm.fol_word,
+               vm.f1, vm.f2, vm.f3, vm.b1, vm.b2, vm.b3, vm.t, vm.beg, vm.end, vm.dur,
+               plotnik.plt_vowels(vm.cd), plotnik.plt_manner(vm.fm), plotnik.plt_place(vm.fp),
+               plotnik.plt_voice(vm.fv), plotnik.plt_preseg(vm.ps), plotnik.plt_folseq(vm.fs),
+               vm.style, vm.glide, vm.pre_seg, vm.fol_seg, vm.context, vm.p_index,
+               vm.pre_word_trans, vm.word_trans, vm.fol_word_trans, vm.nFormants or 0]
+        # (formant tracks and normalized values, missing values padded)
+        row.extend((list(vm.tracks) + [''] * 10)[:10])
+        row.extend([vm.norm_f1, vm.norm_f2])
+        row.extend((list(vm.norm_tracks) + [''] * 10)[:10])
+        for (name, kind), value in zip(TABLE_COLUMNS, row):
+            values[name].append(value)
+
+    columns = []
+    for name, kind in TABLE_COLUMNS:
+        if kind == 'cat':
+            categories, codes = np.unique(np.array([str(v) for v in values[name]], dtype=str), return_inverse=True)
+            columns.append((name, kind, (codes.astype(np.int32), categories)))
+        elif kind == 'i1':
+            columns.append((name, kind, np.array(values[name], dtype=np.int8)))
+        else:
+            columns.append((name, kind, np.array([number(v) for v in values[name]], dtype=kind)))
+
+    return columns
+
+
+def writeMeasurementTable(filename, measurements, speaker):
+    """writes the measurements as a table of typed columns to an .npz file"""
+
+    # dictionary-encoded columns are saved as the integer codes (name) and the distinct values (name + "|categories")
+    arrays = {}
+    for name, kind, values in getTableColumns(measurements):
+        if kind == 'cat':
+            arrays[name], arrays[name + '|categories'] = values
+        else:
+            arrays[name] = values
+    s_keys = sorted(speaker.__dict__.keys())
+    # (uncompressed, so that the columns can be mapped into memory)
+    np.savez(filename, columns=np.array([name for name, kind in TABLE_COLUMNS]),
+             speaker_keys=np.array(s_keys, dtype=str),
+             speaker_values=np.array([str(speaker.__dict__[k]) for k in s_keys], dtype=str), **arrays)
+
+
+def writeArrowTable(filename, measurements, speaker):
+    """writes the measurements as a table of typed columns to an Arrow IPC file (requires pyarrow)"""
+
+    import pyarrow as pa
+
+    arrays = []
+    for name, kind, values in getTableColumns(measurements):
+        if kind == 'cat':
+            codes, categories = values
+            arrays.append(pa.DictionaryArray.from_arrays(pa.array(codes, type=pa.int32()), pa.array(categories.tolist())))
+        else:
+            arrays.append(pa.array(values))
+    s_dict = speaker.__dict__
+    metadata = {'speaker_' + k: str(s_dict[k]) for k in sorted(s_dict.keys())}
+    table = pa.Table.from_arrays(arrays, names=[name for name, kind in TABLE_COLUMNS], metadata=metadata)
+    with pa.OSFile(filename, 'wb') as sink:
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+
+
+class MeasurementTable:
+
+    """represents a measurement table saved to an .npz file (the columns are mapped into memory)"""
+
+    def __init__(self, filename):
+        self.filename = filename
+        with np.load(filename, allow_pickle=False) as table:
+            self.names = list(table['columns'])  # names of the columns
+            self.speaker = dict(zip(table['speaker_keys'], table['speaker_values']))
+            # distinct values of the dictionary-encoded columns
+            self.categories = {name: table[name + '|categories'] for name in self.names
+                               if name + '|categories' in table.files}
+        self.__columns = {}
+
+    def __len__(self):
+        return len(self.codes(self.names[0]))
+
+    def codes(self, name):
+        """returns the values of a column (or the integer codes, for a dictionary-encoded column)"""
+
+        if name not in self.__columns:
+            self.__columns[name] = mapArray(self.filename, name)
+        return self.__columns[name]
+
+    def column(self, name):
+        """returns the values of a column (decoded, for a dictionary-encoded column)"""
+
+        if name in self.categories:
+            return self.categories[name][self.codes(name)]
+        return self.codes(name)
@@ -28,6 +28,8 @@ import os
 import string
 import re
 
+from fave.extract.records import VowelMeasurement
+
 glide_regex = re.compile('{[a-z0-9]*}')
                          # Plotnik glide coding: '{[f|b|i|m|s|d|br2|g}'
 style_regex = re.compile('-[0-9]-')  # Plotnik stylistic levels:  '-[1-7]-'
@@ -97,24 +99,6 @@ class PltFile:
         return """<Plotnik file for speaker %s %s (%s, %s, %s, %s years of schooling, from %s, recorded in %s) with %s tokens.>""" % (self.first_name, self.last_name, self.age, self.sex, self.ethnicity, self.years_of_schooling, self.location, self.year, self.N)
 
 
-class VowelMeasurement:
-
-    """represents a single vowel token (one line in a Plotnik data file)"""
-    F1 = 0  # first formant
-    F2 = 0  # second formant
-    F3 = ''  # third formant
-    code = ''  # Plotnik code for vowel class (includes phonetic environment):  "xx.xxxxx"
-    stress = 1  # level of stress (default = primary) (and duration:  "x.xxx"???)
-    text = ''  # rest of line (everything that is not numbers:  token/word, glide, style, comment, ...)
-    word = ''  # (orthographic) transcription of token (with parentheses and count)
-    trans = ''  # normal transcription (without parentheses and count, upper case)
-    fname = ''  # 8-character token identifier???
-    comment = ''  # Plotnik comment (everything after " -- ")
-    glide = ''  # Plotnik coding for glide (if present)
-    style = ''  # Plotnik coding for stylistic level (if present)
-    t = 0  # time of measurement
-
-
 def arpabet2plotnik(ac, stress, trans, prec_p, foll_p, phoneset, fm, fp, fv, ps, fs):
     """translates Arpabet transcription of vowels into codes for Plotnik vowel classes"""
     # ac = Arpabet coding (without stress digit)
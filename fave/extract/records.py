@@ -0,0 +1,283 @@
+#!/usr/bin/env python3
+# *_* coding: utf-8 *_*
+
+"""
+Compact records for the phones, words and vowel measurements of extractFormants.
+
+A long interview has tens of thousands of phones and vowel measurements, so
+these classes keep their attributes in __slots__ instead of a per-instance
+dictionary.  Attributes that only some measurements need (normalized values,
+glide coding, the fields of Plotnik data files) are only created when they are
+first used.  The same VowelMeasurement class is used by extractFormants, by
+the remeasure module and for the lines of Plotnik data files read by the
+plotnik module.
+
+The candidate formant tracks of the vowels of a file (the frames of all
+analyses with different numbers of formants) are kept in one float32
+CandidateArena, and the vowel measurements only hold the index of their
+tracks in it, so that all of them can be freed at once when they are no
+longer needed.
+"""
+
+__version__ = "2.0.0"
+__author__ = ("Rosenfelder, Ingrid; " +  # Only code writers
+              "Fruehwald, Josef; " +
+              "Evanini, Keelan; " +
+              "Seyfarth, Scott; " +
+              "Gorman, Kyle; " +
+              "Prichard, Hilary; " +
+              "Yuan, Jiahong; " +
+              "Brickhouse, Christian")
+__email__ = "brickhouse@stanford.edu"
+# should be the person who will fix bugs and make improvements
+__maintainer__ = "Christian Brickhouse"
+__copyright__ = "Copyright 2020, FAVE contributors"
+__license__ = "GPLv3"
+__status__ = "Development"  # Prototype, Development or Production
+# also include contributors that wrote no code
+__credits__ = ["Brandon Waldon"]
+
+# --------------------------------------------------------------------------------
+
+# Import built-in modules first
+# followed by third-party modules
+# followed by any changes to the path
+# your own modules.
+
+import numpy as np
+
+from fave import praat
+
+# initial size of a candidate arena (number of float32 values)
+ARENA_SIZE = 1 << 16
+
+
+class Record:
+
+    """base class of the records:  attributes in __slots__, with defaults for the attributes that are created lazily"""
+
+    __slots__ = ()
+    # defaults of the lazily created attributes (callables are called to create a new value for each record)
+    lazy = {}
+
+    def __getattr__(self, name):
+        # (only called for attributes that have not been set yet)
+        try:
+            default = self.lazy[name]
+        except KeyError:
+            raise AttributeError("%r object has no attribute %r" % (type(self).__name__, name))
+        value = default() if callable(default) else default
+        setattr(self, name, value)
+
+        return value
+
+    def __setstate__(self, state):
+        # state = (None, {slot: value}) for records, or {attribute: value} for objects pickled by
+        # earlier versions, which had no slots
+        if isinstance(state, tuple):
+            state = state[1]
+        for name, value in state.items():
+            setattr(self, name, value)
+
+
+class Phone(Record):
+
+    """represents a single phone (label, times and Plotnik code (for vowels))"""
+    # !!! not the same as class cmu.Phone !!!
+
+    __slots__ = ('label', 'code', 'xmin', 'xmax', 'cd', 'fm', 'fp', 'fv', 'ps', 'fs', 'overlap', 'pp', 'arpa', 'stress')
+
+    def __init__(self):
+        self.label = ''  # phone label (Arpabet coding)
+        self.code = ''  # Plotnik vowel code ("xx.xxxxx")
+        self.xmin = None  # beginning of phone
+        self.xmax = None  # end of phone
+        self.cd = ''  # Plotnik code:  vowel class
+        self.fm = ''  # Plotnik code:  following segment - manner
+        self.fp = ''  # Plotnik code:  following segment - place
+        self.fv = ''  # Plotnik code:  following segment - voice
+        self.ps = ''  # Plotnik code:  preceding segment
+        self.fs = ''  # Plotnik code:  following sequences
+        self.overlap = False
+        self.pp = None  # preceding phone (Arpabet label)
+        self.arpa = ''  # Arpabet coding WITHOUT stress digit
+        self.stress = None  # stress digit
+
+
+class Word(Record):
+
+    """represents a word (transcription, times and list of phones)"""
+
+    __slots__ = ('transcription', 'phones', 'xmin', 'xmax', 'style')
+
+    def __init__(self):
+        self.transcription = ''  # transcription
+        self.phones = []  # list of phones
+        self.xmin = None  # beginning of word
+        self.xmax = None  # end of word
+        self.style = ''  # style label (if present)
+
+
+class VowelMeasurement(Record):
+
+    """represents a vowel measurement (a vowel measured by extractFormants, or one line in a Plotnik data file)"""
+
+    __slots__ = ('phone', 'stress', 'style', 'word', 'f1', 'f2', 'f3', 'b1', 'b2', 'b3', 't',
+                 'code', 'cd', 'fm', 'fp', 'fv', 'ps', 'fs', 'beg', 'end', 'dur',
+                 'poles', 'bandwidths', 'candidates', 'winner', 'tracks', 'all_tracks',
+                 'pre_seg', 'fol_seg', 'context', 'p_index',
+                 'word_trans', 'pre_word_trans', 'fol_word_trans', 'pre_word', 'fol_word',
+                 # created lazily
+                 'nFormants', 'glide', 'norm_f1', 'norm_f2', 'norm_f3', 'norm_tracks', 'text', 'trans', 'fname', 'comment')
+
+    lazy = {'nFormants': None,  # actual formant settings used in the measurement (for Mahalanobis distance method)
+            'glide': '',  # Plotnik glide coding
+            'norm_f1': None,  # normalized F1
+            'norm_f2': None,  # normalized F2
+            'norm_f3': None,  # normalized F3
+            'norm_tracks': list,  # normalized formant "tracks"
+            'text': '',  # rest of a Plotnik line (everything that is not numbers:  token/word, glide, style, comment, ...)
+            'trans': '',  # normal transcription (without parentheses and count, upper case)
+            'fname': '',  # 8-character token identifier???
+            'comment': ''}  # Plotnik comment (everything after " -- ")
+
+    def __init__(self):
+        self.phone = ''  # Arpabet coding
+        self.stress = ''  # stress level ("1", "2", "0")
+        self.style = ''  # style label (if present)
+        self.word = ''  # corresponding word
+        self.f1 = None  # first formant
+        self.f2 = None  # second formant
+        self.f3 = None  # third formant
+        self.b1 = None  # bandwidth of first formant
+        self.b2 = None  # bandwidth of second formant
+        self.b3 = None  # bandwidth of third formant
+        self.t = ''  # time of measurement
+        self.code = ''  # Plotnik vowel code ("xx.xxxxx")
+        self.cd = ''  # Plotnik code for vowel class
+        self.fm = ''  # Plotnik code for manner of following segment
+        self.fp = ''  # Plotnik code for place of following segment
+        self.fv = ''  # Plotnik code for voicing of following segment
+        self.ps = ''  # Plotnik code for preceding segment
+        self.fs = ''  # Plotnik code for following sequences
+        self.beg = None  # beginning of vowel
+        self.end = None  # end of vowel
+        self.dur = None  # duration of vowel
+        self.poles = []  # original list of poles returned by LPC analysis
+        self.bandwidths = []
+            # original list of bandwidths returned by LPC analysis
+        self.candidates = None
+            # candidate formant tracks of all formant settings (index in the
+            # CandidateArena of the file, or a block from packCandidates)
+        self.winner = 0  # index of the formant setting of the measurement
+        self.tracks = []
+            # formant "tracks" (five sample points at 20%, 35%, 50%, 65% and
+            # 80% of the vowel)
+        self.all_tracks = []
+            # formant "tracks" for all possible formant settings (needed for
+            # remeasurement)
+        self.pre_seg = ''
+        self.fol_seg = ''
+        self.context = ''
+        self.p_index = ''
+        self.word_trans = ''
+        self.pre_word_trans = ''
+        self.fol_word_trans = ''
+        self.pre_word = ''
+        self.fol_word = ''
+
+    # (the formants of Plotnik data files, as they are called in the plotnik module)
+    @property
+    def F1(self):
+        return self.f1
+
+    @F1.setter
+    def F1(self, value):
+        self.f1 = value
+
+    @property
+    def F2(self):
+        return self.f2
+
+    @F2.setter
+    def F2(self, value):
+        self.f2 = value
+
+    @property
+    def F3(self):
+        return self.f3
+
+    @F3.setter
+    def F3(self, value):
+        self.f3 = value
+
+
+class CandidateArena:
+
+    """holds the candidate formant tracks of all vowels of a file in one float32 array"""
+
+    def __init__(self):
+        self.data = np.empty(ARENA_SIZE, dtype=np.float32)  # rows of all vowels, one after the other
+        self.size = 0  # number of values used
+        self.entries = []  # (offset, row width, number of frames of each formant setting) of each vowel
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __getstate__(self):
+        # (only the used part of the array is pickled)
+        return {'data': self.data[:self.size].copy(), 'size': self.size, 'entries': self.entries}
+
+    def add(self, vm):
+        """moves the candidate formant tracks of a measurement (a block from packCandidates) into the arena"""
+
+        frameCounts, block = vm.candidates
+        n = block.size
+        if self.size + n > len(self.data):
+            # (the array grows by doubling, so that each value is copied only a few times)
+            data = np.empty(max(2 * len(self.data), self.size + n), dtype=np.float32)
+            data[:self.size] = self.data[:self.size]
+            self.data = data
+        self.data[self.size:self.size + n] = block.ravel()
+        self.entries.append((self.size, block.shape[1], frameCounts))
+        self.size += n
+        vm.candidates = len(self.entries) - 1
+
+    def block(self, vm):
+        """returns the candidate formant tracks of a measurement as a block (frame counts, float32 array)"""
+
+        offset, width, frameCounts = self.entries[vm.candidates]
+
+        return frameCounts, self.data[offset:offset + sum(frameCounts) * width].reshape(-1, width)
+
+    def frames(self, vm, j):
+        """returns the times, poles and bandwidths of formant setting j of a measurement (poles and bandwidths padded with NaN)"""
+
+        frameCounts, block = self.block(vm)
+        first = sum(frameCounts[:j])
+        rows = block[first:first + frameCounts[j]]
+        width = (block.shape[1] - 1) // 2
+
+        return rows[:, 0], rows[:, 1:1 + width], rows[:, 1 + width:]
+
+    def free(self, measurements):
+        """frees the candidate formant tracks of all measurements"""
+
+        for vm in measurements:
+            vm.candidates = None
+            vm.all_tracks = []
+        self.data = np.empty(0, dtype=np.float32)
+        self.size = 0
+        self.entries = []
+
+
+def packCandidates(times, poles, bandwidths):
+    """returns the candidate formant tracks of a vowel as a block (frame counts, float32 array)"""
+
+    # times, poles, bandwidths = one list of frames for each formant setting
+    # (one row per frame and formant setting:  time, poles and bandwidths, padded with NaN)
+    width = max([len(f) for frames in poles for f in frames] + [0])
+    rows = [np.column_stack((t, praat.pad_frames(p, width), praat.pad_frames(b, width)))
+            for t, p, b in zip(times, poles, bandwidths)]
+
+    return tuple(len(t) for t in times), np.concatenate(rows).astype(np.float32)
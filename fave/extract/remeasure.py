@@ -4,66 +4,14 @@ import numpy as np
 import sys
 import string
 
-from fave.extract.mahalanobis import mahalanobis
+from fave.extract.mahalanobis import ClassParameters, mahalanobis_batch
+from fave.extract.records import VowelMeasurement
 
-
-class VowelMeasurement:
-
-    """represents a vowel measurement"""
-    # !!! not the same as class plotnik.VowelMeasurement !!!
-
-    def __init__(self):
-        self.phone = ''  # Arpabet coding
-        self.stress = ''  # stress level ("1", "2", "0")
-        self.style = ''  # style label (if present)
-        self.word = ''  # corresponding word
-        self.f1 = None  # first formant
-        self.f2 = None  # second formant
-        self.f3 = None  # third formant
-        self.b1 = None  # bandwidth of first formant
-        self.b2 = None  # bandwidth of second formant
-        self.b3 = None  # bandwidth of third formant
-        self.t = ''  # time of measurement
-        self.code = ''  # Plotnik vowel code ("xx.xxxxx")
-        self.cd = ''  # Plotnik code for vowel class
-        self.fm = ''  # Plotnik code for manner of following segment
-        self.fp = ''  # Plotnik code for place of following segment
-        self.fv = ''  # Plotnik code for voicing of following segment
-        self.ps = ''  # Plotnik code for preceding segment
-        self.fs = ''  # Plotnik code for following sequences
-        self.text = ''  # ???
-        self.beg = None  # beginning of vowel
-        self.end = None  # end of vowel
-        self.dur = None  # duration of vowel
-        self.poles = []  # original list of poles returned by LPC analysis
-        self.bandwidths = []
-            # original list of bandwidths returned by LPC analysis
-        self.times = []
-        self.winner_poles = []
-        self.winner_bandwidths = []
-        self.all_poles = []
-        self.all_bandwidths = []
-        self.nFormants = None  # actual formant settings used in the measurement (for Mahalanobis distance method)
-        self.glide = ''  # Plotnik glide coding
-        self.norm_f1 = None  # normalized F1
-        self.norm_f2 = None  # normalized F2
-        self.norm_f3 = None  # normalized F3
-        self.tracks = []
-            # formant "tracks" (five sample points at 20%, 35%, 50%, 65% and
-            # 80% of the vowel)
-        self.all_tracks = []
-            # formant "tracks" for all possible formant settings (needed for
-            # remeasurement)
-        self.norm_tracks = []  # normalized formant "tracks"
-        self.pre_seg = ''
-        self.fol_seg = ''
-        self.context = ''
-        self.p_index = ''
-        self.word_trans = ''
-        self.pre_word_trans = ''
-        self.fol_word_trans = ''
-        self.pre_word = ''
-        self.fol_word = ''
+# cutoff for the squared Mahalanobis distance of outliers, which is raised in steps
+# until at least MIN_TOKENS tokens of the vowel class are left
+OUTLIER_CUTOFF = 4.75
+OUTLIER_STEP = 0.5
+MIN_TOKENS = 10
 
 
 def loadfile(file):
@@ -106,198 +54,165 @@ def loadfile(file):
     return measurements
 
 
-def createVowelDictionary(measurements):
+def packMeasurements(measurements):
     """
-    Creates a dictionary of F1, F2, B1, B3 and Duration observations by vowel type.
-    vowel index indicates the index in lines[x] which should be taken as identifying vowel categories.
+    Packs the measurements by vowel class. Returns the sorted list of vowel classes,
+    the boundaries of the classes, and an array of the F1, F2, log B1, log B2 and log duration, with one row per variable and one column per
+    measurement (sorted by vowel class; class k is in columns bounds[k]:bounds[k + 1]).
     """
-    vowels = {}
-    #sys.stderr.write("Creating vowel dictionary...")
+    labels = [vm.cd for vm in measurements]
+    values = np.array([[vm.f1, vm.f2, math.log(vm.b1), math.log(vm.b2), math.log(vm.dur)]
+                       for vm in measurements], dtype=float).reshape(-1, 5)
+    classes = sorted(set(labels))
+    index = dict((vowel, k) for k, vowel in enumerate(classes))
+    groups = np.array([index[vowel] for vowel in labels], dtype=int)
+    # (the measurements of each class stay in their original order)
+    order = np.argsort(groups, kind='stable')
+    bounds = np.searchsorted(groups[order], np.arange(len(classes) + 1))
 
-    for vm in measurements:
-        if vm.cd in vowels:
-#            vowels[vowel].append([F1, F2,F3,  B1, B2, B3, Dur])
-            vowels[vm.cd].append(
-                [vm.f1, vm.f2,  math.log(vm.b1), math.log(vm.b2), math.log(vm.dur)])
-        else:
-#            vowels[vowel] = [[F1, F2, F3, B1, B2, B3, Dur]]
-            vowels[vm.cd] = [
-                [vm.f1, vm.f2,  math.log(vm.b1), math.log(vm.b2), math.log(vm.dur)]]
-
-    #sys.stderr.write("Vowel dictionary created\n")
-    return vowels
+    return classes, bounds, np.ascontiguousarray(values[order].T)
 
 
-def excludeOutliers(vowels, vowelMeans, vowelCovs):
+def outlierCutoff(dists):
     """
-    Finds outliers and excludes them.
+    Returns the smallest cutoff (4.75, 5.25, 5.75, ...) for the squared Mahalanobis distances
+    that keeps at least 10 tokens, or None if there is none.
     """
-    # sys.stderr.write("Excluding outlying vowels...")
-    outvowels = {}
-    for vowel in vowels:
-        if vowel in vowelCovs:
-            ntokens = len(vowels[vowel])
-            if ntokens >= 10:
-                outlie = 4.75
-                outvowels[vowel] = pruneVowels(
-                    vowels, vowel, vowelMeans, vowelCovs, outlie)
-            else:
-                outvowels[vowel] = vowels[vowel]
-        else:
-            outvowels[vowel] = vowels[vowel]
-    # sys.stderr.write("excluded.\n")
-    return(outvowels)
+    tenth = np.sort(dists)[MIN_TOKENS - 1]
+    if not np.isfinite(tenth):
+        return None
+    # the cutoff is raised in steps, until it reaches the 10th smallest distance
+    steps = max(int(math.ceil((tenth - OUTLIER_CUTOFF) / OUTLIER_STEP)), 0)
+    while OUTLIER_CUTOFF + steps * OUTLIER_STEP < tenth:
+        steps += 1
+    while steps > 0 and OUTLIER_CUTOFF + (steps - 1) * OUTLIER_STEP >= tenth:
+        steps -= 1
+
+    return OUTLIER_CUTOFF + steps * OUTLIER_STEP
 
 
-def pruneVowels(vowels, vowel, vowelMeans, vowelCovs, outlie):
+def excludeOutliers(values, classes, bounds, vowelMeans, vowelCovs):
     """
-    Tries to prune outlier vowels, making sure enough tokens are left to calculate mahalanobis distance.
+    Finds outliers and excludes them, making sure enough tokens are left to calculate mahalanobis distance.
+    Returns a mask of the tokens that are kept.
     """
-    enough = False
-
-    while not enough:
-        outtokens = []
-        for token in vowels[vowel]:
-            x = np.array(token)
-            dist = mahalanobis(x, vowelMeans[vowel], vowelCovs[vowel])
-            if dist ** 2 <= outlie:
-                outtokens.append(token)
-        if len(outtokens) >= 10:
-            enough = True
-        else:
-            outlie = outlie + 0.5
-
-    return(outtokens)
-
-
-def calculateVowelMeans(vowels):
+    keep = np.ones(values.shape[1], dtype=bool)
+    for k, vowel in enumerate(classes):
+        first, last = bounds[k], bounds[k + 1]
+        if vowel not in vowelCovs or last - first < MIN_TOKENS:
+            continue
+        # the squared distances do not depend on the cutoff, so they are calculated only once
+        dists = mahalanobis_batch(np.ascontiguousarray(values[:, first:last].T),
+                                  vowelMeans[vowel], vowelCovs[vowel]) ** 2
+        cutoff = outlierCutoff(dists)
+        if cutoff is not None:
+            keep[first:last] = dists <= cutoff
+
+    return keep
+
+
+def calculateVowelMeans(values, classes, bounds):
     """
-    calculates [means] and [covariance matrices] for each vowel class.
-    It returns these as numpy arrays in dictionaries indexed by the vowel class.
+    calculates [means] and [inverted covariance matrices] for each vowel class.
+    It returns these as numpy arrays packed by vowel class (ClassParameters).
     """
-    #sys.stderr.write("Calculating vowel means...")
     vowelMeans = {}
     vowelCovs = {}
-    for vowel in vowels:
-        vF1 = np.array([F1 for [F1, F2, B1, B2, Dur] in vowels[vowel]])
-        vF2 = np.array([F2 for [F1, F2, B1, B2, Dur] in vowels[vowel]])
-        vB1 = np.array([B1 for [F1, F2, B1, B2, Dur] in vowels[vowel]])
-        vB2 = np.array([B2 for [F1, F2, B1, B2, Dur] in vowels[vowel]])
-        vDur = np.array([Dur for [F1, F2, B1, B2, Dur] in vowels[vowel]])
-
-        vowelMeans[vowel] = np.array(
-            [vF1.mean(), vF2.mean(), vB1.mean(), vB2.mean(), vDur.mean()])
-        if vF1.shape[0] >= 7:
-            vowel_cov = np.cov(np.vstack((vF1, vF2, vB1, vB2, vDur)))
+    for k, vowel in enumerate(classes):
+        tokens = values[:, bounds[k]:bounds[k + 1]]
+        if tokens.shape[1] == 0:
+            continue
+        vowelMeans[vowel] = tokens.mean(axis=1)
+        if tokens.shape[1] >= 7:
+            vowel_cov = np.cov(tokens)
             if np.linalg.det(vowel_cov) != 0:
                 vowelCovs[vowel] = np.linalg.inv(vowel_cov)
-    #sys.stderr.write("Vowel means calculated\n")
-    return vowelMeans, vowelCovs
+    return ClassParameters(vowelMeans), ClassParameters(vowelCovs)
 
 
-def repredictF1F2(measurements, vowelMeans, vowelCovs, vowels):
+def roundValue(value):
     """
-    Predicts F1 and F2 from the speaker's own vowel distributions based on the mahalanobis distance.
+    Rounds a formant or bandwidth to 0.1 Hz, or returns '' if it is missing.
     """
-    # print "\nREMEASURING..."
-    remeasurements = []
-    for vm in measurements:
-
-        valuesList = []
-        distanceList = []
-        nFormantsList = []
-        vowel = vm.cd
-
-        # if no remeasurement takes place, the new winner index will be automatically zero (see the three cases listed below)
-        # but we actually want to keep the old values for the formant tracks
-        keepOldTracks = True
-
-        for i in range(len(vm.poles)):
-            if len(vm.poles[i]) >= 2:
-                F1 = vm.poles[i][0]
-                F2 = vm.poles[i][1]
-                if len(vm.poles[i]) >= 3 and vm.poles[i][2]:  # could be "None"
-                    F3 = vm.poles[i][2]
-                else:
-                    F3 = "NA"
-                B1 = math.log(vm.bandwidths[i][0])
-                B2 = math.log(vm.bandwidths[i][1])
-                if len(vm.bandwidths[i]) >= 3 and vm.poles[i][2]:
-                    B3 = vm.bandwidths[i][2]
-                else:
-                    B3 = "NA"
-
-                ##nFormants = len(vm.poles[i])
-                lDur = math.log(vm.dur)
-                values = [F1, F2, B1, B2, lDur]
-                outvalues = [F1, F2, F3, B1, B2, B3, lDur]
+    if value is None or value == '':
+        return ''
+    return round(value, 1)
 
-                x = np.array(values)
 
-                # If there is only one member of a vowel category,
-                # the covariance matrix will be filled with NAs
-                # sys.stderr.write(vowel+"\n")
-                if vowel in vowelCovs:
-                    # if no re-measurement is to take place for one of the three reasons below, the list of candidate measurements and nFormants
-                    # will be filled with four identical copies of the original measurement, all with a distance of zero
-                    # so that the original measurement is guaranteed to be
-                    # re-selected
-                    if np.isnan(vowelCovs[vowel][0, 0]):
-                        valuesList.append(
-                            [float(vm.f1), float(vm.f2), vm.f3, math.log(float(vm.b1)), math.log(float(vm.b2)), vm.b3, lDur])
-                        distanceList.append(0)
-                        nFormantsList.append(vm.nFormants)
-                    elif len(vowels[vowel]) < 7:
-                        valuesList.append(
-                            [float(vm.f1), float(vm.f2), vm.f3, math.log(float(vm.b1)), math.log(float(vm.b2)), vm.b3, lDur])
-                        distanceList.append(0)
-                        nFormantsList.append(vm.nFormants)
-                    # "real" re-measurement
-                    else:
-                        dist = mahalanobis(
-                            x, vowelMeans[vowel], vowelCovs[vowel])
-                        valuesList.append(outvalues)
-                        distanceList.append(dist)
-                        nFormantsList.append(
-                            i + 3)  # these are the formant setting used, not the actual number of formants returned
-                        keepOldTracks = False
-                else:
-                    valuesList.append(
-                        [float(vm.f1), float(vm.f2), vm.f3, math.log(float(vm.b1)), math.log(float(vm.b2)), vm.b3, lDur])
-                    distanceList.append(0)
-                    nFormantsList.append(i + 3)
-
-        winnerIndex = distanceList.index(min(distanceList))
-        dist = repr(min(distanceList))
-        bestValues = valuesList[winnerIndex]
-        bestnFormants = nFormantsList[winnerIndex]
-# if bestnFormants != vm.nFormants:
-# print "\tVowel %s in word %s was originally measured with nFormants = %s; now measured with nFormants = %s!" % (vm.phone, vm.word, vm.nFormants, bestnFormants)
-# print "\told formant tracks:\n\t\t%s" % vm.tracks
-# print "\tnew formant tracks:\n\t\t%s\n" % vm.all_tracks[winnerIndex]
+def repredictF1F2(measurements, vowelMeans, vowelCovs, counts):
+    """
+    Predicts F1 and F2 from the speaker's own vowel distributions based on the mahalanobis distance.
+    """
+    # counts = number of tokens of each vowel class
+    # only candidates with at least two formants are considered
+    nSettings = max([len(vm.poles) for vm in measurements] + [0])
+    if not nSettings:
+        return list(measurements)
+    valid = np.array([[i < len(vm.poles) and len(vm.poles[i]) >= 2 for i in range(nSettings)]
+                      for vm in measurements], dtype=bool).reshape(-1, nSettings)
+    # vowels whose class has enough tokens for a covariance matrix are remeasured:  the candidates of all
+    # vowels are scored against the distributions of their classes with a single call
+    remeasured = np.array([vm.cd in vowelCovs and not np.isnan(vowelCovs[vm.cd][0, 0]) and counts[vm.cd] >= 7
+                           for vm in measurements], dtype=bool)
+    queries = valid & remeasured[:, None]
+    rows, settings = np.nonzero(queries)
+    values = []
+    for n, i in zip(rows.tolist(), settings.tolist()):
+        vm = measurements[n]
+        values.append([vm.poles[i][0], vm.poles[i][1], math.log(vm.bandwidths[i][0]), math.log(vm.bandwidths[i][1]),
+                       math.log(vm.dur)])
+    dists = np.full(queries.shape, np.nan)
+    if values:
+        classes = [measurements[n].cd for n in rows.tolist()]
+        dists[rows, settings] = mahalanobis_batch(values, vowelMeans.values[vowelMeans.rows(classes)],
+                                                  vowelCovs.values[vowelCovs.rows(classes)])
+
+    # winner = the first candidate with the smallest distance
+    # (as with min() over the list of distances:  if the distance of the first candidate is undefined, it wins)
+    defined = queries & ~np.isnan(dists)
+    scores = np.where(defined, dists, np.inf)
+    best = scores.min(axis=1)
+    winners = np.argmax(defined & (scores == best[:, None]), axis=1)
+    firsts = np.argmax(valid, axis=1)
+    firstUndefined = ~defined[np.arange(len(measurements)), firsts]
+    winners = np.where(firstUndefined, firsts, winners)
+    # (the index of the winner among the candidates with at least two formants)
+    positions = np.cumsum(valid, axis=1) - 1
 
-        # change formants and bandwidths to new values
-        vm.f1 = round(bestValues[0], 1)
-        vm.f2 = round(bestValues[1], 1)
-        if bestValues[2] != "NA" and bestValues[2] != None:
-            vm.f3 = round(bestValues[2], 1)
-        else:
-            vm.f3 = ''
-        vm.b1 = round(math.exp(bestValues[3]), 1)
-        vm.b2 = round(math.exp(bestValues[4]), 1)
-        if bestValues[5] != "NA" and bestValues[5] != None:
-            try:
-                vm.b3 = round(bestValues[5], 1)
-            except OverflowError:
-                vm.b3 = ''
-        else:
-            vm.b3 = ''
-        vm.nFormants = bestnFormants
+    remeasurements = []
+    for n, vm in enumerate(measurements):
+        if not valid[n].any():
+            remeasurements.append(vm)
+            continue
+        if not remeasured[n]:
+            # the original measurement is kept:
+            # if there is only one member of a vowel category, the covariance matrix will be filled with NAs,
+            # and with less than 7 tokens, no re-measurement takes place either
+            vm.f1 = round(float(vm.f1), 1)
+            vm.f2 = round(float(vm.f2), 1)
+            vm.f3 = roundValue(vm.f3)
+            vm.b1 = round(math.exp(math.log(float(vm.b1))), 1)
+            vm.b2 = round(math.exp(math.log(float(vm.b2))), 1)
+            vm.b3 = roundValue(vm.b3)
+            if vm.cd not in vowelCovs:
+                vm.nFormants = int(firsts[n]) + 3
+            remeasurements.append(vm)
+            continue
+        # "real" re-measurement:  change formants and bandwidths to the values of the winner
+        i = int(winners[n])
+        poles = vm.poles[i]
+        bandwidths = vm.bandwidths[i]
+        vm.f1 = round(poles[0], 1)
+        vm.f2 = round(poles[1], 1)
+        # (F3 and B3 could be "None")
+        vm.f3 = roundValue(poles[2]) if len(poles) >= 3 and poles[2] else ''
+        vm.b1 = round(math.exp(math.log(bandwidths[0])), 1)
+        vm.b2 = round(math.exp(math.log(bandwidths[1])), 1)
+        vm.b3 = roundValue(bandwidths[2]) if len(bandwidths) >= 3 and poles[2] else ''
+        vm.nFormants = i + 3  # these are the formant setting used, not the actual number of formants returned
         # change formant tracks to new values as well
-        if not keepOldTracks:
-            vm.tracks = vm.all_tracks[winnerIndex]
-            vm.winner_poles = vm.all_poles[winnerIndex]
-            vm.winner_bandwidths = vm.all_bandwidths[winnerIndex]
+        vm.tracks = vm.all_tracks[positions[n, i]]
+        vm.winner = int(positions[n, i])
         remeasurements.append(vm)
 
     return remeasurements
@@ -341,11 +256,14 @@ def output(remeasurements):
 
 
 def remeasure(measurements):
-    vowels = createVowelDictionary(measurements)
-    vowelMeans, vowelCovs = calculateVowelMeans(vowels)
-    invowels = excludeOutliers(vowels, vowelMeans, vowelCovs)
-    vowelMeans, vowelCovs = calculateVowelMeans(invowels)
-    remeasurements = repredictF1F2(measurements, vowelMeans, vowelCovs, vowels)
+    classes, bounds, values = packMeasurements(measurements)
+    vowelMeans, vowelCovs = calculateVowelMeans(values, classes, bounds)
+    keep = excludeOutliers(values, classes, bounds, vowelMeans, vowelCovs)
+    # (boundaries of the classes among the tokens that are kept)
+    keptBounds = np.concatenate(([0], np.cumsum(keep)))[bounds]
+    vowelMeans, vowelCovs = calculateVowelMeans(values[:, keep], classes, keptBounds)
+    counts = dict(zip(classes, np.diff(bounds).tolist()))
+    remeasurements = repredictF1F2(measurements, vowelMeans, vowelCovs, counts)
     return remeasurements
 
 # Main Program Starts Here
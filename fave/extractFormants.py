@@ -66,26 +66,37 @@ import sys
 import os
 import shutil
 import argparse
+import copy
+import importlib.util
 import math
 import re
 import time
+import traceback
 import pkg_resources
-import csv
 import pickle
 import subprocess
+import multiprocessing
 from itertools import tee, islice
 from bisect import bisect_left
 
 import numpy as np
 
 import fave
+from fave import audio
 from fave.extract import esps
+from fave.extract.cache import MANIFEST_VERSION, CandidateCache, hashFields, hashFile, readManifest, writeManifest
+from fave.extract.intensity import vowelIntensity
+from fave.extract.lpc import soundToFormants
+from fave.extract.measurementpoint import getFormantTracks, getMeasurementPoint
+from fave.extract.output import MeasurementWriter, writeArrowTable, writeMeasurementTable, writeTrackArchive
 from fave.extract import plotnik
+from fave.extract.records import CandidateArena, Phone, VowelMeasurement, Word, packCandidates
 from fave.extract import vowel
 from fave import praat
 from fave import cmudictionary as cmu
 from fave.extract.remeasure import remeasure
-from fave.extract.mahalanobis import mahalanobis
+from fave.extract.mahalanobis import ClassParameters, mahalanobis_batch
+from fave.extract.normalize import FUNCTION_WORDS, SCALE, groupStatistics, roundValues, valueColumn, zScores
 
 SCRIPTS_HOME = pkg_resources.resource_filename('fave','praatScripts')
 os.chdir(os.getcwd())
@@ -98,31 +109,8 @@ VOWELS = ['AA', 'AE', 'AH', 'AO', 'AW', 'AY', 'EH',
           'ER', 'EY', 'IH', 'IY', 'OW', 'OY', 'UH', 'UW']
 SPECIAL = ['BR', 'CG', 'LS', 'LG', 'NS']
 
-
 #
 
-class Phone:
-
-    """represents a single phone (label, times and Plotnik code (for vowels))"""
-    # !!! not the same as class cmu.Phone !!!
-
-    def __init__(self):
-        self.label = ''  # phone label (Arpabet coding)
-        self.code = ''  # Plotnik vowel code ("xx.xxxxx")
-        self.xmin = None  # beginning of phone
-        self.xmax = None  # end of phone
-        self.cd = ''  # Plotnik code:  vowel class
-        self.fm = ''  # Plotnik code:  following segment - manner
-        self.fp = ''  # Plotnik code:  following segment - place
-        self.fv = ''  # Plotnik code:  following segment - voice
-        self.ps = ''  # Plotnik code:  preceding segment
-        self.fs = ''  # Plotnik code:  following sequences
-        self.overlap = False
-        self.pp = None  # preceding phone (Arpabet label)
-        self.arpa = ''  # Arpabet coding WITHOUT stress digit
-        self.stress = None  # stress digit
-
-
 class Speaker:
 
     """represents a speaker (background info)"""
@@ -142,64 +130,6 @@ class Speaker:
         self.tiernum = None  # tiernum points to phone tier = first tier for given speaker
 
 
-class VowelMeasurement:
-
-    """represents a vowel measurement"""
-    # !!! not the same as class plotnik.VowelMeasurement !!!
-
-    def __init__(self):
-        self.phone = ''  # Arpabet coding
-        self.stress = ''  # stress level ("1", "2", "0")
-        self.style = ''  # style label (if present)
-        self.word = ''  # corresponding word
-        self.f1 = None  # first formant
-        self.f2 = None  # second formant
-        self.f3 = None  # third formant
-        self.b1 = None  # bandwidth of first formant
-        self.b2 = None  # bandwidth of second formant
-        self.b3 = None  # bandwidth of third formant
-        self.t = ''  # time of measurement
-        self.code = ''  # Plotnik vowel code ("xx.xxxxx")
-        self.cd = ''  # Plotnik code for vowel class
-        self.fm = ''  # Plotnik code for manner of following segment
-        self.fp = ''  # Plotnik code for place of following segment
-        self.fv = ''  # Plotnik code for voicing of following segment
-        self.ps = ''  # Plotnik code for preceding segment
-        self.fs = ''  # Plotnik code for following sequences
-        self.text = ''  # ???
-        self.beg = None  # beginning of vowel
-        self.end = None  # end of vowel
-        self.dur = None  # duration of vowel
-        self.poles = []  # original list of poles returned by LPC analysis
-        self.bandwidths = []
-            # original list of bandwidths returned by LPC analysis
-        self.times = []
-        self.winner_poles = []
-        self.winner_bandwidths = []
-        self.all_poles = []
-        self.all_bandwidths = []
-        self.nFormants = None  # actual formant settings used in the measurement (for Mahalanobis distance method)
-        self.glide = ''  # Plotnik glide coding
-        self.norm_f1 = None  # normalized F1
-        self.norm_f2 = None  # normalized F2
-        self.norm_f3 = None  # normalized F3
-        self.tracks = []
-            # formant "tracks" (five sample points at 20%, 35%, 50%, 65% and
-            # 80% of the vowel)
-        self.all_tracks = []
-            # formant "tracks" for all possible formant settings (needed for
-            # remeasurement)
-        self.norm_tracks = []  # normalized formant "tracks"
-        self.pre_seg = ''
-        self.fol_seg = ''
-        self.context = ''
-        self.p_index = ''
-        self.word_trans = ''
-        self.pre_word_trans = ''
-        self.fol_word_trans = ''
-        self.pre_word = ''
-        self.fol_word = ''
-
 class VowelMean:
 
     """represents the mean and standard deviation for a given vowel class"""
@@ -222,16 +152,49 @@ class VowelMean:
         return '<Means for vowel class %s:  means=%s, stdvs=%s, tokens=%s,\nnormalized:  means=%s, stdvs=%s, values:\n\tF1:  %s,\n\tF2:  %s,\n\tF3:  %s>' % (self.pc, self.means, self.stdvs, self.n, self.norm_means, self.norm_stdvs, self.values[0], self.values[1], self.values[2])
 
 
-class Word:
+class ManifestEntry:
+
+    """represents a vowel that has been selected for measurement (phone, word, context and analysis window)"""
+
+    def __init__(self):
+        self.phone = None  # Phone object
+        self.word = None  # Word object
+        self.p_index = ''  # position of the vowel in the word
+        self.context = ''  # "coextensive", "initial", "final" or "internal"
+        self.pre_seg = ''
+        self.fol_seg = ''
+        self.word_trans = ''
+        self.pre_word_trans = ''
+        self.fol_word_trans = ''
+        self.pre_word = ''
+        self.fol_word = ''
+        self.padBeg = None  # padding before the vowel
+        self.padEnd = None  # padding after the vowel
+        self.cacheKey = None  # key of the analysis of the vowel in the cache (if there is one)
+        self.measurementKey = None  # key of the measurement of the vowel in the manifest (--incremental)
 
-    """represents a word (transcription, times and list of phones)"""
+
+class ExtractionLog:
+
+    """represents the statistics and time stamps of the measurement of a sound file (for the log file)"""
 
     def __init__(self):
-        self.transcription = ''  # transcription
-        self.phones = []  # list of phones
-        self.xmin = None  # beginning of word
-        self.xmax = None  # end of word
-        self.style = ''  # style label (if present)
+        self.times = []  # list of (index1, time, index2) time stamps
+        self.maxTime = None  # duration of the sound file
+        self.vowels = 0  # initial number of vowels
+        self.analyzed = 0
+        self.uncertain = 0
+        self.overlaps = 0
+        self.truncated = 0
+        self.stopwords = 0
+        self.unstressed = 0
+        self.too_short = 0
+        self.cached = 0  # number of vowels whose analysis was found in the cache
+        self.reused = 0  # number of vowels whose measurement was reused from the last run (--incremental)
+
+    def mark(self, index1, index2=''):
+        """generates a time stamp entry"""
+        self.times.append((index1, time.time(), index2))
 
 #
 
@@ -330,26 +293,6 @@ def addStyleCodes(words, tg):
     return words
 
 
-def anae(v, formants, times):
-    """returns time of measurement according to the ANAE (2006) guidelines"""
-
-    F1 = [f[0] if len(f) >= 1 else None for f in formants]
-                      # NOTE:  'None' elements in the two formant lists are
-                      # needed
-    F2 = [f[1] if len(f) >= 2 else None for f in formants]
-                      # to preserve the alignment with the 'times' list!
-    # measure at F1 maximum, except for "AE" or "AO"
-    if v == 'AE':
-        i = F2.index(max(F2))
-    elif v == 'AO':
-        i = F2.index(min(F2))
-    else:
-        i = F1.index(max(F1))
-    measurementPoint = times[i]
-
-    return measurementPoint
-
-
 def calculateMeans(measurements):
     """takes a list of vowel measurements and calculates the means for each vowel class"""
 
@@ -359,67 +302,61 @@ def calculateMeans(measurements):
         newmean = VowelMean()
         newmean.pc = p
         means[p] = newmean
-    # process measurements
-    for m in measurements:
-        # only include tokens with primary stress
-        if m.stress != '1':
-            continue
-        # exclude tokens with F1 < 200 Hz
-        if m.f1 < 200:
-            continue
-        # exclude glide measurements
-        if m.glide == 'g':
-            continue
-        # exclude function words
-        if m.word.upper() in ['A', 'AH', 'AM', "AN'", 'AN', 'AND', 'ARE', "AREN'T", 'AS', 'AT', 'AW', 'BECAUSE', 'BUT', 'COULD',
-              'EH', 'FOR', 'FROM', 'GET', 'GONNA', 'GOT', 'GOTTA', 'GOTTEN',
-              'HAD', 'HAS', 'HAVE', 'HE', "HE'S", 'HIGH', 'HUH',
-              'I', "I'LL", "I'M", "I'VE", "I'D", 'IN', 'IS', 'IT', "IT'S", 'ITS', 'JUST', 'MEAN', 'MY',
-              'NAH', 'NOT', 'OF', 'OH', 'ON', 'OR', 'OUR', 'SAYS', 'SHE', "SHE'S", 'SHOULD', 'SO',
-              'THAN', 'THAT', "THAT'S", 'THE', 'THEM', 'THERE', "THERE'S", 'THEY', 'TO', 'UH', 'UM', 'UP',
-              'WAS', "WASN'T", 'WE', 'WERE', 'WHAT', 'WHEN', 'WHICH', 'WHO', 'WITH', 'WOULD',
-              'YEAH', 'YOU', "YOU'VE"]:
-            continue
-        # exclude /ae, e, i, aw/ before nasals
-        if m.cd in ['3', '2', '1', '42'] and m.fm == '4':
-            continue
-        # exclude vowels before /l/
-        if m.fm == '5' and not m.cd == '39':
-            continue
-        # exclude vowels after /w, y/
-        if m.ps == '9':
-            continue
-        # exclude vowels after obstruent + liquid clusters
-        if m.ps == '8':
-            continue
-        # add measurements to means object
-        if m.f1:
-            means[m.cd].values[0].append(m.f1)
-        if m.f2:
-            means[m.cd].values[1].append(m.f2)
-        if m.f3:
-            means[m.cd].values[2].append(m.f3)
-
-        # collect formant tracks
-        means[m.cd].trackvalues.append(m.tracks)
+    # select the tokens for the means
+    stress = np.array([m.stress for m in measurements], dtype=object)
+    cd = np.array([m.cd for m in measurements], dtype=object)
+    fm = np.array([m.fm for m in measurements], dtype=object)
+    ps = np.array([m.ps for m in measurements], dtype=object)
+    # only include tokens with primary stress
+    included = (stress == '1')
+    # exclude tokens with F1 < 200 Hz
+    included &= ~(np.array([m.f1 for m in measurements], dtype=float) < 200)
+    # exclude glide measurements
+    included &= np.array([m.glide != 'g' for m in measurements], dtype=bool)
+    # exclude function words
+    included &= np.array([m.word.upper() not in FUNCTION_WORDS for m in measurements], dtype=bool)
+    # exclude /ae, e, i, aw/ before nasals
+    included &= ~(np.isin(cd, ['3', '2', '1', '42']) & (fm == '4'))
+    # exclude vowels before /l/
+    included &= ~((fm == '5') & (cd != '39'))
+    # exclude vowels after /w, y/
+    included &= (ps != '9')
+    # exclude vowels after obstruent + liquid clusters
+    included &= (ps != '8')
+    selected = [m for m, i in zip(measurements, included) if i]
+    classIndex = {p: k for k, p in enumerate(plotnik.PLOTNIKCODES)}
+    groups = np.array([classIndex[m.cd] for m in selected], dtype=int)
+    nGroups = len(plotnik.PLOTNIKCODES)
+    # (tokens of each vowel class, in their original order)
+    order = np.argsort(groups, kind='stable')
+    bounds = np.searchsorted(groups[order], np.arange(nGroups + 1))
 
     # calculate means and standard deviations
-    for p in plotnik.PLOTNIKCODES:
-        for i in range(3):
-            means[p].n[i] = len(means[p].values[i])
-                                # number of tokens for formant i
-            mean, stdv = mean_stdv(means[p].values[i])
-                                   # mean and standard deviation for formant i
-            if mean:
-                means[p].means[i] = round(mean, 0)
-            if stdv:
-                means[p].stdvs[i] = round(stdv, 0)
-
-        # formant tracks
-        for j in range(10):
-            t_mean, t_stdv = mean_stdv([t[j] for t in means[p].trackvalues if t[j]])
-            if t_mean and t_stdv != None:
-                means[p].trackmeans.append((t_mean, t_stdv))
+    for i, f in enumerate(['f1', 'f2', 'f3']):
+        values = valueColumn([getattr(m, f) for m in selected])
+        n, fmeans, fstdvs = groupStatistics(values, groups, nGroups)
+        classValues = values[order]
+        for k, p in enumerate(plotnik.PLOTNIKCODES):
+            # formant values of the tokens
+            group = classValues[bounds[k]:bounds[k + 1]]
+            means[p].values[i] = group[~np.isnan(group)].tolist()
+            means[p].n[i] = int(n[k])
+            # (no mean and standard deviation if they are 0 or undefined)
+            if fmeans[k] and not np.isnan(fmeans[k]):
+                means[p].means[i] = round(float(fmeans[k]), 0)
+            if fstdvs[k] and not np.isnan(fstdvs[k]):
+                means[p].stdvs[i] = round(float(fstdvs[k]), 0)
+
+    # formant tracks
+    for m in selected:
+        means[m.cd].trackvalues.append(m.tracks)
+    tracks = valueColumn([t for m in selected for t in m.tracks]).reshape(len(selected), 10)
+    trackStatistics = [groupStatistics(tracks[:, j], groups, nGroups) for j in range(10)]
+    for k, p in enumerate(plotnik.PLOTNIKCODES):
+        for n, tmeans, tstdvs in trackStatistics:
+            if tmeans[k] and not np.isnan(tmeans[k]):
+                # (the standard deviation of a single value is 0)
+                means[p].trackmeans.append((float(tmeans[k]), float(tstdvs[k]) if n[k] > 1 else 0))
             else:  # can't leave empty values in the tracks
                 means[p].trackmeans.append(('', ''))
     return means
@@ -443,8 +380,8 @@ def checkLocation(file):
         sys.exit()
 
 
-def checkSpeechSoftware(speechSoftware):
-    """checks that either Praat or ESPS is available as a speech analysis program"""
+def checkSpeechSoftware(speechSoftware, praatPath=''):
+    """checks that either Praat or ESPS is available as a speech analysis program (or that the built-in analysis is used)"""
 
     if speechSoftware in ['ESPS', 'esps']:
         if os.name == 'nt':
@@ -456,11 +393,14 @@ def checkSpeechSoftware(speechSoftware):
         else:
             return 'esps'
     elif speechSoftware in ['praat', 'Praat']:
-        if not ((PRAATPATH and programExists(speechSoftware, PRAATPATH)) or (os.name == 'posix' and programExists(speechSoftware)) or (os.name == 'nt' and programExists('praatcon.exe'))):
+        if not ((praatPath and programExists(speechSoftware, praatPath)) or (os.name == 'posix' and programExists(speechSoftware)) or (os.name == 'nt' and programExists('praatcon.exe'))):
             print("ERROR: Praat was specified as the speech analysis program, but the command 'praat' ('praatcon' for Windows) is not in your path")
             sys.exit()
         else:
             return speechSoftware
+    elif speechSoftware == 'native':
+        # formants and intensity contours are computed in-process (fave.extract.lpc, fave.extract.intensity)
+        return speechSoftware
     else:
         print("ERROR: unsupported speech analysis software %s" % speechSoftware)
         sys.exit()
@@ -524,7 +464,7 @@ def checkWavFile(wavFile):
 def convertTimes(times, offset):
     """adds a specified offset to all time stamps"""
 
-    convertedTimes = [t + offset for t in times]
+    convertedTimes = np.asarray(times, dtype=float) + offset
 
     return convertedTimes
 
@@ -553,145 +493,111 @@ def detectMonophthong(formants, measurementPoint, index):
     return glide
 
 
-def extractPortion(wavFile, vowelWavFile, beg, end, soundEditor):
+def extractPortion(wavFile, vowelWavFile, beg, end, soundEditor, soxCommand='sox', praatCommand='praat'):
     """extracts a single vowel (or any other part) from the main sound file"""
 
     if soundEditor == 'sox':  # this is the default setting, since it's faster
         # force output format because there have been issues with some sound
         # files where Praat could not read the extracted portion
-        os.system(os.path.join(SOXPATH, 'sox') + ' ' + wavFile + ' -t wavpcm ' +
+        os.system(soxCommand + ' ' + wavFile + ' -t wavpcm ' +
                   os.path.join(SCRIPTS_HOME, vowelWavFile) + ' trim ' + str(beg) + ' ' + str(end - beg))
     elif soundEditor == 'praat':
-        os.system(os.path.join(PRAATPATH, PRAATNAME) + ' ' + SCRIPTS_HOME + '/extractSegment.praat ' +
+        os.system(praatCommand + ' ' + SCRIPTS_HOME + '/extractSegment.praat ' +
                   os.path.join(os.path.pardir, wavFile) + ' ' + vowelWavFile + ' ' + str(beg) + ' ' + str(end))
     else:
         pass
 
 
-def faav(phone, formants, times, intensity):
-    """returns the time of measurement according to the FAAV guidelines"""
-
-    # get intensity cutoffs for all vowels not measured one third into the
-    # vowel
-    if (phone.label[:-1] in ["AY", "EY", "OW", "AW"]) or (phone.label[:-1] == "UW" and phone.cd == "73"):
-        # get intensity cutoff at 10% below maximum intensity
-        beg_cutoff, end_cutoff = getIntensityCutoff(intensity.intensities(), intensity.times())
-        # make sure we do have an intensity contour (i.e. several measurement point, and not just one)
-        # if there is only one measurement point in the intensity object, the cutoffs will be identical
-        # in that case, reset the cutoffs to include the whole vowel
-        if beg_cutoff == end_cutoff:
-            beg_cutoff = times[0]
-            end_cutoff = times[-1]
-        # modify cutoffs to make sure we are measuring in the first half of the
-        # vowel
-        beg_cutoff, end_cutoff = modifyIntensityCutoff(beg_cutoff, end_cutoff, phone, intensity.intensities(), intensity.times())
-
-        # measure "AY" and "EY" at F1 maximum
-        # (NOTE:  While "AY" receives extra padding at the beginning to possible go before the segment boundary in the search for an F1 maximum, "EY" does not)
-        if phone.label[:-1] in ["AY", "EY"]:
-            measurementPoint = getTimeOfF1Maximum(formants, times, beg_cutoff, end_cutoff)
-        # measure Tuw at the beginning of the segment
-        elif phone.label[:-1] == "UW" and phone.cd == "73":
-            measurementPoint = max([phone.xmin, beg_cutoff])
-        # measure "OW" and "AW" halfway between beginning of segment and F1
-        # maximum
-        elif phone.label[:-1] in ["OW", "AW"]:
-            maxF1time = getTimeOfF1Maximum(formants, times, beg_cutoff, end_cutoff)
-            if maxF1time > phone.xmin:
-                measurementPoint = max([beg_cutoff, phone.xmin + (maxF1time - phone.xmin) / 2])
-            else:
-                measurementPoint = max([beg_cutoff, phone.xmin])
-    # measure all other vowels at 1/3 of the way into the vowel's duration
-    else:
-        measurementPoint = phone.xmin + (phone.xmax - phone.xmin) / 3
+def getBatchCandidates(wavFile, fileStem, windows, getIntensity, speechSoftware, formantPredictionMethod, nFormants, maxFormant, windowSize, preEmphasis, praatCommand='praat', fileFormat='text'):
+    """returns the formant tracks and intensity contours for a list of portions of the sound file, analyzed in a single pass over the file"""
+
+    # windows = list of (beg, end) tuples
+    # getIntensity = list of flags:  is the intensity contour needed for this portion?
+    # returns a list of (LPCs, intensity) tuples in the order of the windows
+    # (the times of the intensity contours are relative to the beginning of the sound file)
+    # fileFormat = format of the files written by Praat ('text' or 'binary')
+    nFormantsList = getNFormantsList(formantPredictionMethod, nFormants)
+    sound = audio.WavFile(wavFile)
+    sampleRate = sound.sampleRate
+    offsets = [beg for (beg, end) in windows]
+    windows = [getSampleWindow(beg, end, sampleRate) for (beg, end) in windows]
+
+    LPCs = [[] for w in windows]
+    intensities = [praat.Intensity() for w in windows]
+    if speechSoftware == 'native':
+        # formants and intensity contours are analyzed in-process
+        for i, (start, n) in enumerate(windows):
+            LPCs[i] = soundToFormants(sound.samples(start, n), sampleRate, nFormantsList, maxFormant, windowSize, preEmphasis)
+            if getIntensity[i]:
+                intensities[i] = vowelIntensity(sound.samples(start, n, mono=False), sampleRate)
+                intensities[i].change_offset(offsets[i])
+    elif windows:
+        # (process ID in the names, so that several runs do not overwrite each other's files)
+        manifestFile = os.path.join(SCRIPTS_HOME, '%s_%i_manifest.txt' % (fileStem, os.getpid()))
+        collectionFile = os.path.join(SCRIPTS_HOME, '%s_%i_batch.txt' % (fileStem, os.getpid()))
+        f = open(manifestFile, 'w')
+        f.write("beg\tend\tintensity\n")
+        for (start, n), flag in zip(windows, getIntensity):
+            f.write("%r\t%r\t%i\n" % (start / sampleRate, (start + n) / sampleRate, flag))
+        f.close()
+        os.system(praatCommand + ' ' + os.path.join(SCRIPTS_HOME, 'extractBatch.praat') + ' ' +
+                  os.path.abspath(wavFile) + ' ' + manifestFile + ' ' + collectionFile + ' ' + str(nFormantsList[0]) + ' ' +
+                  str(nFormantsList[-1]) + ' ' + str(maxFormant) + ' ' + str(windowSize) + ' ' + str(preEmphasis) + ' burg ' + fileFormat)
+        collection = praat.Collection()
+        collection.read(collectionFile)
+        os.remove(manifestFile)
+        os.remove(collectionFile)
+        # the objects are saved window by window:  Formants first, then the Intensity (if needed)
+        items = iter(collection)
+        for i in range(len(windows)):
+            LPCs[i] = [next(items) for n in nFormantsList]
+            if getIntensity[i]:
+                intensities[i] = next(items)
+                intensities[i].change_offset(offsets[i])
+
+    return list(zip(LPCs, intensities))
+
+
+def getBreathGroups(words):
+    """returns a list of breath groups (stretches of consecutive words between two pauses)"""
+
+    groups = []
+    group = []
+    for w in words:
+        # silences separate breath groups
+        if w.transcription == '' or w.transcription.upper() == "SP":
+            if group:
+                groups.append(group)
+            group = []
+        else:
+            group.append(w)
+    if group:
+        groups.append(group)
 
-    return measurementPoint
+    return groups
 
 
-def getFormantTracks(poles, times, xmin, xmax):
-    """returns formant tracks (values at 20%, 35%, 50%, 65% and 80% of the vowel duration)"""
+def getMaxFormant(speaker):
+    """returns the maximum formant frequency for the LPC analysis, according to speaker sex"""
 
-    tracks = []
-    # total duration of vowel
-    dur = xmax - xmin
-    # get measurement points for formant tracks (20%, 35%, 50%, 65% and 80%
-    # into the vowel)
-    measurement_times = [xmin + (0.2 * dur) + (0.15 * dur * i)
-                         for i in range(5)]
-    for t in measurement_times:
-        index = getTimeIndex(t, times)
-        try:
-            F1 = poles[index][0]
-            F2 = poles[index][1]
-            tracks.append(F1)
-            tracks.append(F2)
-        except IndexError:
-            # if we only have F1 but no matching F2, that measurement is probably not reliable enough
-            # so append nothing for both of them
-            tracks.append('')
-            tracks.append('')
-
-    return tracks
-
-
-def getIntensityCutoff(intensities, times):
-    """returns the beginning and end times for the 10%-below-maximum-intensity interval"""
-
-    # get intensity cutoff and index of maximum intensity
-    z_max = intensities.index(max(intensities))
-    cutoff = 0.9 * max(intensities)
-    # get left boundary
-    z_left = 0
-    for z in range(z_max, -1, -1):
-        if intensities[z] < cutoff:
-            z_left = z + 1
-            break
-    # get right boundary
-    z_right = len(intensities) - 1
-    for z in range(z_max, len(intensities)):
-        if intensities[z] < cutoff:
-            z_right = z - 1
-            break
-
-    beg_cutoff = times[z_left]
-    end_cutoff = times[z_right]
-
-    return beg_cutoff, end_cutoff
-
-
-def getMeasurementPoint(phone, formants, times, intensity, measurementPointMethod):
-    """returns the point of formant measurement, according to the measurement method selected"""
-
-    if measurementPointMethod == 'third':
-        # measure at 1/3 of the way into the vowel's duration
-        measurementPoint = phone.xmin + (phone.xmax - phone.xmin) / 3
-    elif measurementPointMethod == 'fourth':
-        # measure at 1/4 of the way into the vowel's duration
-        measurementPoint = phone.xmin + (phone.xmax - phone.xmin) / 4
-    elif measurementPointMethod == 'mid':
-        # measure at 1/2 of the way into the vowel's duration
-        measurementPoint = phone.xmin + (phone.xmax - phone.xmin) / 2
-    elif measurementPointMethod == 'lennig':
-        # measure according to Lennig (1978)
-        transition = getTransitionLength(phone.xmin, phone.xmax)
-        # remove vowel transitions
-        trimmedFormants, trimmedTimes = trimFormants(formants, times, phone.xmin + transition, phone.xmax - transition)
-        measurementPoint = lennig(trimmedFormants, trimmedTimes)
-    elif measurementPointMethod == 'anae':
-        # measure according to the ANAE (2006) guidelines
-        transition = getTransitionLength(phone.xmin, phone.xmax)
-        # remove vowel transitions
-        trimmedFormants, trimmedTimes = trimFormants(formants, times, phone.xmin + transition, phone.xmax - transition)
-        measurementPoint = anae(phone.label, trimmedFormants, trimmedTimes)
-    elif measurementPointMethod == 'faav':
-        measurementPoint = faav(phone, formants, times, intensity)
-    elif measurementPointMethod == 'maxint':
-        measurementPoint = maximumIntensity(intensity.intensities(), intensity.times())
+    if speaker.sex in ["m", "M", "male", "MALE"]:
+        maxFormant = 5000
+    elif speaker.sex in ["f", "F", "female", "FEMALE"]:
+        maxFormant = 5500
     else:
-        print("ERROR: Unsupported measurement point selection method %s" % measurementPointMethod)
-        print(__doc__)
+        sys.exit("ERROR!  Speaker sex undefined.")
 
-    return measurementPoint
+    return maxFormant
+
+
+def getNFormantsList(formantPredictionMethod, nFormants):
+    """returns the numbers of formants for which the LPC analysis is run"""
+
+    if formantPredictionMethod == 'mahalanobis':
+        # get measurements for nFormants = 3, 4, 5, 6
+        return list(range(3, 7))
+    else:
+        return [nFormants]
 
 
 def getNumVowels(word):
@@ -732,13 +638,49 @@ def getPadding(phone, windowSize, maxTime):
     return (padBeg, padEnd)
 
 
-def getSoundEditor():
+def getSampleWindow(beg, end, sampleRate):
+    """returns the first sample and the number of samples of a portion of a sound file, counted the same way as SoX's trim effect"""
+
+    start = int(beg * sampleRate + 0.5)
+    n = int((end - beg) * sampleRate + 0.5)
+
+    return (start, n)
+
+
+def getSlicedCandidates(candidates, regionBeg, entry, windowSize):
+    """cuts the formant tracks and intensity contour of a single vowel out of those of the region that contains it"""
+
+    # candidates = (LPCs, intensity) of the region
+    # as for a separate analysis of the vowel, only frames whose analysis window lies
+    # entirely within the padded vowel are kept, and the times of the formant tracks
+    # are relative to the beginning of the padded vowel
+    LPCs, intensity = candidates
+    beg = entry.phone.xmin - entry.padBeg
+    end = entry.phone.xmax + entry.padEnd
+    # (all times are rounded to ms)
+    tolerance = 0.0005
+    vowelLPCs = []
+    for lpc in LPCs:
+        part = lpc.extract_part(beg - regionBeg + windowSize - tolerance, end - regionBeg - windowSize + tolerance)
+        part.change_offset(regionBeg - beg)
+        vowelLPCs.append(part)
+    if needsIntensity(entry.phone):
+        # minimum pitch 100 Hz -> 64 ms analysis window (shorter for very short vowels)
+        halfWindow = min(0.032, 0.5 * (end - beg))
+        intensity = intensity.extract_part(beg + halfWindow - tolerance, end - halfWindow + tolerance)
+    else:
+        intensity = praat.Intensity()
+
+    return (vowelLPCs, intensity)
+
+
+def getSoundEditor(soxPath='', praatPath=''):
     """checks whether SoX or Praat are available as sound editors"""
 
     # use sox for manipulating the files if we have it, since it's faster
-    if (SOXPATH and programExists('sox', SOXPATH)) or (os.name == 'posix' and programExists('sox')) or (os.name == 'nt' and programExists('sox.exe')):
+    if (soxPath and programExists('sox', soxPath)) or (os.name == 'posix' and programExists('sox')) or (os.name == 'nt' and programExists('sox.exe')):
         soundEditor = 'sox'
-    elif (PRAATPATH and programExists('praat', PRAATPATH)) or (os.name == 'posix' and programExists('praat')) or (os.name == 'nt' and programExists('praatcon.exe')):
+    elif (praatPath and programExists('praat', praatPath)) or (os.name == 'posix' and programExists('praat')) or (os.name == 'nt' and programExists('praatcon.exe')):
         soundEditor = 'praat'
     else:
         print("ERROR:  neither 'praat' ('praatcon' for Windows) nor 'sox' can be found in your path")
@@ -748,7 +690,7 @@ def getSoundEditor():
     return soundEditor
 
 
-def getSpeakerBackground(speakername, speakernum):
+def getSpeakerBackground(speakername, speakernum, formantPredictionMethod):
     """prompts the user to enter background information for a given speaker"""
 
     speaker = Speaker()
@@ -797,62 +739,44 @@ def getSpeakerBackground(speakername, speakernum):
     return speaker
 
 
-def getTimeIndex(t, times):
-    """gets the index of the nearest time value from an ordered list of times"""
-
-    # the two following cases can happen if a short vowel is at the beginning
-    # or end of a file
-    if t < times[0]:
-        # print "WARNING:  measurement point %f is less than earliest time stamp %f for formant measurements, selecting earliest point as measurement" % (t, times[0])
-        # return the index of the first measurement
-        return 0
-
-    if t > times[-1]:
-        # print "WARNING:  measurement point %f is less than latest time stamp %f for formant measurements, selecting latest point as measurement" % (t, times[-1])
-        # return the index of the last measurement
-        return len(times) - 1
-
-    prev_time = 0.0
-    for i in range(len(times)):
-        if t > times[i]:
-            prev_time = times[i]
-            continue
-        else:
-            # determine nearest index
-            if abs(t - prev_time) > abs(t - times[i]):
-                return i
-            else:
-                return i - 1
-
-
-def getTimeOfF1Maximum(formants, times, beg_cutoff, end_cutoff):
-    """returns the time at which F1 reaches it maximum (within the cutoff limits)"""
-
-    # get search interval for F1 maximum
-    trimmedFormants, trimmedTimes = trimFormants(formants, times, beg_cutoff, end_cutoff)
-    # get F1 maximum
-    F1 = [f[0] if f else 0 for f in trimmedFormants]
-        # 'else' for those weird cases where there is a hole in the formant tracks...
-    i = F1.index(max(F1))
-    measurementPoint = trimmedTimes[i]
-
-    return measurementPoint
+def getTrackingRegions(manifest, words, formantTracking):
+    """returns the portions of the sound file for which formant tracks are computed, and the region of each vowel in the manifest"""
 
+    # formantTracking = 'breathGroup':  one region per breath group
+    #                   'file':  one region for the whole file
+    # each region spans the (padded) windows of all the vowels it contains
+    if formantTracking == 'breathGroup':
+        groupIndex = {}
+        for i, group in enumerate(getBreathGroups(words)):
+            for w in group:
+                groupIndex[id(w)] = i
+        keys = [groupIndex[id(e.word)] for e in manifest]
+    else:
+        keys = [0 for e in manifest]
 
-def getTransitionLength(minimum, maximum):
-    """sets the transition time to the surrounding consonants to 20msec; if the vowel is shorter than 40msec, to zero"""
+    regions = []
+    regionIndex = []
+    positions = {}
+    for key, e in zip(keys, manifest):
+        beg = e.phone.xmin - e.padBeg
+        end = e.phone.xmax + e.padEnd
+        if key not in positions:
+            positions[key] = len(regions)
+            regions.append([beg, end])
+        region = regions[positions[key]]
+        region[0] = min(region[0], beg)
+        region[1] = max(region[1], end)
+        regionIndex.append(positions[key])
 
-    # needed to remove transitions for Lennig and ANAE measurement methods
-    if round(maximum - minimum, 3) <= 0.04:
-        transition = 0
-    else:
-        transition = 0.02
+    return [tuple(r) for r in regions], regionIndex
 
-    return transition
 
+def getVowelCandidates(vowelFileStem, p, speechSoftware, formantPredictionMethod, nFormants, maxFormant, windowSize, preEmphasis, padBeg, padEnd, sound=None, praatCommand='praat', fileFormat='text'):
+    """returns the formant tracks (one Formant object per candidate number of formants) and the intensity contour of a vowel"""
 
-def getVowelMeasurement(vowelFileStem, p, w, speechSoftware, formantPredictionMethod, measurementPointMethod, nFormants, maxFormant, windowSize, preEmphasis, padBeg, padEnd, speaker):
-    """makes a vowel measurement"""
+    # sound = audio.WavFile for the whole recording (only for the native analysis, which
+    # reads the samples of the vowel directly instead of from an extracted file)
+    # fileFormat = format of the files written by Praat ('text' or 'binary')
 
     vowelWavFile = vowelFileStem + '.wav'
 
@@ -869,59 +793,46 @@ def getVowelMeasurement(vowelFileStem, p, w, speechSoftware, formantPredictionMe
             fmt.read(vowelFileStem + '.pole', vowelFileStem + '.fb')
         # clean up the temporary files we created for this vowel
         esps.rmFormantFiles(vowelFileStem)
-    # via Praat:  ## NOTE:  all temp files are in the "/bin" directory!
-    else:   # assume praat here
-        if formantPredictionMethod == 'mahalanobis':
-            # get measurements for nFormants = 3, 4, 5, 6
+    else:
+        # all candidate numbers of formants are analyzed in one pass
+        nFormantsList = getNFormantsList(formantPredictionMethod, nFormants)
+        # get Intensity object for intensity cutoff
+        # (only for those vowels where we need it)
+        getIntensity = needsIntensity(p)
+        # in-process Burg LPC analysis (same settings as extractFormants.praat)
+        if speechSoftware == 'native':
+            start, n = getSampleWindow(p.xmin - padBeg, p.xmax + padEnd, sound.sampleRate)
+            LPCs = soundToFormants(sound.samples(start, n), sound.sampleRate, nFormantsList, maxFormant, windowSize, preEmphasis)
+            # in-process intensity analysis (same settings as getIntensity.praat)
+            if getIntensity:
+                intensity = vowelIntensity(sound.samples(start, n, mono=False), sound.sampleRate)
+                intensity.change_offset(p.xmin - padBeg)
+            else:
+                intensity = praat.Intensity()
+        # via Praat:  ## NOTE:  all temp files are in the "/bin" directory!
+        else:   # assume praat here
+            os.system(praatCommand + ' ' + os.path.join(SCRIPTS_HOME, 'extractCandidates.praat') + ' ' +
+                      vowelWavFile + ' ' + str(nFormantsList[0]) + ' ' + str(nFormantsList[-1]) + ' ' + str(maxFormant) + ' ' +
+                      str(windowSize) + ' ' + str(preEmphasis) + ' burg ' + str(int(getIntensity)) + ' ' + fileFormat)
             LPCs = []
-            nFormants = 3
-            while nFormants <= 6:
-                os.system(os.path.join(PRAATPATH, PRAATNAME) + ' ' + os.path.join(SCRIPTS_HOME, 'extractFormants.praat') + ' ' +
-                          vowelWavFile + ' ' + str(nFormants) + ' ' + str(maxFormant) + ' ' ' ' + str(windowSize) + ' ' + str(preEmphasis) + ' burg')
+            for n in nFormantsList:
                 lpc = praat.Formant()
-                lpc.read(os.path.join(SCRIPTS_HOME, vowelFileStem + '.Formant'))
+                lpc.read(os.path.join(SCRIPTS_HOME, vowelFileStem + '_' + str(n) + '.Formant'))
+                os.remove(os.path.join(SCRIPTS_HOME, vowelFileStem + '_' + str(n) + '.Formant'))
                 LPCs.append(lpc)
-                nFormants += 1
-        else:
-            os.system(os.path.join(PRAATPATH, PRAATNAME) + ' ' + os.path.join(SCRIPTS_HOME, 'extractFormants.praat') + ' ' +
-                      vowelWavFile + ' ' + str(nFormants) + ' ' + str(maxFormant) + ' ' + str(windowSize) + ' ' + str(preEmphasis) + ' burg')
-            fmt = praat.Formant()
-            fmt.read(os.path.join(SCRIPTS_HOME, vowelFileStem + '.Formant'))
-        os.remove(os.path.join(SCRIPTS_HOME, vowelFileStem + '.Formant'))
-        # get Intensity object for intensity cutoff
-        # (only for those vowels where we need it)
-        if (p.label[:-1] in ["AY", "EY", "OW", "AW"]) or (p.label[:-1] == "UW" and p.cd == "73"):
-            os.system(os.path.join(PRAATPATH, PRAATNAME) + ' ' + os.path.join(SCRIPTS_HOME, 'getIntensity.praat') + ' ' + vowelWavFile)
-            intensity = praat.Intensity()
-            intensity.read(os.path.join(SCRIPTS_HOME, vowelFileStem + '.Intensity'))
-            os.remove(os.path.join(SCRIPTS_HOME, vowelFileStem + '.Intensity'))
-            intensity.change_offset(p.xmin - padBeg)
-        else:
-            intensity = praat.Intensity()
-    # get measurement according to formant prediction method
-    # Mahalanobis:
-    if formantPredictionMethod == 'mahalanobis':
-        convertedTimes = []
-        poles = []
-        bandwidths = []
-        for lpc in LPCs:
-            convertedTimes.append(convertTimes(lpc.times(), p.xmin - padBeg))
-                                  # add offset to all time stamps from Formant
-                                  # file
-            poles.append(lpc.formants())
-            bandwidths.append(lpc.bandwidths())
-        vm = measureVowel(p, w, poles, bandwidths, convertedTimes, intensity, measurementPointMethod,
-            formantPredictionMethod, padBeg, padEnd, means, covs)
-    # default:
-    else:   # assume 'default' here
-        convertedTimes = [convertTimes(fmt.times(), p.xmin - padBeg)]
-        formants = [fmt.formants()]
-        bandwidths = [fmt.bandwidths()]
-        vm = measureVowel(p, w, formants, bandwidths, convertedTimes, intensity, measurementPointMethod,
-            formantPredictionMethod, padBeg, padEnd, '', '')
+            if getIntensity:
+                intensity = praat.Intensity()
+                intensity.read(os.path.join(SCRIPTS_HOME, vowelFileStem + '.Intensity'))
+                os.remove(os.path.join(SCRIPTS_HOME, vowelFileStem + '.Intensity'))
+                intensity.change_offset(p.xmin - padBeg)
+            else:
+                intensity = praat.Intensity()
+    if speechSoftware == 'esps' and formantPredictionMethod != 'mahalanobis':
+        LPCs = [fmt]
 
-    os.remove(os.path.join(SCRIPTS_HOME, vowelWavFile))
-    return vm
+    if speechSoftware != 'native':
+        os.remove(os.path.join(SCRIPTS_HOME, vowelWavFile))
+    return (LPCs, intensity)
 
 
 def getWordsAndPhones(tg, phoneset, speaker, vowelSystem):
@@ -950,11 +861,6 @@ def getWordsAndPhones(tg, phoneset, speaker, vowelSystem):
             phone.xmin = p.xmin()
             phone.xmax = p.xmax()
             word.phones.append(phone)
-            # count initial number of vowels here! (because uncertain
-            # transcriptions are discarded on a by-word basis)
-            if phone.label and isVowel(phone.label):
-                global count_vowels
-                count_vowels += 1
 
         words.append(word)
 
@@ -991,26 +897,8 @@ def isVowel(label):
         return False
 
 
-def lennig(formants, times):
-    """returns time of measurement according to Lennig's (1987) algorithm"""
-
-    # initialize this to a number that will be larger than any of the change
-    # coefficients
-    prev = 1000000
-    min_i = -1
-    for i in range(1, len(formants) - 1):
-        c = (abs(formants[i][0] - formants[i - 1][0]) + abs(formants[i][0] - formants[i + 1][0])) / \
-            formants[i][0] + (abs(formants[i][1] - formants[i - 1][1]) + abs(formants[i][1] - formants[i + 1][1])) / formants[i][1]
-        if c < prev:
-            min_i = i
-            prev = c
-    measurementPoint = times[i]
-
-    return measurementPoint
-
-
 def loadCovs(inFile):
-    """reads covariance matrix of training data set from file"""
+    """reads covariance matrix of training data set from file; returns the inverted matrices, packed by vowel class"""
 
     covs = {}
     for line in open(inFile, 'rU').readlines():
@@ -1018,11 +906,11 @@ def loadCovs(inFile):
         values = np.array([float(x) for x in line.strip().split('\t')[1:]])
         covs[vowel] = np.linalg.inv(np.reshape(values, (4, -1)))
 
-    return covs
+    return ClassParameters(covs)
 
 
 def loadMeans(inFile):
-    """reads formant means of training data set from file"""
+    """reads formant means of training data set from file; returns the means, packed by vowel class"""
 
     means = {}
     for line in open(inFile, 'rU').readlines():
@@ -1030,51 +918,40 @@ def loadMeans(inFile):
         means[vowel] = np.array([float(x)
                                 for x in line.strip().split('\t')[1:]])
 
-    return means
-
-
-def markTime(index1, index2=''):
-    """generates a time stamp entry in global list logtimes[]"""
-
-    real_time = time.time()
-    logtimes.append((index1, real_time, index2))
-
-
-def maximumIntensity(intensities, times):
-    """returns the time of the intensity maximum"""
-
-    i = intensities.index(max(intensities))
-    measurementPoint = times[i]
-
-    return measurementPoint
+    return ClassParameters(means)
 
 
-def mean_stdv(valuelist):
-    """returns the arithmetic mean and sample standard deviation (N-1 in the denominator) of a list of values"""
+def measureFormants(p, w, LPCs, intensity, formantPredictionMethod, measurementPointMethod, padBeg, padEnd, means, covs, nSmoothing):
+    """makes a vowel measurement from the formant tracks of a vowel (one Formant object per candidate number of formants)"""
 
-    n = len(valuelist)
-    if n > 0:
-        if n == 1:
-            mean = valuelist[0]
-            stdv = 0
-        else:
-            sum_i = 0
-            for i in range(n):
-                sum_i += valuelist[i]
-            mean = sum_i / n
-            diffsum_i = 0
-            for i in range(n):
-                diffsum_i += (valuelist[i] - mean) ** 2
-            stdv = math.sqrt(diffsum_i / (n - 1))
+    # get measurement according to formant prediction method
+    # Mahalanobis:
+    if formantPredictionMethod == 'mahalanobis':
+        convertedTimes = []
+        poles = []
+        bandwidths = []
+        for lpc in LPCs:
+            convertedTimes.append(convertTimes(lpc.times(), p.xmin - padBeg))
+                                  # add offset to all time stamps from Formant
+                                  # file
+            poles.append(lpc.formants())
+            bandwidths.append(lpc.bandwidths())
+        vm = measureVowel(p, w, poles, bandwidths, convertedTimes, intensity, measurementPointMethod,
+            formantPredictionMethod, padBeg, padEnd, means, covs, nSmoothing)
+    # default:
+    else:   # assume 'default' here
+        fmt = LPCs[0]
+        convertedTimes = [convertTimes(fmt.times(), p.xmin - padBeg)]
+        formants = [fmt.formants()]
+        bandwidths = [fmt.bandwidths()]
+        vm = measureVowel(p, w, formants, bandwidths, convertedTimes, intensity, measurementPointMethod,
+            formantPredictionMethod, padBeg, padEnd, '', '', nSmoothing)
 
-    else:  # empty list
-        mean = None
-        stdv = None
 
-    return mean, stdv
+    return vm
 
 
-def measureVowel(phone, word, poles, bandwidths, times, intensity, measurementPointMethod, formantPredictionMethod, padBeg, padEnd, means, covs):
+def measureVowel(phone, word, poles, bandwidths, times, intensity, measurementPointMethod, formantPredictionMethod, padBeg, padEnd, means, covs, nSmoothing):
     """returns vowel measurement (formants, bandwidths, labels, Plotnik codes)"""
 
     # smooth formant tracks and bandwidths, if desired
@@ -1089,6 +966,8 @@ def measureVowel(phone, word, poles, bandwidths, times, intensity, measurementPo
             poles = [smoothTracks(p, nSmoothing) for p in poles]
             bandwidths = [smoothTracks(b, nSmoothing) for b in bandwidths]
             times = [t[nSmoothing:-nSmoothing] for t in times]
+    # formant tracks as arrays (one row per frame, padded with NaN) for finding the measurement point
+    formantArrays = [praat.pad_frames(p) for p in poles]
 
     if formantPredictionMethod == 'mahalanobis':
         selectedpoles = []
@@ -1102,12 +981,11 @@ def measureVowel(phone, word, poles, bandwidths, times, intensity, measurementPo
             # For "lennig", "anae" and "faav", which depend on the shape of the
             # formant tracks, different results will be obtained for different
             # nFormants settings.
-            measurementPoint = getMeasurementPoint(phone, poles[j], times[j], intensity, measurementPointMethod)
-            i = getTimeIndex(measurementPoint, times[j])
+            measurementPoint, i = getMeasurementPoint(phone, formantArrays[j], times[j], intensity, measurementPointMethod)
             measurementPoints.append((measurementPoint, i))
             selectedpoles.append(poles[j][i])
             selectedbandwidths.append(bandwidths[j][i])
-            all_tracks.append(getFormantTracks(poles[j], times[j], phone.xmin-padBeg, phone.xmax+padEnd))
+            all_tracks.append(getFormantTracks(formantArrays[j], times[j], phone.xmin-padBeg, phone.xmax+padEnd))
 
         f1, f2, f3, b1, b2, b3, winnerIndex = predictF1F2(phone, selectedpoles, selectedbandwidths, means, covs)
         # check that we actually do have a measurement (this may not be the
@@ -1116,13 +994,10 @@ def measureVowel(phone, word, poles, bandwidths, times, intensity, measurementPo
             return None
         measurementPoint = measurementPoints[winnerIndex][0]
         # get five sample points of selected formant tracks
-        winner_poles = poles[winnerIndex]
-        winner_bandwidths = bandwidths[winnerIndex]
         tracks = all_tracks[winnerIndex]
 
     else:  # formantPredictionMethod == 'default'
-        measurementPoint = getMeasurementPoint(phone, poles[0], times[0], intensity, measurementPointMethod)
-        i = getTimeIndex(measurementPoint, times[0])
+        measurementPoint, i = getMeasurementPoint(phone, formantArrays[0], times[0], intensity, measurementPointMethod)
         # (changed this so that "poles"/"bandwidths" only reflects measurements made at measurement point -
         # same as for Mahalanobis distance method)
         selectedpoles = poles[0][i]
@@ -1146,10 +1021,9 @@ def measureVowel(phone, word, poles, bandwidths, times, intensity, measurementPo
         else:
             b3 = ''
         # get five sample points of formant tracks
-        tracks = getFormantTracks(poles[0], times[0], phone.xmin, phone.xmax)
+        tracks = getFormantTracks(formantArrays[0], times[0], phone.xmin, phone.xmax)
         all_tracks = []
-        winner_poles = poles[0]
-        winner_bandwidths = bandwidths[0]
+        winnerIndex = 0
 
     # put everything together into VowelMeasurement object
     vm = VowelMeasurement()
@@ -1168,7 +1042,7 @@ def measureVowel(phone, word, poles, bandwidths, times, intensity, measurementPo
         vm.b2 = round(b2, 1)
     if b3 != '':
         vm.b3 = round(b3, 1)
-    vm.t = round(measurementPoint, 3)  # measurement time (rounded to msec)
+    vm.t = round(float(measurementPoint), 3)  # measurement time (rounded to msec)
     vm.code = phone.code  # Plotnik vowel code (whole code?)
     vm.cd = phone.cd  # Plotnik code for vowel class
     vm.fm = phone.fm  # Plotnik code for manner of following segment
@@ -1182,7 +1056,6 @@ def measureVowel(phone, word, poles, bandwidths, times, intensity, measurementPo
                    # duration of vowel (rounded to msec)
     vm.poles = selectedpoles  # original poles returned by LPC analysis
     vm.bandwidths = selectedbandwidths  # original bandwidths returned by LPC analysis
-    vm.times = times
 
     if formantPredictionMethod == 'mahalanobis':
         vm.nFormants = winnerIndex + \
@@ -1192,143 +1065,84 @@ def measureVowel(phone, word, poles, bandwidths, times, intensity, measurementPo
                                          winnerIndex][0], measurementPoints[winnerIndex][1])
     vm.tracks = tracks  # F1 and F2 measurements at 20%, 35%, 50%, 65% and 80% of the vowel duration
     vm.all_tracks = all_tracks  # list of formant tracks for all possible formant settings (needed for remeasurement)
-    vm.winner_bandwidths = winner_bandwidths
-    vm.winner_poles = winner_poles
-    vm.all_poles = poles
-    vm.all_bandwidths = bandwidths
-    vm.times = times
+    vm.winner = winnerIndex
+    # candidate formant tracks of all formant settings (moved into the CandidateArena of the file)
+    vm.candidates = packCandidates(times, poles, bandwidths)
 
     return vm
 
 
-def modifyIntensityCutoff(beg_cutoff, end_cutoff, phone, intensities, times):
-    """modifies initial intensity cutoff to ensure measurement takes place in the first half of the vowel"""
-
-    midpoint = phone.xmin + (phone.xmax - phone.xmin) / 2
+def needsIntensity(phone):
+    """checks whether the intensity contour is needed for the measurement of a vowel (for the intensity cutoff)"""
 
-    # no matter where the intensity contour drops, we want to measure in the first half of the vowel
-    # (second condition is to ensure that there are still formants in the selected frames -
-    # this might not be the case e.g. with a long segment of
-    # glottalization/silence included at the beginning of the vowel)
-    if end_cutoff > midpoint and midpoint > beg_cutoff:
-        end_cutoff = midpoint
-    # exclude cases where the intensity maximum is at the end of the segment
-    # (because of a following vowel)
-    if beg_cutoff > midpoint:
-        # in this case, look for new intensity maximum and cutoffs in the first
-        # half of the vowel
-        trimmedIntensities, trimmedTimes = trimFormants(intensities, times, phone.xmin, midpoint)
-        beg_cutoff, end_cutoff = getIntensityCutoff(trimmedIntensities, trimmedTimes)
-
-    return beg_cutoff, end_cutoff
+    return (phone.label[:-1] in ["AY", "EY", "OW", "AW"]) or (phone.label[:-1] == "UW" and phone.cd == "73")
 
 
 def normalize(measurements, m_means):
     """normalized measurements according to the Lobanov method"""
 
-    values = [[], [], []]
+    # get overall means and standard deviations for each formant
     grand_means = [0, 0, 0]
     grand_stdvs = [0, 0, 0]
-    # collect measurement values for each formant
-    for m in measurements:
-        if m.f1:
-            values[0].append(m.f1)
-        if m.f2:
-            values[1].append(m.f2)
-        if m.f3:
-            values[2].append(m.f3)
-    # get overall means and standard deviations for each formant
-    for i in range(3):
-        grand_means[i], grand_stdvs[i] = mean_stdv(values[i])
+    for i, f in enumerate(['f1', 'f2', 'f3']):
+        n, mean, stdv = groupStatistics(valueColumn([getattr(m, f) for m in measurements]),
+                                        np.zeros(len(measurements), dtype=int), 1)
+        grand_means[i], grand_stdvs[i] = float(mean[0]), float(stdv[0])
 
     # normalize individual measurements
-    for m in measurements:
-        try:
-            m.norm_f1 = round(650 + 150 * (lobanov(m.f1, grand_means[0], grand_stdvs[0])), 0)
-        except TypeError:
-            m.norm_f1 = ''
-        try:
-            m.norm_f2 = round(1700 + 420 * (lobanov(m.f2, grand_means[1], grand_stdvs[1])), 0)
-        except TypeError:
-            m.norm_f2 = ''
-# try:
-##            m.norm_f3 = round(lobanov(m.f3, grand_means[2], grand_stdvs[2]), 0)
-# except TypeError:
-##            m.norm_f3 = None
-        m.norm_f3 = ''  # don't normalize F3 right now - we don't have any reasonable scaling factors
-
-        # normalize formant tracks for individual measurements
-        for i in range(5):
-            if m.tracks[2 * i] and m.tracks[2 * i + 1]:
-                m.norm_tracks.append(round(650 + 150 * (lobanov(m.tracks[2 * i], grand_means[0], grand_stdvs[0])), 0))  # F1
-                m.norm_tracks.append(round(1700 + 420 * (lobanov(m.tracks[2 * i + 1], grand_means[1], grand_stdvs[1])), 0))  # F2
-            else:
-                m.norm_tracks.append('')  # F1
-                m.norm_tracks.append('')  # F2
-
-    # normalize the means and standard deviations for F1 and F2
-    for p in plotnik.PLOTNIKCODES:
-        # F1 mean
-        try:
-            m_means[p].norm_means[0] = round(650 + 150 * (lobanov(m_means[p].means[0], grand_means[0], grand_stdvs[0])), 0)
-        except TypeError:
-# print "No F1 normalized mean for vowel class %s:  value = %s, mean = %s,
-# stdv = %s." % (p, m_means[p].means[0], grand_means[0], grand_stdvs[0])
-            m_means[p].norm_means[0] = ''
-        # F1 standard deviation
-        try:
-            m_means[p].norm_stdvs[0] = round(150 * (m_means[p].stdvs[0] / grand_stdvs[0]), 0)
-        except TypeError:
-# print "No F1 normalized standard deviation for vowel class %s:  value =
-# %s, stdv = %s." % (p, m_means[p].stdvs[0], grand_stdvs[0])
-            m_means[p].norm_stdvs[0] = ''
-        # F2 mean
-        try:
-            m_means[p].norm_means[1] = round(1700 + 420 * (lobanov(m_means[p].means[1], grand_means[1], grand_stdvs[1])), 0)
-        except TypeError:
-# print "No F2 normalized mean for vowel class %s:  value = %s, mean = %s,
-# stdv = %s." % (p, m_means[p].means[1], grand_means[1], grand_stdvs[1])
-            m_means[p].norm_means[1] = ''
-        # F2 standard deviation
-        try:
-            m_means[p].norm_stdvs[1] = round(420 * (m_means[p].stdvs[1] / grand_stdvs[1]), 0)
-        except TypeError:
-# print "No F2 normalized standard deviation for vowel class %s:  value =
-# %s, stdv = %s." % (p, m_means[p].stdvs[1], grand_stdvs[1])
-            m_means[p].norm_stdvs[1] = ''
-
-        # normalize mean formant tracks
-        for i in range(5):
-            try:
-                m_means[p].trackmeans_norm.append((round(650 + 150 * (lobanov(m_means[
-                        p].trackmeans[
-                        2 * i][0], grand_means[0], grand_stdvs[0])), 0),
-                     round(150 * (m_means[p].trackmeans[2 * i][1] / grand_stdvs[0]), 0)))  # mean and stdv for F1
-            except TypeError:
-                m_means[p].trackmeans_norm.append(('', ''))
-            try:
-                m_means[p].trackmeans_norm.append((round(1700 + 420 * (lobanov(m_means[
-                        p].trackmeans[
-                        2 * i + 1][0], grand_means[1], grand_stdvs[1])), 0),
-                     round(420 * (m_means[p].trackmeans[2 * i + 1][1] / grand_stdvs[1]), 0)))
-            except TypeError:
-                m_means[p].trackmeans_norm.append(('', ''))
-
-# print m_means[p]
-# print "\n"
+    # (F3 is not normalized right now - we don't have any reasonable scaling factors)
+    norm = []
+    for i, f in enumerate(['f1', 'f2']):
+        offset, factor = SCALE[i]
+        z = zScores(valueColumn([getattr(m, f) for m in measurements]), grand_means[i], grand_stdvs[i])
+        norm.append(roundValues(offset + factor * z))
+    # normalize formant tracks for individual measurements
+    # (only points with both F1 and F2)
+    tracks = valueColumn([t for m in measurements for t in m.tracks]).reshape(len(measurements), 5, 2)
+    tracks[np.isnan(tracks).any(axis=2)] = np.nan
+    norm_tracks = np.empty(tracks.shape)
+    for i in range(2):
+        offset, factor = SCALE[i]
+        norm_tracks[:, :, i] = offset + factor * zScores(tracks[:, :, i], grand_means[i], grand_stdvs[i])
+    norm_tracks = roundValues(norm_tracks.ravel())
+    for k, m in enumerate(measurements):
+        m.norm_f1 = norm[0][k]
+        m.norm_f2 = norm[1][k]
+        m.norm_f3 = ''
+        m.norm_tracks = norm_tracks[10 * k:10 * k + 10]
+
+    # normalize the means and standard deviations for F1 and F2, and the mean formant tracks
+    # (one row per vowel class)
+    normTracks = []
+    with np.errstate(invalid='ignore', divide='ignore'):
+        for i in range(2):
+            offset, factor = SCALE[i]
+            classMeans = valueColumn([m_means[p].means[i] for p in plotnik.PLOTNIKCODES])
+            classStdvs = np.array([np.nan if m_means[p].stdvs[i] == '' else m_means[p].stdvs[i] for p in plotnik.PLOTNIKCODES])
+            normMeans = roundValues(offset + factor * zScores(classMeans, grand_means[i], grand_stdvs[i]))
+            normStdvs = roundValues(factor * (classStdvs / grand_stdvs[i]))
+            for p, mean, stdv in zip(plotnik.PLOTNIKCODES, normMeans, normStdvs):
+                m_means[p].norm_means[i] = mean
+                m_means[p].norm_stdvs[i] = stdv
+            # means and standard deviations of the tracks (only for points with both)
+            trackMeans = np.array([[np.nan if t[0] == '' else t[0] for t in m_means[p].trackmeans[i::2]]
+                                   for p in plotnik.PLOTNIKCODES], dtype=float)
+            trackStdvs = np.array([[np.nan if t[1] == '' else t[1] for t in m_means[p].trackmeans[i::2]]
+                                   for p in plotnik.PLOTNIKCODES], dtype=float)
+            normTracks.append((np.round(offset + factor * zScores(trackMeans, grand_means[i], grand_stdvs[i]), 0),
+                               np.round(factor * (trackStdvs / grand_stdvs[i]), 0)))
+    for k, p in enumerate(plotnik.PLOTNIKCODES):
+        for j in range(5):
+            for normMeans, normStdvs in normTracks:
+                mean, stdv = float(normMeans[k, j]), float(normStdvs[k, j])
+                if np.isnan(mean) or np.isnan(stdv):
+                    m_means[p].trackmeans_norm.append(('', ''))
+                else:
+                    m_means[p].trackmeans_norm.append((mean, stdv))
 
     return measurements, m_means
 
 
-def lobanov(value, mean, stdv):
-    """converts a value into its corresponding z-score"""
-
-    if value and mean and stdv:
-        return (value - mean) / stdv
-    else:  # not enough tokens for normalization, or no mean to normalize
-        return ''
-
-
 def outputFormantSettings(measurements, speaker, outputFile):
     """summarizes the formant settings used for each vowel class in a separate file"""
 
@@ -1358,192 +1172,22 @@ def outputFormantSettings(measurements, speaker, outputFile):
     f.close()
 
 
-def outputMeasurements(outputFormat, measurements, m_means, speaker, outputFile, outputHeader, tracks):
+def outputMeasurements(outputFormat, measurements, m_means, speaker, outputFile, outputHeader, tracks, formantPredictionMethod, candidates, arena=None):
     """writes measurements to file according to selected output format"""
 
+    # arena = CandidateArena with the candidate formant tracks of the measurements (for --tracks)
+
     ## outputFormat = "text"
     if outputFormat in ['txt', 'text', 'both']:
-        fw = open(os.path.splitext(outputFile)[0] + ".txt", 'w')
-                  # explicitly generate different extensions for "both" option
-        # print header, if applicable
-        if outputHeader:
-            # speaker information
-            s_dict = speaker.__dict__
-            s_keys = sorted(s_dict.keys())
-
-            fw.write('\t'.join(s_keys))
-            fw.write('\t')
-            fw.write('\t'.join(['vowel', 'stress', 'pre_word', 'word', 'fol_word',
-                                'F1', 'F2', 'F3',
-                                'B1', 'B2', 'B3', 't', 'beg', 'end', 'dur',
-                                'plt_vclass', 'plt_manner', 'plt_place',
-                                'plt_voice', 'plt_preseg', 'plt_folseq', 'style',
-                                'glide', 'pre_seg', 'fol_seg', 'context',
-                                'vowel_index', 'pre_word_trans', 'word_trans',
-                                'fol_word_trans', 'F1@20%', 'F2@20%',
-                                'F1@35%','F2@35%', 'F1@50%', 'F2@50%',
-                                'F1@65%','F2@65%', 'F1@80%', 'F2@80%']))
-            if formantPredictionMethod == 'mahalanobis':
-                fw.write('\t')
-                fw.write('nFormants')
-            if candidates:
-                fw.write('\t')
-                fw.write('\t'.join(['poles', 'bandwidths']))
-            fw.write('\n')
-        # individual measurements
-        for vm in measurements:
-            for speaker_attr in s_keys:
-                fw.write(str(s_dict[speaker_attr]))
-                fw.write('\t')
-            fw.write('\t'.join([vm.phone, str(vm.stress), vm.pre_word, vm.word, vm.fol_word, str(vm.f1)]))
-                     # vowel (ARPABET coding), stress, word, F1
-
-            fw.write('\t')
-            if vm.f2:
-                fw.write(str(vm.f2))  # F2 (if present)
-
-            fw.write('\t')
-            if vm.f3:
-                fw.write(str(vm.f3))  # F3 (if present)
-
-            fw.write('\t')
-            fw.write(str(vm.b1))  # B1
-
-            fw.write('\t')
-            if vm.b2:
-                fw.write(str(vm.b2))  # B2
-
-            fw.write('\t')
-            if vm.b3:
-                fw.write(str(vm.b3))  # B3 (if present)
-
-            fw.write('\t')
-            fw.write('\t'.join( [str(vm.t), str(vm.beg), str(vm.end),
-                                 str(vm.dur),
-                                 plotnik.plt_vowels(vm.cd),
-                                 plotnik.plt_manner(vm.fm),
-                                 plotnik.plt_place(vm.fp),
-                                 plotnik.plt_voice(vm.fv),
-                                 plotnik.plt_preseg(vm.ps),
-                                 plotnik.plt_folseq(vm.fs), vm.style, vm.glide,
-                                 vm.pre_seg,
-                                 vm.fol_seg, vm.context, vm.p_index,
-                                 vm.pre_word_trans, vm.word_trans,
-                                 vm.fol_word_trans]))
-            fw.write('\t')
-                     # time of measurement, beginning and end of phone,
-                     # duration, Plotnik environment codes, style coding, glide
-                     # coding
-            fw.write('\t'.join([str(round(t, 1)) if t else '' for t in vm.tracks]))  # formant tracks
-
-            if vm.nFormants:
-                fw.write('\t')
-                fw.write(str(vm.nFormants))
-                         # nFormants selected (if Mahalanobis method)
-            if candidates:
-                fw.write('\t')
-                fw.write('\t'.join([','.join([str(p) for p in vm.poles]), ','.join([str(b) for b in vm.bandwidths])]))
-                         # candidate poles and bandwidths (at point of
-                         # measurement)
-            fw.write('\n')
-        fw.close()
+        # explicitly generate different extensions for "both" option
+        # (the measurements and the normalized measurements are written in a single pass)
+        writer = MeasurementWriter(os.path.splitext(outputFile)[0] + ".txt", os.path.splitext(outputFile)[0] + "_norm.txt",
+                                   speaker, outputHeader, formantPredictionMethod, candidates)
+        writer.write_all(measurements)
+        writer.close()
         print("Vowel measurements output in .txt format to the file %s" % (os.path.splitext(outputFile)[0] + ".txt"))
-
-        # normalized measurements
-        fw = open(os.path.splitext(outputFile)[0] + "_norm.txt", 'w')
-        # print header, if applicable
-        if outputHeader:
-            # speaker information
-            fw.write(', '.join([speaker.name, speaker.age, speaker.sex, speaker.ethnicity, speaker.years_of_schooling, speaker.location, speaker.year]))
-            fw.write('\n\n')
-            # header
-            fw.write('\t'.join(['vowel', 'stress', 'word', 'norm_F1', 'norm_F2', 't', 'beg', 'end', 'dur',
-                           'cd', 'fm', 'fp', 'fv', 'ps', 'fs', 'style', 'glide',
-                           'norm_F1@20%', 'norm_F2@20%', 'norm_F1@35%', 'norm_F2@35%', 'norm_F1@50%', 'norm_F2@50%',
-                           'norm_F1@65%', 'norm_F2@65%', 'norm_F1@80%', 'norm_F2@80%']))
-            if formantPredictionMethod == 'mahalanobis':
-                fw.write('\t')
-                fw.write('nFormants')
-            fw.write('\n')
-        # individual measurements
-        for vm in measurements:
-            fw.write('\t'.join([vm.phone, str(vm.stress), vm.word, str(vm.norm_f1), str(vm.norm_f2)]))
-                     # vowel (ARPABET coding), stress, word, F1, F2
-            fw.write('\t')
-            fw.write('\t'.join([str(vm.t), str(vm.beg), str(vm.end), str(vm.dur), vm.cd, vm.fm, vm.fp, vm.fv, vm.ps, vm.fs, vm.style, vm.glide]))
-            fw.write('\t')
-                     # time of measurement, beginning and end of phone,
-                     # duration, Plotnik environment codes, style coding, glide
-                     # coding
-            fw.write('\t'.join([str(round(t, 1)) if t else '' for t in vm.norm_tracks]))  # formant tracks
-            fw.write('\t')
-            if vm.nFormants:
-                fw.write(str(vm.nFormants))
-                         # nFormants selected (if Mahalanobis method)
-                fw.write('\t')
-            fw.write('\n')
-        fw.close()
         print("Normalized vowel measurements output in .txt format to the file %s" % (os.path.splitext(outputFile)[0] + "_norm.txt"))
 
-        if tracks:
-            with open(os.path.splitext(outputFile)[0]+".tracks", 'wb') as trackfile:
-                trackwriter = csv.writer(trackfile, delimiter = "\t", )
-                s_dict = speaker.__dict__
-                s_keys = sorted(s_dict.keys())
-                speaker_attrs = [s_dict[x] for x in s_keys]
-                v_header = ['id', 'vowel', 'stress', 'pre_word', 'word', 'fol_word',
-                                'F1_meas', 'F2_meas', 'F3_meas',
-                                'F1', 'F2', 'F3',
-                                'B1', 'B2', 'B3', 't', 't_meas', 'dur',
-                                'plt_vclass', 'plt_manner', 'plt_place',
-                                'plt_voice', 'plt_preseg', 'plt_folseq', 'style',
-                                'glide', 'pre_seg', 'fol_seg', 'context',
-                                'vowel_index', 'pre_word_trans', 'word_trans',
-                                'fol_word_trans']
-
-                trackwriter.writerow(s_keys + v_header)
-
-                for nmeas, vm in enumerate(measurements):
-                    if len(vm.winner_poles[0]) < 2:
-                        continue
-
-                    vowel_info = [nmeas, vm.phone, vm.stress, vm.pre_word, vm.word, vm.fol_word, vm.f1, vm.f2]
-                    context_info = [str(vm.t),
-                                 str(vm.dur),
-                                 plotnik.plt_vowels(vm.cd),
-                                 plotnik.plt_manner(vm.fm),
-                                 plotnik.plt_place(vm.fp),
-                                 plotnik.plt_voice(vm.fv),
-                                 plotnik.plt_preseg(vm.ps),
-                                 plotnik.plt_folseq(vm.fs), vm.style, vm.glide,
-                                 vm.pre_seg,
-                                 vm.fol_seg, vm.context, vm.p_index,
-                                 vm.pre_word_trans, vm.word_trans,
-                                 vm.fol_word_trans]
-                    if vm.f3:
-                        vowel_info = vowel_info + [vm.f3]
-                    else:
-                        vowel_info = vowel_info + ['']
-                    f1_tracks = [p[0] for p in vm.winner_poles]
-                    f2_tracks = [p[1] if len(p) >= 2 else '' for p in vm.winner_poles]
-                    f3_tracks = [p[2] if len(p) >= 3 else '' for p in vm.winner_poles]
-
-                    b1_tracks = [b[0] if len(b) >= 1 else '' for b in vm.winner_bandwidths]
-                    b2_tracks = [b[1] if len(b) >= 2 else '' for b in vm.winner_bandwidths]
-                    b3_tracks = [b[2] if len(b) >= 3 else '' for b in vm.winner_bandwidths]
-                    times = vm.times[0]
-
-                    for f1, f2, f3, b1, b2, b3, t in zip(f1_tracks, f2_tracks, f3_tracks,
-                                                         b1_tracks, b2_tracks, b3_tracks,
-                                                         times):
-                        trackwriter.writerow(speaker_attrs + vowel_info + [f1, f2, f3, b1, b2, b3, t] +
-                                             context_info)
-
-
-
-
-
-
     ## outputFormat = "plotnik"
     if outputFormat in ['plotnik', 'Plotnik', 'plt', 'both']:
         plt = plotnik.PltFile()
@@ -1564,11 +1208,23 @@ def outputMeasurements(outputFormat, measurements, m_means, speaker, outputFile,
         plt.means = m_means
         plotnik.outputPlotnikFile(plt, os.path.splitext(outputFile)[
                                   0] + ".plt")  # explicitly generate different extensions for "both" option
-    if outputFormat not in ['plotnik', 'Plotnik', 'plt', 'txt', 'text', 'both']:
+    ## outputFormat = "npz" or "arrow"
+    if outputFormat == 'npz':
+        writeMeasurementTable(os.path.splitext(outputFile)[0] + ".npz", measurements, speaker)
+        print("Vowel measurements output as a table to the file %s" % (os.path.splitext(outputFile)[0] + ".npz"))
+    if outputFormat == 'arrow':
+        writeArrowTable(os.path.splitext(outputFile)[0] + ".arrow", measurements, speaker)
+        print("Vowel measurements output as a table to the file %s" % (os.path.splitext(outputFile)[0] + ".arrow"))
+    if outputFormat not in ['plotnik', 'Plotnik', 'plt', 'txt', 'text', 'both', 'npz', 'arrow']:
         print("ERROR: Unsupported output format %s" % outputFormat)
         print(__doc__)
         sys.exit(0)
 
+    # formant tracks of all vowels (--tracks)
+    if tracks:
+        writeTrackArchive(os.path.splitext(outputFile)[0] + ".tracks.npz", measurements, speaker, arena)
+        print("Formant tracks output to the file %s" % (os.path.splitext(outputFile)[0] + ".tracks.npz"))
+
     # write summary of formant settings to file
     if formantPredictionMethod == 'mahalanobis':
         outputFormantSettings(measurements, speaker, outputFile)
@@ -1598,30 +1254,29 @@ def predictF1F2(phone, selectedpoles, selectedbandwidths, means, covs):
         # this list keeps track of the corresponding value of the Mahalanobis distance
     # for all values of nFormants:
     if vowel in means:
+        # candidate vectors of poles and bandwidths (F1, F2, log(B1), log(B2)),
+        # and their positions in the distances list
+        candidates = []
+        positions = []
         for poles, bandwidths in zip(selectedpoles, selectedbandwidths):
             # check that there are at least two formants in the selected frame
             if len(poles) >= 2:
-                # nPoles = len(poles)     ## number of poles
-                # check all possible combinations of F1, F2, F3:
-                # for i in range(min([nPoles - 1, 2])):
-                #    for j in range(i+1, min([nPoles, 3])):
-                        i = 0
-                        j = 1
-                        # vector with current pole combination and associated
-                        # bandwidths
-                        x = np.array([poles[i], poles[j], math.log(bandwidths[i]), math.log(bandwidths[j])])
-                        # calculate Mahalanobis distance between x and ANAE mean
-                        dist = mahalanobis(x, means[vowel], covs[vowel])
-                        # append poles and bandwidths to list of values
-                        # (if F3 and bandwidth measurements exist, add to list of appended values)
-                        if len(poles) > 2:
-                            values.append(
-                                [poles[i], poles[j], bandwidths[i], bandwidths[j], poles[2], bandwidths[2]])
-                        else:
-                            values.append([poles[i], poles[j], bandwidths[i], bandwidths[j], '', ''])
-                        # append corresponding Mahalanobis distance to list of
-                        # distances
-                        distances.append(dist)
+                # (only the combination of the first two poles is tested)
+                i = 0
+                j = 1
+                # vector with current pole combination and associated
+                # bandwidths
+                candidates.append([poles[i], poles[j], math.log(bandwidths[i]), math.log(bandwidths[j])])
+                positions.append(len(distances))
+                # append poles and bandwidths to list of values
+                # (if F3 and bandwidth measurements exist, add to list of appended values)
+                if len(poles) > 2:
+                    values.append(
+                        [poles[i], poles[j], bandwidths[i], bandwidths[j], poles[2], bandwidths[2]])
+                else:
+                    values.append([poles[i], poles[j], bandwidths[i], bandwidths[j], '', ''])
+                # the Mahalanobis distance is filled in below
+                distances.append(None)
             # we need to append something to the distances and values lists so that the winnerIndex still corresponds with nFormants!
             # (this is for the case that the selected formant frame only contains F1 - empty string will not be selected as minimum distance)
             else:
@@ -1632,6 +1287,10 @@ def predictF1F2(phone, selectedpoles, selectedbandwidths, means, covs):
                 else:
                     values.append(['', '', '', '', '', ''])
                 distances.append('')
+        # calculate Mahalanobis distances between all candidates and ANAE mean at once
+        if candidates:
+            for k, dist in zip(positions, mahalanobis_batch(candidates, means[vowel], covs[vowel])):
+                distances[k] = float(dist)
         # get index for minimum Mahalanobis distance
         winnerIndex = distances.index(min([float(x) for x in distances if x != '']))
         # get corresponding F1, F2 and bandwidths values
@@ -1674,6 +1333,96 @@ def predictF1F2(phone, selectedpoles, selectedbandwidths, means, covs):
     return (f1, f2, f3, b1, b2, b3, winnerIndex)
 
 
+# engine and sound file of a worker process of --jobs (installed once per process by initMeasureWorker)
+workerState = {}
+
+
+def initMeasureWorker(engine, sound):
+    """sets up a worker process of --jobs with the engine and the sound file of the file that is measured"""
+
+    workerState['engine'] = engine
+    workerState['sound'] = sound
+
+
+def measureEntryJob(task):
+    """measures a single vowel in a worker process of --jobs (see ExtractionEngine.measure_entry)"""
+
+    # (the task has no sound file:  the one installed in the worker is used)
+    return workerState['engine'].measure_entry(task[:4] + (workerState['sound'],) + task[5:])
+
+
+def processFileJob(job):
+    """measures the vowels of one file of a "multipleFiles" run; returns the file's runtime and number of vowels"""
+
+    # job = (index, engine, wavFile, tgFile, outputFile)
+    i, engine, wavFile, tgFile, outputFile = job
+    start = time.time()
+    try:
+        log = engine.process_file(wavFile, tgFile, outputFile)
+        nVowels = log.analyzed
+        failed = False
+    except SystemExit:
+        # an error in one file should not bring down the whole run
+        print("ERROR:  extracting formants from %s failed" % wavFile)
+        nVowels = 0
+        failed = True
+    except Exception:
+        # (the same for unexpected errors, e.g. in a malformed sound file, which also would end
+        # the other files' work when they run in parallel)
+        print("ERROR:  extracting formants from %s failed:" % wavFile)
+        traceback.print_exc()
+        nVowels = 0
+        failed = True
+    return (i, time.time() - start, nVowels, failed)
+
+
+def processMultipleFiles(wavInput, tgInput, output, opts, SPATH='', PPATH=''):
+    """for the "multipleFiles" option, runs extractFormants on each tuple of input/output files,
+    in parallel if more than one job is requested"""
+
+    wavFiles, tgFiles, outputFiles = processInput(wavInput, tgInput, output)
+    if not len(wavFiles) == len(tgFiles) == len(outputFiles):
+        print("ERROR:  the lists of WAV files, TextGrid files and output files must have the same length")
+        sys.exit()
+    # make sure that we can find all input files before starting
+    durations = []
+    for wavFile, tgFile in zip(wavFiles, tgFiles):
+        checkWavFile(wavFile)
+        checkTextGridFile(tgFile)
+        # (the durations only decide the order of the files; errors are reported when a file is processed)
+        try:
+            durations.append(audio.WavFile(wavFile).duration())
+        except Exception:
+            durations.append(0.0)
+
+    # the configuration files are loaded once for all files
+    # (if the files run in parallel, each of them is measured in a single process)
+    nJobs = min(opts.jobs, len(wavFiles))
+    fileOpts = copy.copy(opts)
+    if nJobs > 1:
+        fileOpts.jobs = 1
+    engine = ExtractionEngine(fileOpts, SPATH, PPATH)
+    jobs = [(i, engine, wavFiles[i], tgFiles[i], outputFiles[i]) for i in range(len(wavFiles))]
+
+    start = time.time()
+    if nJobs > 1:
+        if not opts.speaker:
+            print("ERROR:  processing several files in parallel requires a speaker file (--speaker)")
+            sys.exit()
+        # start the longest files first, so that no long file is left running on its own at the end
+        jobs.sort(key=lambda job: durations[job[0]], reverse=True)
+        pool = multiprocessing.Pool(nJobs)
+        results = list(pool.imap_unordered(processFileJob, jobs))
+        pool.close()
+        pool.join()
+    else:
+        results = [processFileJob(job) for job in jobs]
+    wallTime = time.time() - start
+
+    results.sort()
+    writeFileSummary(wavFiles, durations, results, nJobs, wallTime)
+
+
 def processInput(wavInput, tgInput, output):
     """for the "multipleFiles" option, processes the three files which contain lists of input filenames,
     one filename per line; returns list of filenames"""
@@ -1706,7 +1455,7 @@ def programExists(program, path=''):
 
 
 def readSpeakerFile(speakerFile):
-    """reads speaker background information from a speaker file"""
+    """reads speaker background information from a speaker file; returns the speaker and the vowel system given in the file (or None)"""
 
     speaker = Speaker()
 
@@ -1761,19 +1510,19 @@ def readSpeakerFile(speakerFile):
             # set full name of speaker
             speaker.name = speaker.first_name + ' ' + speaker.last_name
 
-    if speaker_opts.vowelSystem:
-        global vowelSystem
-        vowelSystem = value
-
-
-
-
-    return speaker
+    # (the vowel system is not part of the speaker information in the output)
+    return speaker, speaker_opts.vowelSystem
 
 def setup_parser():
     parser = argparse.ArgumentParser(description="Takes as input a sound file and a Praat .TextGrid file (with word and phone tiers) and outputs automatically extracted F1 and F2 measurements for each vowel (either as a tab-delimited text file or as a Plotnik file).",
                                      usage='python %(prog)s [options] filename.wav filename.TextGrid outputFile [--stopWords ...]',
                                      fromfile_prefix_chars="+")
+    parser.add_argument("--batch", action="store_true",
+                        help="Measure all vowels of a sound file with a single call to the speech software, instead of one call per vowel.")
+    parser.add_argument("--cache", default=None,
+                        help="Directory in which the formant and intensity analyses of the vowels are cached, so that they are reused when the same sound file is measured again with the same analysis settings.")
+    parser.add_argument("--cacheSize", type=float, default=1024,
+                        help="Maximum size of the cache directory (in MB); the analyses that have been used least recently are removed first.")
     parser.add_argument("--candidates", action="store_true",
                         help="Return all candidate measurements in output")
     parser.add_argument("--case", choices=["lower","upper"], default="upper",
@@ -1782,6 +1531,12 @@ def setup_parser():
                         help="covariances, required for mahalanobis method")
     parser.add_argument("--formantPredictionMethod", choices = ["default","mahalanobis"], default = "mahalanobis",
                         help="Formant prediction method")
+    parser.add_argument("--formantTracking", choices = ["vowel", "breathGroup", "file"], default = "vowel",
+                        help="Compute the formant tracks separately for each vowel, or once per breath group or file (and cut out the vowels).")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Save the measurements with a manifest (outputFile.manifest), and only measure the vowels that have changed since the last run with the same output file.")
+    parser.add_argument("--jobs", "-j", type=int, default=1,
+                        help="Number of worker processes used to measure the vowels in parallel (with --multipleFiles:  number of files processed in parallel).")
     parser.add_argument("--maxFormant", type=int, default=5000)
     parser.add_argument("--means", "-m",  default=pkg_resources.resource_filename('fave.extract', 'config/means.txt'),
                         help="mean values, required for mahalanobis method")
@@ -1798,19 +1553,21 @@ def setup_parser():
     parser.add_argument("--nSmoothing", type=int, default=12,
                         help="Specifies the number of samples to be used for the smoothing of the formant tracks.")
     parser.add_argument("--onlyMeasureStressed", action="store_true")
-    parser.add_argument("--outputFormat",   "-o",  choices = ['txt', 'text', 'plotnik', 'Plotnik', 'plt', 'both'], default="txt",
-                        help = "Output format. Tab delimited file, plotnik file, or both.")
+    parser.add_argument("--outputFormat",   "-o",  choices = ['txt', 'text', 'plotnik', 'Plotnik', 'plt', 'both', 'npz', 'arrow'], default="txt",
+                        help = "Output format. Tab delimited file, plotnik file, or both; or a table of typed columns (NumPy .npz, or Arrow IPC file with pyarrow).")
     parser.add_argument("--preEmphasis", type=float, default=50,
                         help="The cut-off value in Hz for the application of a 6 dB/octave low-pass filter.")
     parser.add_argument("--phoneset", "-p",  default = pkg_resources.resource_filename('fave.extract', 'config/cmu_phoneset.txt'))
     parser.add_argument("--pickle", action = "store_true",
                         help = "save vowel measurement information as a picklefile")
+    parser.add_argument("--praatFileFormat", choices = ["text", "binary"], default = "text",
+                        help="Format of the formant and intensity files written by Praat (binary files are faster to write and read).")
     parser.add_argument("--remeasurement", action="store_true",
                         help="Do a second pass is performed on the data, using the speaker's own system as the base of comparison for the Mahalanobis distance")
     parser.add_argument("--removeStopWords", action="store_true",
                         help="Don't measure vowels in stop words." )
-    parser.add_argument("--speechSoftware", choices = ['praat', 'Praat', 'esps', 'ESPS'], default = "Praat",
-                        help="The speech software program to be used for LPC analysis.")
+    parser.add_argument("--speechSoftware", choices = ['praat', 'Praat', 'esps', 'ESPS', 'native'], default = "Praat",
+                        help="The speech software program to be used for LPC analysis ('native' does the analysis in-process, without Praat).")
     parser.add_argument("--speaker",  "-s",
                         help = "*.speaker file, if used")
     parser.add_argument("--stopWords", nargs="+", default=["AND", "BUT", "FOR", "HE", "HE'S", "HUH", "I", "I'LL", "I'M", "IS", "IT", "IT'S", "ITS", "MY", "OF", "OH",
@@ -1819,7 +1576,7 @@ def setup_parser():
     parser.add_argument("--stopWordsFile",      "-t",
                         help = "file containing words to exclude from analysis")
     parser.add_argument("--tracks", action="store_true",
-                        help = "Write full formant tracks.")
+                        help = "Write the full formant tracks of all vowels to a track archive (outputFile.tracks.npz).")
     parser.add_argument("--vowelSystem", choices = ['phila', 'Phila', 'PHILA', 'NorthAmerican', 'simplifiedARPABET'],
                         default="NorthAmerican",help="If set to Phila, a number of vowels will be reclassified to reflect the phonemic distinctions of the Philadelphia vowel system.")
     parser.add_argument("--verbose", "-v", action="store_true",
@@ -1840,52 +1597,27 @@ def smoothTracks(poles, s):
 
     # poles = list of (list of F1, F2, F3, ...) for each point in time
     # BUT number of formants in each frame may be different!
-    maxNumFormants = max([len(p) for p in poles])
-    new_poles = []
-    for i in range(s, len(poles) - s):
-        new_poles.append([])
-    # smooth each formant track separately
-    for n in range(maxNumFormants):
-        for i in range(s, len(poles) - s):
-            # start with values at point i; check that center point values are
-            # defined
-            if len(poles[i]) > n:
-                smoothedF = poles[i][n]
-                # add samples on both sides
-                for j in range(1, s + 1):
-                    # again, check that all values are defined
-                    # (center point of smoothing might be defined, but parts of the window might not be!)
-                    if len(poles[i + j]) > n and len(poles[i - j]) > n:
-                        smoothedF += poles[i + j][n] + poles[i - j][n]
-                    else:
-                        # NOTE:  If part of the smoothing window is not defined, then no new value should be produced
-                        # (equivalent to setting the value to "undefined" in Praat)
-                        smoothedF = None
-                        break
-                # divide by window size (if all values were defined)
-                if smoothedF != None:
-                    new_poles[i - s].append(smoothedF / (2 * s + 1))
-            # if center point itself is undefined
-            else:
-                continue
+    # -> the tracks are put into a 2D array (one row per frame), padded with NaN ("undefined")
+    nFrames = len(poles)
+    if nFrames <= 2 * s:
+        return []
+    tracks = praat.pad_frames(poles)
+    # start with values at point i, and add samples on both sides
+    # (in the same order as when averaging frame by frame, so that the sums are exactly the same)
+    # NOTE:  If part of the smoothing window is not defined, then no new value should be produced
+    # (equivalent to setting the value to "undefined" in Praat):  NaN propagates through the sums
+    smoothed = tracks[s:nFrames - s].copy()
+    for j in range(1, s + 1):
+        smoothed += tracks[s + j:nFrames - s + j] + tracks[s - j:nFrames - s - j]
+    smoothed /= (2 * s + 1)
+    # since the formants of a frame are numbered from F1 on, the defined values of each
+    # smoothed frame are those before the first undefined one
+    nDefined = (~np.isnan(smoothed)).sum(axis=1)
+    new_poles = [row[:n].tolist() for row, n in zip(smoothed, nDefined)]
 
     return new_poles
 
 
-def trimFormants(formants, times, minimum, maximum):
-    """removes from the list of formants those values corresponding to the vowel transitions"""
-
-    # used to remove vowel transitions for the Lennig and ANAE measurement
-    # methods
-    trimmedFormants = []
-    trimmedTimes = []
-    for i in range(len(formants)):
-        if times[i] >= minimum and times[i] <= maximum:
-            trimmedFormants.append(formants[i])
-            trimmedTimes.append(times[i])
-
-    return trimmedFormants, trimmedTimes
-
 def window(iterable, window_len=2, window_step=1):
     """returns a tuple from an iterator"""
     iterators = tee(iterable, window_len)
@@ -1898,13 +1630,13 @@ def window(iterable, window_len=2, window_step=1):
     return window_itr
 
 
-def whichSpeaker(speakers):
+def whichSpeaker(speakers, formantPredictionMethod):
     """prompts the user for input on the speaker to be analyzed"""
 
     # if there are just two tiers in the input TextGrid, speakers will be an
     # empty list
     if not speakers:
-        speaker = getSpeakerBackground("", 0)
+        speaker = getSpeakerBackground("", 0, formantPredictionMethod)
         return speaker
     # get speaker from list of tiers
     print("Speakers in TextGrid:")
@@ -1915,15 +1647,29 @@ def whichSpeaker(speakers):
     speaknum = int(input("Which speaker should be analyzed (number)?  ")) - 1
     if speaknum not in range(len(speakers)):
         print("ERROR!  Please select a speaker number from 1 - %i.  " % (len(speakers) + 1))
-        speaker = whichSpeaker(speakers)
+        speaker = whichSpeaker(speakers, formantPredictionMethod)
         return speaker
     # plus, prompt for speaker background info and return speaker object
     else:
-        speaker = getSpeakerBackground(speakers[speaknum], speaknum)
+        speaker = getSpeakerBackground(speakers[speaknum], speaknum, formantPredictionMethod)
         return speaker
 
 
-def writeLog(filename, wavFile, maxTime, meansFile, covsFile, opts):
+def writeFileSummary(wavFiles, durations, results, nJobs, wallTime):
+    """prints the runtimes of the files of a "multipleFiles" run"""
+
+    print('')
+    print("Processed %i files with %i job(s) in %.2f seconds." % (len(wavFiles), nJobs, wallTime))
+    print("%s\t%s\t%s\t%s" % ("duration", "vowels", "runtime", "file"))
+    for (i, runtime, nVowels, failed) in results:
+        print("%.2f\t%i\t%.2f\t%s%s" % (durations[i], nVowels, runtime, wavFiles[i], " (failed)" if failed else ""))
+    totalRuntime = sum(r[1] for r in results)
+    print("%.2f\t%i\t%.2f\t%s" % (sum(durations), sum(r[2] for r in results), totalRuntime, "total"))
+    if nJobs > 1 and wallTime > 0:
+        print("Speedup over serial processing of the files:  %.2f" % (totalRuntime / wallTime))
+
+
+def writeLog(filename, wavFile, maxTime, meansFile, covsFile, opts, log):
     """writes a log file"""
 
     f = open(filename, 'w')
@@ -1960,38 +1706,42 @@ def writeLog(filename, wavFile, maxTime, meansFile, covsFile, opts):
 
     f.write("extractFormants statistics for file %s:\n\n" %
             os.path.basename(wavFile))
-    f.write("Total number of vowels (initially):\t%i\n" % count_vowels)
-    if count_vowels:
+    f.write("Total number of vowels (initially):\t%i\n" % log.vowels)
+    if log.vowels:
         f.write("->\tNumber of vowels analyzed:\t%i\t(%.1f%%)\n" %
-                (count_analyzed, float(count_analyzed) / float(count_vowels) * 100))
+                (log.analyzed, float(log.analyzed) / float(log.vowels) * 100))
         f.write("->\tNumber of vowels discarded:\t%i\t(%.1f%%)\n" %
-                ((count_vowels - count_analyzed), float((count_vowels - count_analyzed)) / float(count_vowels) * 100))
+                ((log.vowels - log.analyzed), float((log.vowels - log.analyzed)) / float(log.vowels) * 100))
+    if opts.cache:
+        f.write("Vowel analyses found in the cache:\t%i\n" % log.cached)
+    if opts.incremental:
+        f.write("Measurements reused from the last run:\t%i\n" % log.reused)
     f.write("\n")
     f.write("Duration of sound file:\t\t%.3f seconds\n" % maxTime)
     f.write("Time for program run:\t\t%.3f seconds\n" %
-            (logtimes[-1][1] - logtimes[0][1]))
-    if count_analyzed:
+            (log.times[-1][1] - log.times[0][1]))
+    if log.analyzed:
         f.write("->\t%.3f seconds per analyzed vowel\n" %
-                ((logtimes[-1][1] - logtimes[0][1]) / count_analyzed))
+                ((log.times[-1][1] - log.times[0][1]) / log.analyzed))
     f.write("->\t%.3f times real time\n" %
-            ((logtimes[-1][1] - logtimes[0][1]) / maxTime))
+            ((log.times[-1][1] - log.times[0][1]) / maxTime))
     f.write("\n")
     f.write("Excluded:\n")
-    if count_vowels:
+    if log.vowels:
         f.write("- Uncertain transcriptions:\t\t%i\t(%.1f%%)\n" %
-                (count_uncertain, float(count_uncertain) / float(count_vowels) * 100))
+                (log.uncertain, float(log.uncertain) / float(log.vowels) * 100))
         f.write("- Overlaps:\t\t\t\t%i\t(%.1f%%)\n" %
-                (count_overlaps, float(count_overlaps) / float(count_vowels) * 100))
+                (log.overlaps, float(log.overlaps) / float(log.vowels) * 100))
         f.write("- Truncated words:\t\t\t%i\t(%.1f%%)\n" %
-                (count_truncated, float(count_truncated) / float(count_vowels) * 100))
+                (log.truncated, float(log.truncated) / float(log.vowels) * 100))
         f.write("- Below minimum duration:\t\t%i\t(%.1f%%)\n" %
-                (count_too_short, float(count_too_short) / float(count_vowels) * 100))
-    if removeStopWords and count_vowels:
+                (log.too_short, float(log.too_short) / float(log.vowels) * 100))
+    if opts.removeStopWords and log.vowels:
         f.write("- Stop words:\t\t\t\t%i\t(%.1f%%)\n" %
-                (count_stopwords, float(count_stopwords) / float(count_vowels) * 100))
-    if not measureUnstressed and count_vowels:
+                (log.stopwords, float(log.stopwords) / float(log.vowels) * 100))
+    if opts.onlyMeasureStressed and log.vowels:
         f.write("- Unstressed vowels:\t\t\t%i\t(%.1f%%)\n" %
-                (count_unstressed, float(count_unstressed) / float(count_vowels) * 100))
+                (log.unstressed, float(log.unstressed) / float(log.vowels) * 100))
     f.write("\n\n")
     f.write("extractFormant settings:\n")
     f.write("- removeStopWords:\t\t%s\n" % opts.removeStopWords)
@@ -2005,6 +1755,9 @@ def writeLog(filename, wavFile, maxTime, meansFile, covsFile, opts):
     f.write("- windowSize:\t\t\t%.3f\n" % opts.windowSize)
     f.write("- preEmphasis:\t\t\t%i\n" % opts.preEmphasis)
     f.write("- speechSoftware:\t\t%s\n" % opts.speechSoftware)
+    f.write("- praatFileFormat:\t\t%s\n" % opts.praatFileFormat)
+    f.write("- cache:\t\t\t%s\n" % opts.cache)
+    f.write("- incremental:\t\t\t%s\n" % opts.incremental)
     f.write("- outputFormat:\t\t\t%s\n" % opts.outputFormat)
     f.write("- outputHeader:\t\t\t%s\n" % (not opts.noOutputHeader))
     f.write("- case:\t\t\t\t%s\n" % opts.case)
@@ -2019,144 +1772,209 @@ def writeLog(filename, wavFile, maxTime, meansFile, covsFile, opts):
     f.write("\n\n")
     f.write("Time statistics:\n\n")
     f.write("count\ttime\td(time)\ttoken\n")
-    for i in range(len(logtimes)):
+    for i in range(len(log.times)):
         # chunk number and time stamp
-        f.write(str(logtimes[i][0]) + "\t" + str(round(logtimes[i][1], 3)) + "\t")
+        f.write(str(log.times[i][0]) + "\t" + str(round(log.times[i][1], 3)) + "\t")
         # delta time
         if i > 0:
-            f.write(str(round(logtimes[i][1] - logtimes[i - 1][1], 3)) + "\t")
+            f.write(str(round(log.times[i][1] - log.times[i - 1][1], 3)) + "\t")
         # token
-        f.write(logtimes[i][2])
+        f.write(log.times[i][2])
         f.write("\n")
     f.close()
     print("\nWritten log file %s.\n" % filename)
 
 
 #
-# This used to be the main program; now it's wrapped in a function...     ##
+# This used to be the main program; now it's wrapped in a class...        ##
 #
 
-def extractFormants(wavInput, tgInput, output, opts, SPATH='', PPATH=''):
-    """run extractFormants on a sound file and TextGrid file, with the options specified in opts"""
-    # S(OX)PATH and P(RAAT)PATH do not need to be specified when run as a standalone program (they can be verified via the shell),
-    # but in some cases (running EF as a module from a CGI script as user
-    # "www") this information is needed
-
-    # initialize counters & timing
-    global logtimes
-    logtimes = []
-    markTime("start")
-    global count_vowels
-    count_vowels = 0
-    global count_analyzed
-    count_analyzed = 0
-    global count_uncertain
-    count_uncertain = 0
-    global count_overlaps
-    count_overlaps = 0
-    global count_truncated
-    count_truncated = 0
-    global count_stopwords
-    count_stopwords = 0
-    global count_unstressed
-    count_unstressed = 0
-    global count_too_short
-    count_too_short = 0
-
-    # if paths are specified, make them available globally
-    global SOXPATH
-    SOXPATH = SPATH
-    global PRAATPATH
-    PRAATPATH = PPATH
-
-    # set OS-specific variables
-    global PRAATNAME
-    if shutil.which('praat') is not None:
-        PRAATNAME = 'praat'
-    elif shutil.which('Praat') is not None:
-        PRAATNAME = 'Praat'
-    elif shutil.which('praatcon') is not None:
-        PRAATNAME = 'praatcon'
-    else:
-        print("WARNING: unknown OS type '%s' may not be supported" % os.name)
-        PRAATNAME = 'Praat'
-
-    # by default, assume that these files are located in the current directory
-    meansFile = opts.means
-    covsFile = opts.covariances
-    phonesetFile = opts.phoneset
-    stopWordsFile = opts.stopWordsFile
-
-    if stopWordsFile:
-        opts.stopWords = parseStopWordsFile(stopWordsFile)
-
-    # assign the options to individual variables and to type conversion if
-    # necessary
-    global case, outputHeader, outputFormat, formantPredictionMethod, measurementMethod, measurementPointMethod, nFormants#, maxFormant
-    global nSmoothing, removeStopWords, measureUnstressed, minVowelDuration, windowSize, preEmphasis, multipleFiles, remeasurement, candidates, vowelSystem, tracks
-    case = opts.case
-    outputFormat = opts.outputFormat
-    outputHeader = not opts.noOutputHeader
-    formantPredictionMethod = opts.formantPredictionMethod
-    measurementPointMethod = opts.measurementPointMethod
-    speechSoftware = opts.speechSoftware
-    nFormants = opts.nFormants
-    #maxFormant = opts.maxFormant
-    nSmoothing = opts.nSmoothing
-    removeStopWords = opts.removeStopWords
-    measureUnstressed = not opts.onlyMeasureStressed
-    minVowelDuration = opts.minVowelDuration
-    windowSize = opts.windowSize
-    preEmphasis = opts.preEmphasis
-    multipleFiles = opts.multipleFiles
-    remeasurement = opts.remeasurement
-    candidates = opts.candidates
-    vowelSystem = opts.vowelSystem
-    tracks = opts.tracks
-    print("Processed options.")
-
-    # read CMU phoneset ("cmu_phoneset.txt")
-    phoneset = cmu.read_phoneset(opts.phoneset)
-    print("Read CMU phone set.")
-
-    # make sure the specified speech analysis program is in our path
-    speechSoftware = checkSpeechSoftware(opts.speechSoftware)
-    print("Speech software to be used is %s." % speechSoftware)
-
-    # determine what program we'll use to extract portions of the audio file
-    soundEditor = getSoundEditor()
-    print("Sound editor to be used is %s." % soundEditor)
-
-    # if we're using the Mahalanobis distance metric for vowel formant prediction,
-    # we need to load files with the mean and covariance values
-    if formantPredictionMethod == 'mahalanobis':
-        global means, covs
-        means = loadMeans(meansFile)  # "means.txt"
-        covs = loadCovs(covsFile)  # "covs.txt"
-        print("Read means and covs files for the Mahalanobis method.")
-
-    # put the list of stop words in upper or lower case to match the word
-    # transcriptions
-    newStopWords = []
-    for w in opts.stopWords:
-        w = changeCase(w, case)
-        newStopWords.append(w)
-    opts.stopWords = newStopWords
-
-    # for "multipleFiles" option:  read lists of files into (internal) lists
-    if multipleFiles:
-        wavFiles, tgFiles, outputFiles = processInput(wavInput, tgInput, output)
-    else:
-        wavFiles = [wavInput]
-        tgFiles = [tgInput]
-        outputFiles = [output]
+class ExtractionEngine:
+
+    """holds the settings and the configuration data of an extraction run (phone set, means and covariances,
+    stop words and speech analysis program), and measures the vowels of sound files with them"""
+
+    def __init__(self, opts, SPATH='', PPATH=''):
+        # S(OX)PATH and P(RAAT)PATH do not need to be specified when run as a standalone program (they can be verified via the shell),
+        # but in some cases (running EF as a module from a CGI script as user
+        # "www") this information is needed
+        # (the options are copied, so that the engine is not affected by later changes to opts)
+        self.opts = copy.copy(opts)
+        self.soxPath = SPATH
+        self.praatPath = PPATH
+
+        # set OS-specific variables
+        if shutil.which('praat') is not None:
+            praatName = 'praat'
+        elif shutil.which('Praat') is not None:
+            praatName = 'Praat'
+        elif shutil.which('praatcon') is not None:
+            praatName = 'praatcon'
+        else:
+            print("WARNING: unknown OS type '%s' may not be supported" % os.name)
+            praatName = 'Praat'
+        self.praatCommand = os.path.join(PPATH, praatName)
+        self.soxCommand = os.path.join(SPATH, 'sox')
+
+        # assign the options to individual attributes
+        self.case = opts.case
+        self.outputFormat = opts.outputFormat
+        # (the Arrow output needs pyarrow:  check before any vowels are measured)
+        if self.outputFormat == 'arrow' and importlib.util.find_spec('pyarrow') is None:
+            print("ERROR: the 'arrow' output format requires the pyarrow package")
+            sys.exit()
+        self.outputHeader = not opts.noOutputHeader
+        self.formantPredictionMethod = opts.formantPredictionMethod
+        self.measurementPointMethod = opts.measurementPointMethod
+        self.nFormants = opts.nFormants
+        self.nSmoothing = opts.nSmoothing
+        self.removeStopWords = opts.removeStopWords
+        self.measureUnstressed = not opts.onlyMeasureStressed
+        self.minVowelDuration = opts.minVowelDuration
+        self.windowSize = opts.windowSize
+        self.preEmphasis = opts.preEmphasis
+        self.praatFileFormat = opts.praatFileFormat
+        self.remeasurement = opts.remeasurement
+        self.candidates = opts.candidates
+        self.vowelSystem = opts.vowelSystem
+        self.tracks = opts.tracks
+        self.cache = None
+        if opts.cache:
+            self.cache = CandidateCache(opts.cache, opts.cacheSize)
+        print("Processed options.")
+
+        # read CMU phoneset ("cmu_phoneset.txt")
+        self.phoneset = cmu.read_phoneset(opts.phoneset)
+        print("Read CMU phone set.")
+
+        # make sure the specified speech analysis program is in our path
+        self.speechSoftware = checkSpeechSoftware(opts.speechSoftware, PPATH)
+        print("Speech software to be used is %s." % self.speechSoftware)
+        if (opts.batch or opts.formantTracking != 'vowel') and self.speechSoftware == 'esps':
+            print("ERROR:  the --batch and --formantTracking options are only available for Praat and the native LPC analysis")
+            sys.exit()
 
-    # process each tuple of input/output files
-    for (wavFile, tgFile, outputFile) in zip(wavFiles, tgFiles, outputFiles):
-        # make sure that we can find the input files, and that the TextGrid file is formatted properly
-        # (functions will exit if files not formatted properly)
-        checkWavFile(wavFile)
-        checkTextGridFile(tgFile)
+        # determine what program we'll use to extract portions of the audio file
+        # (the native analysis reads the vowels from the sound file itself, and needs neither SoX nor Praat)
+        self.soundEditor = None
+        if self.speechSoftware != 'native':
+            self.soundEditor = getSoundEditor(SPATH, PPATH)
+            print("Sound editor to be used is %s." % self.soundEditor)
+
+        # if we're using the Mahalanobis distance metric for vowel formant prediction,
+        # we need to load files with the mean and (inverted) covariance values
+        self.means = ''
+        self.covs = ''
+        if self.formantPredictionMethod == 'mahalanobis':
+            self.means = loadMeans(opts.means)  # "means.txt"
+            self.covs = loadCovs(opts.covariances)  # "covs.txt"
+            print("Read means and covs files for the Mahalanobis method.")
+        # (for --incremental, the means and covariances are identified by the contents of their files)
+        self.configHash = ''
+        if opts.incremental and self.formantPredictionMethod == 'mahalanobis':
+            self.configHash = hashFields(hashFile(opts.means), hashFile(opts.covariances))
+
+        # put the list of stop words in upper or lower case to match the word
+        # transcriptions
+        stopWords = opts.stopWords
+        if opts.stopWordsFile:
+            stopWords = parseStopWordsFile(opts.stopWordsFile)
+        self.stopWords = [changeCase(w, self.case) for w in stopWords]
+        self.opts.stopWords = self.stopWords
+
+    def get_speaker(self, tgFile):
+        """returns the speaker to be analyzed (from the speaker file, or as chosen by the user), and the vowel system of the speaker file (or None)"""
+
+        vowelSystem = None
+        if self.opts.speaker:
+            speaker, vowelSystem = readSpeakerFile(self.opts.speaker)
+            print("Read speaker background information from .speaker file.")
+        else:
+            tg = praat.TextGrid()
+            tg.read(tgFile)
+            speakers = checkTiers(tg)  # -> returns list of speakers
+            # prompt user to choose speaker to be analyzed, and for background
+            # information on the speaker
+            speaker = whichSpeaker(speakers, self.formantPredictionMethod)  # -> returns Speaker object
+
+        return speaker, vowelSystem
+
+    def get_cache_key(self, entry, audioHash, maxFormant, region=None):
+        """returns the key of the analysis of a vowel in the cache"""
+
+        # everything that the candidate formant tracks and the intensity contour depend on:
+        # sound file, analysis window (and region, for --formantTracking) and analysis settings
+        p = entry.phone
+        if self.opts.formantTracking != 'vowel':
+            mode = self.opts.formantTracking
+        elif self.opts.batch:
+            mode = 'batch'
+        else:
+            # (separate sound files are cut out by SoX or Praat)
+            mode = 'vowel-' + (self.soundEditor if self.speechSoftware != 'native' else 'native')
+        window = (p.xmin - entry.padBeg, p.xmax + entry.padEnd)
+
+        return hashFields(audioHash, window, region, mode, self.speechSoftware.lower(),
+                          tuple(getNFormantsList(self.formantPredictionMethod, self.nFormants)),
+                          maxFormant, self.windowSize, self.preEmphasis, needsIntensity(p))
+
+    def get_measurement_key(self, entry, audioHash, maxFormant, region=None):
+        """returns the key of the measurement of a vowel in the manifest (for --incremental)"""
+
+        # the analysis of the vowel, the settings for the selection of the measurement,
+        # and everything about the vowel, its word and its context that goes into the measurement
+        p = entry.phone
+        w = entry.word
+        phone = tuple((name, getattr(p, name)) for name in sorted(p.__slots__))
+        word = (w.transcription, w.xmin, w.xmax, w.style)
+        context = (entry.p_index, entry.context, entry.pre_seg, entry.fol_seg, entry.word_trans, entry.pre_word_trans,
+                   entry.fol_word_trans, entry.pre_word, entry.fol_word)
+
+        return hashFields(MANIFEST_VERSION, self.get_cache_key(entry, audioHash, maxFormant, region), self.formantPredictionMethod,
+                          self.measurementPointMethod, self.nSmoothing, self.configHash, phone, word, context)
+
+    def measure_entry(self, task):
+        """measures a single vowel of the manifest (serially, or in a worker process for --jobs)"""
+
+        # task = (index, entry, wavFile, fileStem, sound, maxFormant, vowelCandidates),
+        # where vowelCandidates are the (LPCs, intensity) of the vowel if they have been computed already
+        # (--batch, --formantTracking), and None otherwise
+        (i, entry, wavFile, fileStem, sound, maxFormant, vowelCandidates) = task
+        p = entry.phone
+        w = entry.word
+        padBeg, padEnd = entry.padBeg, entry.padEnd
+
+        if vowelCandidates:
+            LPCs, intensity = vowelCandidates
+        else:
+            # name of sound file - ".wav":  unique for each vowel and process
+            vowelFileStem = '%s_%i_%i_%s' % (fileStem, os.getpid(), i, p.label)
+            vowelWavFile = vowelFileStem + '.wav'
+
+            # (the native analysis reads the samples from the memory-mapped sound file)
+            if self.speechSoftware != 'native':
+                extractPortion(wavFile, vowelWavFile, p.xmin - padBeg, p.xmax + padEnd, self.soundEditor,
+                               self.soxCommand, self.praatCommand)
+
+            LPCs, intensity = getVowelCandidates(vowelFileStem, p, self.speechSoftware, self.formantPredictionMethod,
+                                                 self.nFormants, maxFormant, self.windowSize, self.preEmphasis,
+                                                 padBeg, padEnd, sound, self.praatCommand, self.praatFileFormat)
+            if self.cache and entry.cacheKey:
+                self.cache.put(entry.cacheKey, (LPCs, intensity))
+
+        return measureFormants(p, w, LPCs, intensity, self.formantPredictionMethod, self.measurementPointMethod,
+                               padBeg, padEnd, self.means, self.covs, self.nSmoothing)
+
+    def measure_file(self, wavFile, tgFile, speaker, log=None, manifestFile=None, vowelSystem=None):
+        """returns the vowel measurements for a speaker in a sound file and TextGrid file, and the CandidateArena with their candidate formant tracks"""
+
+        # log = ExtractionLog that collects the statistics and time stamps for the log file
+        # manifestFile = manifest of the measurements of the last run (--incremental), which is updated
+        # vowelSystem = vowel system of the speaker (from the speaker file), instead of the one of the options
+        if log is None:
+            log = ExtractionLog()
+        opts = self.opts
+        case = self.case
 
         # this will be used for the temporary files that we write
         fileStem = os.path.basename(wavFile).replace('.wav','')
@@ -2165,62 +1983,30 @@ def extractFormants(wavInput, tgInput, output, opts, SPATH='', PPATH=''):
         # alignments
         tg = praat.TextGrid()
         tg.read(tgFile)
-        if opts.speaker:
-            speaker = readSpeakerFile(opts.speaker)
-            print("Read speaker background information from .speaker file.")
-        else:
-            speakers = checkTiers(tg)  # -> returns list of speakers
-            # prompt user to choose speaker to be analyzed, and for background
-            # information on the speaker
-            speaker = whichSpeaker(speakers)  # -> returns Speaker object
 
         # adjust maximum formant frequency to speaker sex
-        if speaker.sex in ["m", "M", "male", "MALE"]:
-            opts.maxFormant = 5000
-        elif speaker.sex in ["f", "F", "female", "FEMALE"]:
-            opts.maxFormant = 5500
-        else:
-            sys.exit("ERROR!  Speaker sex undefined.")
-        global maxFormant
-        maxFormant = opts.maxFormant
+        maxFormant = getMaxFormant(speaker)
+        # the speaker file may specify a vowel system of its own
+        vowelSystem = vowelSystem or self.vowelSystem
 
-
-        markTime("prelim1")
+        log.mark("prelim1")
         # extract list of words and their corresponding phones (with all
         # coding) -> only for chosen speaker
-        words = getWordsAndPhones(tg, phoneset, speaker, vowelSystem)
-                                  # (all initial vowels are counted here)
+        words = getWordsAndPhones(tg, self.phoneset, speaker, vowelSystem)
+        # count initial number of vowels here! (because uncertain
+        # transcriptions are discarded on a by-word basis)
+        log.vowels = len([p for w in words for p in w.phones if p.label and isVowel(p.label)])
         print('Identified vowels in the TextGrid.')
-        global maxTime
         maxTime = tg.xmax()  # duration of TextGrid/sound file
+        log.maxTime = maxTime
         measurements = []
+        manifest = []
+        arena = CandidateArena()
 
-        markTime("prelim2")
-
-        if not opts.verbose:
-            n_words = len(words)
-            word_iter = 0
-            old_percent = 0
-
-            progressbar_width = 100
-            sys.stdout.write("\nExtracting Formants\n")
-            sys.stdout.write("[%s]" % (" " * progressbar_width))
-            sys.stdout.flush()
-            sys.stdout.write("\b" * (progressbar_width + 1))
-                             # return to start of line, after '['
+        log.mark("prelim2")
 
         for pre_w, w, fol_w in window(words, window_len = 3):
 
-
-            if not opts.verbose:
-                word_iter = word_iter + 1
-                new_percent = math.floor((float(word_iter) / n_words) * 100)
-
-                for p in range(int(old_percent), int(new_percent)):
-                    sys.stdout.write("-")
-                    sys.stdout.flush()
-                    old_percent = new_percent
-
             # skip unclear transcriptions and silences
             if w.transcription == '' or w.transcription == "((xxxx))" or w.transcription.upper() == "SP":
                 continue
@@ -2239,8 +2025,8 @@ def extractFormants(wavInput, tgInput, output, opts, SPATH='', PPATH=''):
                 continue
 
             # don't process this word if it's in the list of stop words
-            if removeStopWords and w.transcription in opts.stopWords:
-                count_stopwords += numV
+            if self.removeStopWords and w.transcription in self.stopWords:
+                log.stopwords += numV
                 if opts.verbose:
                     print('')
                     print("\t\t\t...word %s at %.3f is stop word." % (w.transcription, w.xmin))
@@ -2248,7 +2034,7 @@ def extractFormants(wavInput, tgInput, output, opts, SPATH='', PPATH=''):
 
             # exclude uncertain transcriptions
             if uncertain.search(w.transcription):
-                count_uncertain += numV
+                log.uncertain += numV
                 if opts.verbose:
                     print('')
                     print("\t\t\t...word %s at %.3f is uncertain transcription." % (w.transcription, w.xmin))
@@ -2261,17 +2047,17 @@ def extractFormants(wavInput, tgInput, output, opts, SPATH='', PPATH=''):
 
                 # exclude overlaps
                 if p.overlap:
-                    count_overlaps += 1
+                    log.overlaps += 1
                     continue
                 # exclude last syllables of truncated words
                 if w.transcription[-1] == "-" and p.fs not in ['1', '2', '4', '5']:
-                    count_truncated += 1
+                    log.truncated += 1
                     continue
 
                 # skip this vowel if it doesn't have primary stress
                 # and the user only wants to measure stressed vowels
-                if not measureUnstressed and not hasPrimaryStress(p.label):
-                    count_unstressed += 1
+                if not self.measureUnstressed and not hasPrimaryStress(p.label):
+                    log.unstressed += 1
                     continue
 
                 dur = round(p.xmax - p.xmin, 3)  # duration of phone
@@ -2279,8 +2065,8 @@ def extractFormants(wavInput, tgInput, output, opts, SPATH='', PPATH=''):
                 # don't measure this vowel if it's shorter than the minimum length threshold
                 # (this avoids an ESPS error due to there not being enough samples for the LPC,
                 # and it leaves out vowels that are reduced)
-                if dur < minVowelDuration:
-                    count_too_short += 1
+                if dur < self.minVowelDuration:
+                    log.too_short += 1
                     continue
 
                 word_trans = " ".join([x.label for x in w.phones])
@@ -2322,42 +2108,199 @@ def extractFormants(wavInput, tgInput, output, opts, SPATH='', PPATH=''):
 
 
 
-                vowelFileStem = fileStem + '_' + \
-                    p.label  # name of sound file - ".wav" + phone label
-                vowelWavFile = vowelFileStem + '.wav'
-
-                if opts.verbose:
-                    print('')
-                    print("Extracting formants for vowel %s in word %s at %.3f" % (p.label, w.transcription, w.xmin))
-
-                markTime(count_analyzed + 1, p.label + " in " + w.transcription)
-
                 # get padding for vowel in question
-                padBeg, padEnd = getPadding(p, windowSize, maxTime)
+                padBeg, padEnd = getPadding(p, self.windowSize, maxTime)
                 ## p = phone
                 # windowSize:  from config file or default settings
                 # maxTime = duration of sound file/TextGrid
 
-                extractPortion(wavFile, vowelWavFile, p.xmin - padBeg, p.xmax + padEnd, soundEditor)
+                entry = ManifestEntry()
+                entry.phone = p
+                entry.word = w
+                entry.p_index = str(p_index+1)
+                entry.context = p_context
+                entry.pre_seg = pre_seg
+                entry.fol_seg = fol_seg
+                entry.word_trans = word_trans
+                entry.pre_word_trans = pre_word_trans
+                entry.fol_word_trans = fol_word_trans
+                entry.pre_word = pre_w.transcription
+                entry.fol_word = fol_w.transcription
+                entry.padBeg = padBeg
+                entry.padEnd = padEnd
+                manifest.append(entry)
+
+        if self.speechSoftware == 'native':
+            sound = audio.WavFile(wavFile)
+        else:
+            sound = None
+
+        if opts.formantTracking != 'vowel':
+            regions, regionIndex = getTrackingRegions(manifest, words, opts.formantTracking)
+
+        if self.cache or manifestFile:
+            audioHash = hashFile(wavFile)
+
+        # reuse the measurements of the vowels that have not changed since the last run (--incremental)
+        reused = [False for e in manifest]
+        if manifestFile:
+            previous = readManifest(manifestFile)
+            for i, e in enumerate(manifest):
+                region = regions[regionIndex[i]] if opts.formantTracking != 'vowel' else None
+                e.measurementKey = self.get_measurement_key(e, audioHash, maxFormant, region)
+                reused[i] = e.measurementKey in previous
+            log.reused = reused.count(True)
+            print("\nReusing the measurements of %i of %i vowels from the last run." % (log.reused, len(manifest)))
+
+        # reuse the analyses of the vowels that have been measured before with the same settings
+        batchCandidates = [None for e in manifest]
+        if self.cache:
+            for i, e in enumerate(manifest):
+                if reused[i]:
+                    continue
+                region = regions[regionIndex[i]] if opts.formantTracking != 'vowel' else None
+                e.cacheKey = self.get_cache_key(e, audioHash, maxFormant, region)
+                batchCandidates[i] = self.cache.get(e.cacheKey)
+            log.cached = len([c for c in batchCandidates if c is not None])
+            print("\nFound the analyses of %i of %i vowels in the cache." % (log.cached, len(manifest)))
+        missing = [i for i, c in enumerate(batchCandidates) if c is None and not reused[i]]
+
+        # measure all (remaining) vowels in the manifest with a single call to the speech software
+        if opts.formantTracking != 'vowel':
+            # compute the formant tracks once per breath group (or file), and cut out the vowels
+            # (only for the regions that contain vowels that are not in the cache)
+            needed = sorted(set(regionIndex[i] for i in missing))
+            getIntensity = {k: False for k in needed}
+            for i in missing:
+                getIntensity[regionIndex[i]] = getIntensity[regionIndex[i]] or needsIntensity(manifest[i].phone)
+            regionCandidates = getBatchCandidates(wavFile, fileStem, [regions[k] for k in needed], [getIntensity[k] for k in needed],
+                                                  self.speechSoftware, self.formantPredictionMethod, self.nFormants, maxFormant,
+                                                  self.windowSize, self.preEmphasis, self.praatCommand, self.praatFileFormat)
+            regionCandidates = dict(zip(needed, regionCandidates))
+            for i in missing:
+                k = regionIndex[i]
+                batchCandidates[i] = getSlicedCandidates(regionCandidates[k], regions[k][0], manifest[i], self.windowSize)
+        elif opts.batch:
+            windows = [(manifest[i].phone.xmin - manifest[i].padBeg, manifest[i].phone.xmax + manifest[i].padEnd) for i in missing]
+            computed = getBatchCandidates(wavFile, fileStem, windows, [needsIntensity(manifest[i].phone) for i in missing],
+                                          self.speechSoftware, self.formantPredictionMethod, self.nFormants, maxFormant,
+                                          self.windowSize, self.preEmphasis, self.praatCommand, self.praatFileFormat)
+            for i, candidates in zip(missing, computed):
+                batchCandidates[i] = candidates
+        if self.cache and (opts.formantTracking != 'vowel' or opts.batch):
+            for i in missing:
+                self.cache.put(manifest[i].cacheKey, batchCandidates[i])
+
+        tasks = [(i, entry, wavFile, fileStem, sound, maxFormant, batchCandidates[i])
+                 for i, entry in enumerate(manifest)]
+        if opts.jobs > 1:
+            # measure the vowels in parallel; the results come back in the order of the manifest
+            # (the engine and the sound file are sent once to each worker process, and the vowels in chunks)
+            pending = [t[:4] + (None,) + t[5:] for t in tasks if not reused[t[0]]]
+            pool = multiprocessing.Pool(opts.jobs, initializer=initMeasureWorker, initargs=(self, sound))
+            results = pool.imap(measureEntryJob, pending, chunksize=max(1, len(pending) // (4 * opts.jobs)))
+        # (measurements of all vowels for the manifest, before remeasurement and normalization)
+        manifestEntries = []
+
+        if not opts.verbose:
+            n_entries = len(manifest)
+            old_percent = 0
+
+            progressbar_width = 100
+            sys.stdout.write("\nExtracting Formants\n")
+            sys.stdout.write("[%s]" % (" " * progressbar_width))
+            sys.stdout.flush()
+            sys.stdout.write("\b" * (progressbar_width + 1))
+                             # return to start of line, after '['
+
+        try:
+            for i, entry in enumerate(manifest):
+                p = entry.phone
+                w = entry.word
 
-                vm = getVowelMeasurement(vowelFileStem, p, w, opts.speechSoftware,
-                                         formantPredictionMethod, measurementPointMethod, nFormants, maxFormant, windowSize, preEmphasis, padBeg, padEnd, speaker)
+                if opts.verbose:
+                    print('')
+                    print("Extracting formants for vowel %s in word %s at %.3f" % (p.label, w.transcription, w.xmin))
+
+                log.mark(log.analyzed + 1, p.label + " in " + w.transcription)
+
+                if reused[i]:
+                    # (saved with its candidate formant tracks)
+                    vm, candidates = previous[entry.measurementKey] or (None, None)
+                    if vm:
+                        vm.candidates = candidates
+                elif opts.jobs > 1:
+                    vm = next(results)
+                else:
+                    vm = self.measure_entry(tasks[i])
 
                 if vm:  # if vowel is too short for smoothing, nothing will be returned
-                    vm.context = p_context
-                    vm.pre_seg = pre_seg
-                    vm.fol_seg = fol_seg
-                    vm.p_index = str(p_index+1)
-                    vm.word_trans = word_trans
-                    vm.pre_word_trans = pre_word_trans
-                    vm.fol_word_trans = fol_word_trans
-                    vm.pre_word = pre_w.transcription
-                    vm.fol_word = fol_w.transcription
+                    vm.context = entry.context
+                    vm.pre_seg = entry.pre_seg
+                    vm.fol_seg = entry.fol_seg
+                    vm.p_index = entry.p_index
+                    vm.word_trans = entry.word_trans
+                    vm.pre_word_trans = entry.pre_word_trans
+                    vm.fol_word_trans = entry.fol_word_trans
+                    vm.pre_word = entry.pre_word
+                    vm.fol_word = entry.fol_word
+                    arena.add(vm)
                     measurements.append(vm)
-                    count_analyzed += 1
-
-        if remeasurement and formantPredictionMethod == 'mahalanobis':
+                    log.analyzed += 1
+                if manifestFile:
+                    manifestEntries.append((entry.measurementKey, p.xmin, p.xmax, p.label, w.transcription, vm))
+
+                # (the progress bar counts the vowels that have been measured)
+                if not opts.verbose:
+                    new_percent = math.floor((float(i + 1) / n_entries) * 100)
+                    for k in range(int(old_percent), int(new_percent)):
+                        sys.stdout.write("-")
+                        sys.stdout.flush()
+                    old_percent = new_percent
+        except BaseException:
+            # (stop the worker processes if a vowel cannot be measured, or the run is interrupted)
+            if opts.jobs > 1:
+                pool.terminate()
+            raise
+
+        if opts.jobs > 1:
+            pool.close()
+            pool.join()
+
+        # keep the cache within its maximum size
+        if self.cache:
+            self.cache.trim()
+        if manifestFile:
+            writeManifest(manifestFile, [(key, beg, end, label, word, (vm, arena.block(vm)) if vm else None)
+                                         for key, beg, end, label, word, vm in manifestEntries])
+
+        if self.remeasurement and self.formantPredictionMethod == 'mahalanobis':
             measurements = remeasure(measurements)
+        # the candidate formant tracks are not needed any more after the remeasurement,
+        # unless they are output
+        if not (self.tracks or self.candidates or opts.pickle):
+            arena.free(measurements)
+
+        return measurements, arena
+
+    def process_file(self, wavFile, tgFile, outputFile):
+        """measures the vowels in a sound file and TextGrid file, and writes the output and log files; returns the log"""
+
+        # initialize counters & timing
+        log = ExtractionLog()
+        log.mark("start")
+
+        # make sure that we can find the input files, and that the TextGrid file is formatted properly
+        # (functions will exit if files not formatted properly)
+        checkWavFile(wavFile)
+        checkTextGridFile(tgFile)
+
+        speaker, vowelSystem = self.get_speaker(tgFile)
+        # (with --incremental, the manifest of the measurements is saved next to the output file)
+        manifestFile = None
+        if self.opts.incremental:
+            manifestFile = os.path.splitext(outputFile)[0] + ".manifest"
+        measurements, arena = self.measure_file(wavFile, tgFile, speaker, log, manifestFile, vowelSystem)
 
         # don't output anything if we didn't take any measurements
         # (this prevents the creation of empty output files)
@@ -2367,18 +2310,36 @@ def extractFormants(wavInput, tgInput, output, opts, SPATH='', PPATH=''):
         # normalize measurements
         measurements, m_means = normalize(measurements, m_means)
         print('')
-        outputMeasurements(outputFormat, measurements, m_means, speaker, outputFile, outputHeader, opts.tracks)
+        outputMeasurements(self.outputFormat, measurements, m_means, speaker, outputFile, self.outputHeader, self.tracks,
+                           self.formantPredictionMethod, self.candidates, arena)
 
-        if opts.pickle:
+        if self.opts.pickle:
             pi = open(os.path.splitext(outputFile)[0] + ".pickle", 'wb')
             pickle.dump(measurements, pi, pickle.HIGHEST_PROTOCOL)
+            # (followed by the candidate formant tracks of the measurements)
+            pickle.dump(arena, pi, pickle.HIGHEST_PROTOCOL)
             pi.close()
 
-        markTime("end")
+        log.mark("end")
 
         # write log file
+        # (with the maximum formant frequency that was used for this speaker)
+        opts = copy.copy(self.opts)
+        opts.maxFormant = getMaxFormant(speaker)
         writeLog(os.path.splitext(outputFile)
-                 [0] + ".formantlog", wavFile, maxTime, meansFile, covsFile, opts)
+                 [0] + ".formantlog", wavFile, log.maxTime, opts.means, opts.covariances, opts, log)
+
+        return log
+
+
+def extractFormants(wavInput, tgInput, output, opts, SPATH='', PPATH=''):
+    """run extractFormants on a sound file and TextGrid file (or on lists of files, for the "multipleFiles" option)"""
+
+    if opts.multipleFiles:
+        processMultipleFiles(wavInput, tgInput, output, opts, SPATH, PPATH)
+    else:
+        engine = ExtractionEngine(opts, SPATH, PPATH)
+        engine.process_file(wavInput, tgInput, output)
 
 
 #
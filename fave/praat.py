@@ -10,35 +10,124 @@
 # - added Intensity class                                                            ##
 # - round all times to three digits (i.e. ms)                                        ##
 # - improved reading of long TextGrid format                                         ##
+# - Formant and Intensity frames are stored in NumPy arrays                          ##
+# - Formant, Intensity and Collection files are split into values in one go          ##
+# - Formant, Intensity and Collection files can also be read in binary format        ##
 #
 
+import re
+import struct
+from itertools import chain
+
+import numpy as np
+
+
+BINARY_HEADER = b'ooBinaryFile'
+
+
+def pad_frames(frames, width=None):
+    """returns a list of per-frame lists of values (of varying length) as a 2D array, padded with NaN"""
+    lengths = np.array([len(f) for f in frames], dtype=int)
+    if width is None:
+        width = lengths.max(initial=0)
+    padded = np.full((len(frames), width), np.nan)
+    padded[np.arange(width)[None, :] < lengths[:, None]] = list(chain.from_iterable(frames))
+    return padded
+
+
+def read_tokens(filename):
+    """returns the object class and the list of values (as strings) of a Praat text file (short or long format)"""
+    f = open(filename, 'r')
+    text = f.read()
+    f.close()
+    # "File type = ...", "Object class = ...", empty line
+    header = text.split('\n', 3)
+    objectClass = header[1].split(' = ')[1].strip().strip('"')
+    body = header[3] if len(header) > 3 else ''
+    if body.lstrip().startswith("xmin") or body.lstrip().startswith("size"):
+        # long format:  "name = value" lines (with "name [i]:" lines in between)
+        tokens = re.findall(r'= *("[^"]*"|\S+)', body)
+    else:
+        # short format:  values only
+        tokens = re.findall(r'"[^"]*"|\S+', body)
+
+    return objectClass, tokens
+
+
+def read_binary_string(data, pos, width=1):
+    """returns a string (preceded by its length in width bytes) from the contents of a Praat binary file, and the position after it"""
+    length = int.from_bytes(data[pos:pos + width], 'big')
+    pos += width
+    if length == 256 ** width - 1:
+        # non-ASCII strings are stored in UTF-16
+        length = int.from_bytes(data[pos:pos + width], 'big')
+        pos += width
+        return data[pos:pos + 2 * length].decode('utf-16-be'), pos + 2 * length
+    return data[pos:pos + length].decode('ascii'), pos + length
+
+
+def read_binary(filename):
+    """returns the object class, the contents and the position of the first value of a Praat binary file"""
+    f = open(filename, 'rb')
+    data = f.read()
+    f.close()
+    objectClass, pos = read_binary_string(data, len(BINARY_HEADER))
+
+    return objectClass, data, pos
+
+
+def read_object_file(filename):
+    """returns the object class, the contents and the position of the first value of a Praat text or binary file
+    (the contents are a list of values for text files, and bytes for binary files)"""
+    f = open(filename, 'rb')
+    header = f.read(len(BINARY_HEADER))
+    f.close()
+    if header == BINARY_HEADER:
+        return read_binary(filename)
+    objectClass, tokens = read_tokens(filename)
+
+    return objectClass, tokens, 0
+
+
+def gather_binary(data, offsets, dtype):
+    """returns an array of the big-endian numbers of the given type at the (byte) offsets in the contents of a binary file"""
+    dtype = np.dtype(dtype).newbyteorder('>')
+    raw = np.frombuffer(data, dtype=np.uint8)
+    offsets = np.asarray(offsets, dtype=int)
+    values = raw[offsets[..., None] + np.arange(dtype.itemsize)].view(dtype)[..., 0]
+    return values.astype(dtype.newbyteorder('='))
+
 
 class Formant:
 
     """represents a formant contour as a series of frames"""
 
-    def __init__(self, name=None):
-        self.__times = []  # list of measurement times (frames)
-        self.__intensities = []
-            # list of intensities (maximum intensity in each frame)
-        self.__formants = []
-            # list of formants frequencies (F1-F3, for each frame)
-        self.__bandwidths = []
-            # list of bandwidths (for each formant F1-F3, for each frame)
+    def __init__(self, name=None, xmin=None, xmax=None, dx=None, x1=None, maxFormants=None):
+        self.__times = np.zeros(0)  # array of measurement times (frames)
+        self.__intensities = np.zeros(0)
+            # array of intensities (maximum intensity in each frame)
+        self.__formants = np.zeros((0, 0))
+            # array of formants frequencies (one row per frame, padded with NaN)
+        self.__bandwidths = np.zeros((0, 0))
+            # array of bandwidths (one row per frame, padded with NaN)
                                       # !!! CHANGED:  all above lists no longer include frames with only
                                       # a minimum of 2 formant measurements
                                       # !!!
-        self.__xmin = None  # start time (in seconds)
-        self.__xmax = None  # end time (in seconds)
+        self.__xmin = xmin  # start time (in seconds)
+        self.__xmax = xmax  # end time (in seconds)
         self.__nx = None  # number of frames
-        self.__dx = None  # time step = frame duration (in seconds)
-        self.__x1 = None  # start time of first frame (in seconds)
-        self.__maxFormants = None  # maximum number of formants in a frame
+        self.__dx = dx  # time step = frame duration (in seconds)
+        self.__x1 = x1  # start time of first frame (in seconds)
+        self.__maxFormants = maxFormants  # maximum number of formants in a frame
 
     def n(self):
         """returns the number of frames"""
         return self.__nx
 
+    def dx(self):
+        """returns the time step (in seconds)"""
+        return self.__dx
+
     def xmin(self):
         """returns start time (in seconds)"""
         return self.__xmin
@@ -48,105 +137,139 @@ class Formant:
         return self.__xmax
 
     def times(self):
-        """returns list of measurement times (frames)"""
+        """returns array of measurement times (frames)"""
         return self.__times
 
     def intensities(self):
-        """returns list of intensities (maximum intensity in each frame)"""
+        """returns array of intensities (maximum intensity in each frame)"""
         return self.__intensities
 
     def formants(self):
         """returns list of formant listings (F1-F3, for each frame)"""
-        return self.__formants
+        return [row[:n].tolist() for row, n in zip(self.__formants, self.n_formants())]
 
     def bandwidths(self):
         """returns a list of formant bandwidths (for each formant F1-F3, for each frame)"""
+        return [row[:n].tolist() for row, n in zip(self.__bandwidths, self.n_formants())]
+
+    def formant_array(self):
+        """returns the formant frequencies as an array (one row per frame, padded with NaN)"""
+        return self.__formants
+
+    def bandwidth_array(self):
+        """returns the formant bandwidths as an array (one row per frame, padded with NaN)"""
         return self.__bandwidths
 
-    def read(self, file):
-        """reads Formant from Praat .Formant file (either short or long file format)"""
-        text = open(file, 'rU')
-        text.readline()  # header
-        text.readline()
-        text.readline()
-        # short or long Formant format?
-        line = text.readline().rstrip().split()  # read fields in next line
-        if len(line) == 3 and line[0] == "xmin":  # line reads "xmin = xxx.xxxxx"
-            format = "long"
-        elif len(line) == 1 and line[0] != '':  # line reads "xxx.xxxxx"
-            format = "short"
+    def n_formants(self):
+        """returns the number of formants in each frame"""
+        return (~np.isnan(self.__formants)).sum(axis=1)
+
+    def set_frames(self, times, intensities, formants, bandwidths):
+        """sets all frames of the formant contour (formants and bandwidths as lists of per-frame lists, or as padded arrays)"""
+        self.__times = np.asarray(times, dtype=float)
+        self.__intensities = np.asarray(intensities, dtype=float)
+        if isinstance(formants, np.ndarray):
+            self.__formants = formants
+            self.__bandwidths = bandwidths
         else:
-            print("WARNING!!!  Unknown format for Formant file!")
+            self.__formants = pad_frames(formants)
+            self.__bandwidths = pad_frames(bandwidths, self.__formants.shape[1])
+        if self.__x1 is None and len(self.__times):
+            self.__x1 = float(self.__times[0])
+        self.__nx = len(self.__times)
 
-        if format == "short":  # SHORT FORMANT FORMAT
-            self.__xmin = round(float(line[0]), 3)  # start time
-            self.__xmax = round(float(text.readline().rstrip()), 3)  # end time
-            self.__nx = int(text.readline().rstrip())  # number of frames
-            self.__dx = round(
-                float(text.readline().rstrip()), 3)  # frame duration
-            self.__x1 = round(
-                float(text.readline().rstrip()), 3)  # time of first frame
-            self.__maxFormants = int(
-                text.readline().rstrip())  # maximum number of formants
-
-            for i in range(self.__nx):  # for each frame:
-                time = round((i * self.__dx + self.__x1), 3)
-                intensity = float(text.readline().rstrip())
-                nFormants = int(text.readline().rstrip())
-                F = []
-                B = []
-                for j in range(nFormants):
-                    F.append(float(text.readline().rstrip()))
-                    B.append(float(text.readline().rstrip()))
-                # CHANGED
-                # force at least 3 formants to be returned for each measurment,
-                # if Praat didn't find at least three, then we'll disregard this measurement
-                # if nFormants < 2:
-                #  continue
-                self.__times.append(time)
-                self.__intensities.append(intensity)
-                self.__formants.append(F)
-                self.__bandwidths.append(B)
-
-        elif format == "long":  # LONG FORMANT FORMAT
-            self.__xmin = round(float(line[2]), 3)  # start time
-            self.__xmax = round(
-                float(text.readline().rstrip().split()[2]), 3)  # end time
-            self.__nx = int(
-                text.readline().rstrip().split()[2])  # number of frames
-            self.__dx = round(
-                float(text.readline().rstrip().split()[2]), 3)  # frame duration
-            self.__x1 = round(
-                float(text.readline().rstrip().split()[2]), 3)  # time of first frame
-            self.__maxFormants = int(
-                text.readline().rstrip().split()[2])  # maximum number of formants
-
-            text.readline()  # "frame[]:"
-            for i in range(self.__nx):  # for each frame:
-                text.readline()  # "frame[i]:"
-                time = round((i * self.__dx + self.__x1), 3)
-                intensity = float(text.readline().rstrip().split()[2])
-                nFormants = int(text.readline().rstrip().split()[2])
-                F = []
-                B = []
-                text.readline()  # "formant[]:"
-                for j in range(nFormants):
-                    text.readline()  # "formant[i]:"
-                    F.append(float(text.readline().rstrip().split()[2]))
-                    B.append(float(text.readline().rstrip().split()[2]))
-                # see above...
-                # force at least 3 formants to be returned for each measurment,
-                # if Praat didn't find at least three, then we'll disregard this measurement
-                # if nFormants < 2:
-                #  continue
-                self.__times.append(time)
-                self.__intensities.append(intensity)
-                self.__formants.append(F)
-                self.__bandwidths.append(B)
-
-        # update self.__nx
-        self.__nx = len(self.__formants)
-        text.close()
+    def append(self, time, intensity, formants, bandwidths):
+        """adds a frame (time, intensity, formant frequencies and bandwidths) to the formant contour"""
+        self.set_frames(self.__times.tolist() + [time], self.__intensities.tolist() + [intensity],
+                        self.formants() + [formants], self.bandwidths() + [bandwidths])
+
+    def change_offset(self, offset):
+        """shifts all times of the formant contour by offset"""
+        self.__xmin += offset
+        self.__xmax += offset
+        if self.__x1 is not None:
+            self.__x1 += offset
+        self.__times = self.__times + offset
+
+    def extract_part(self, tmin, tmax):
+        """returns a new Formant object with the frames between tmin and tmax (times are preserved)"""
+        part = Formant(xmin=tmin, xmax=tmax, dx=self.__dx, maxFormants=self.__maxFormants)
+        keep = (tmin <= self.__times) & (self.__times <= tmax)
+        part.set_frames(self.__times[keep], self.__intensities[keep], self.__formants[keep], self.__bandwidths[keep])
+        return part
+
+    def read_values(self, tokens, start=0):
+        """reads a Formant from the values of a Praat text file (see read_tokens) or the contents of a binary file, from position start on; returns the next position"""
+        if isinstance(tokens, bytes):
+            return self.read_binary(tokens, start)
+        self.__xmin = round(float(tokens[start]), 3)  # start time
+        self.__xmax = round(float(tokens[start + 1]), 3)  # end time
+        nx = int(tokens[start + 2])  # number of frames
+        self.__dx = round(float(tokens[start + 3]), 3)  # frame duration
+        self.__x1 = round(float(tokens[start + 4]), 3)  # time of first frame
+        self.__maxFormants = int(tokens[start + 5])  # maximum number of formants
+        first = start + 6
+
+        # each frame is stored as:  intensity, nFormants, (frequency, bandwidth) for each formant;
+        # only the number of formants is needed to find the start of the next frame
+        starts = np.empty(nx, dtype=int)
+        pos = first
+        for i in range(nx):
+            starts[i] = pos - first
+            pos += 2 + 2 * int(tokens[pos + 1])
+        # convert all numbers at once
+        body = np.array(tokens[first:pos], dtype=float)
+
+        nFormants = body[starts + 1].astype(int)
+        columns = np.arange(nFormants.max(initial=0))
+        present = columns[None, :] < nFormants[:, None]
+        index = (starts[:, None] + 2 + 2 * columns[None, :])[present]
+        formants = np.full(present.shape, np.nan)
+        formants[present] = body[index]
+        bandwidths = np.full(present.shape, np.nan)
+        bandwidths[present] = body[index + 1]
+        # CHANGED
+        # frames with fewer than 3 formants are no longer disregarded
+        times = [round((i * self.__dx + self.__x1), 3) for i in range(nx)]
+
+        # (also updates self.__nx)
+        self.set_frames(times, body[starts], formants, bandwidths)
+        return pos
+
+    def read_binary(self, data, start):
+        """reads a Formant from the contents of a Praat binary file, from (byte) position start on; returns the next position"""
+        xmin, xmax, nx, dx, x1, self.__maxFormants = struct.unpack_from('>ddiddh', data, start)
+        self.__xmin = round(xmin, 3)
+        self.__xmax = round(xmax, 3)
+        self.__dx = round(dx, 3)
+        self.__x1 = round(x1, 3)
+
+        # each frame is stored as:  intensity (8 bytes), nFormants (2 bytes),
+        # (frequency, bandwidth) for each formant (8 bytes each)
+        starts = np.empty(nx, dtype=int)
+        pos = start + 38
+        for i in range(nx):
+            starts[i] = pos
+            pos += 10 + 16 * struct.unpack_from('>h', data, pos + 8)[0]
+
+        nFormants = gather_binary(data, starts + 8, 'i2')
+        columns = np.arange(nFormants.max(initial=0))
+        present = columns[None, :] < nFormants[:, None]
+        offsets = (starts[:, None] + 10 + 16 * columns[None, :])[present]
+        formants = np.full(present.shape, np.nan)
+        formants[present] = gather_binary(data, offsets, 'f8')
+        bandwidths = np.full(present.shape, np.nan)
+        bandwidths[present] = gather_binary(data, offsets + 8, 'f8')
+        times = [round((i * self.__dx + self.__x1), 3) for i in range(nx)]
+
+        # (also updates self.__nx)
+        self.set_frames(times, gather_binary(data, starts, 'f8'), formants, bandwidths)
+        return pos
+
+    def read(self, file):
+        """reads Formant from Praat .Formant file (short or long text format, or binary)"""
+        objectClass, contents, start = read_object_file(file)
+        self.read_values(contents, start)
 
 
 class LPC:
@@ -294,15 +417,15 @@ class Intensity:
 
     """represents an intensity contour"""
 
-    def __init__(self):
-        self.__xmin = None
-        self.__xmax = None
+    def __init__(self, xmin=None, xmax=None, dx=None):
+        self.__xmin = xmin
+        self.__xmax = xmax
         self.__n = None
         self.__nx = None
-        self.__dx = None
+        self.__dx = dx
         self.__x1 = None
-        self.__times = []
-        self.__intensities = []
+        self.__times = np.zeros(0)
+        self.__intensities = np.zeros(0)
 
     def __str__(self):
         return '<Intensity object with %i frames>' % self.__n
@@ -329,73 +452,127 @@ class Intensity:
     def intensities(self):
         return self.__intensities
 
+    def set_frames(self, times, intensities):
+        """sets all frames (times and intensities) of the intensity contour"""
+        self.__times = np.asarray(times, dtype=float)
+        self.__intensities = np.asarray(intensities, dtype=float)
+        if len(self.__times):
+            self.__x1 = float(self.__times[0])
+        self.__n = self.__nx = len(self.__intensities)
+
     def change_offset(self, offset):
         self.__xmin += offset
         self.__xmax += offset
         self.__x1 += offset
-        self.__times = [t + offset for t in self.__times]
+        self.__times = self.__times + offset
+
+    def extract_part(self, tmin, tmax):
+        """returns a new Intensity object with the frames between tmin and tmax (times are preserved)"""
+        part = Intensity()
+        part.__xmin = tmin
+        part.__xmax = tmax
+        part.__dx = self.__dx
+        keep = (tmin <= self.__times) & (self.__times <= tmax)
+        part.__times = self.__times[keep]
+        part.__intensities = self.__intensities[keep]
+        if len(part.__times):
+            part.__x1 = float(part.__times[0])
+        part.__n = part.__nx = len(part.__intensities)
+        return part
+
+    def read_values(self, tokens, start=0):
+        """reads an intensity contour from the values of a Praat text file (see read_tokens) or the contents of a binary file, from position start on; returns the next position"""
+        if isinstance(tokens, bytes):
+            return self.read_binary(tokens, start)
+        self.__xmin = round(float(tokens[start]), 3)  # start time (xmin)
+        self.__xmax = round(float(tokens[start + 1]), 3)  # end time (xmax)
+        self.__n = int(tokens[start + 2])  # number of frames (nx)
+        self.__dx = round(float(tokens[start + 3]), 3)  # frame duration (dx)
+        self.__x1 = round(float(tokens[start + 4]), 3)  # time of first frame (x1)
+        # (ymin, ymax, ny, dy, y1)
+        first = start + 10
+        self.__times = np.array([round((i * self.__dx + self.__x1), 3) for i in range(self.__n)])
+        self.__intensities = np.array(tokens[first:first + self.__n], dtype=float)
 
-    def read(self, filename):
-        """reads an intensity object from a (short or long) text file"""
-        text = open(filename, 'rU')
-        text.readline()  # "File type = ..."
-        text.readline()  # "Object class = ..."
-        text.readline()
-        # short or long Formant format?
-        line = text.readline().rstrip().split()  # read fields in next line
-        if len(line) == 3 and line[0] == "xmin":  # line reads "xmin = xxx.xxxxx"
-            format = "long"
-        elif len(line) == 1 and line[0] != '':  # line reads "xxx.xxxxx"
-            format = "short"
-        else:
-            print("WARNING!!!  Unknown format for Intensity file!")
-
-        if format == "short":  # SHORT FORMAT
-            self.__xmin = round(float(line[0]), 3)  # start time (xmin)
-            self.__xmax = round(
-                float(text.readline().rstrip()), 3)  # end time (xmax)
-            self.__n = int(text.readline().rstrip())  # number of frames (nx)
-            self.__dx = round(
-                float(text.readline().rstrip()), 3)  # frame duration (dx)
-            self.__x1 = round(
-                float(text.readline().rstrip()), 3)  # time of first frame (x1)
-            text.readline()  # (ymin)
-            text.readline()  # (ymax)
-            text.readline()  # (ny)
-            text.readline()  # (dy)
-            text.readline()  # (y1)
-            for i in range(self.__n):  # for each frame:
-                time = round((i * self.__dx + self.__x1), 3)
-                intensity = float(text.readline().rstrip())
-                self.__times.append(time)
-                self.__intensities.append(intensity)
-
-        elif format == "long":  # LONG FORMAT
-            self.__xmin = round(float(line[2]), 3)  # start time (xmin)
-            self.__xmax = round(
-                float(text.readline().rstrip().split()[2]), 3)  # end time (xmax)
-            self.__n = int(
-                text.readline().rstrip().split()[2])  # number of frames (nx)
-            self.__dx = round(
-                float(text.readline().rstrip().split()[2]), 3)  # frame duration (dx)
-            self.__x1 = round(
-                float(text.readline().rstrip().split()[2]), 3)  # time of first frame (x1)
-            text.readline()  # (ymin)
-            text.readline()  # (ymax)
-            text.readline()  # (ny)
-            text.readline()  # (dy)
-            text.readline()  # (y1)
-            text.readline()  # "z [] []: "
-            text.readline()  # "z [1]: "
-            for i in range(self.__nx):  # for each frame:
-                time = round((i * self.__dx + self.__x1), 3)
-                intensity = float(text.readline().rstrip().split(' = ')[1])
-                self.__times.append(time)
-                self.__intensities.append(intensity)
+        # update self.__n
+        self.__nx = len(self.__intensities)
+        return first + self.__n
+
+    def read_binary(self, data, start):
+        """reads an intensity contour from the contents of a Praat binary file, from (byte) position start on; returns the next position"""
+        xmin, xmax, self.__n, dx, x1, ymin, ymax, ny, dy, y1 = struct.unpack_from('>ddiddddidd', data, start)
+        self.__xmin = round(xmin, 3)
+        self.__xmax = round(xmax, 3)
+        self.__dx = round(dx, 3)
+        self.__x1 = round(x1, 3)
+        first = start + 72
+        self.__times = np.array([round((i * self.__dx + self.__x1), 3) for i in range(self.__n)])
+        self.__intensities = np.frombuffer(data, dtype='>f8', count=self.__n, offset=first).astype(float)
 
         # update self.__n
         self.__nx = len(self.__intensities)
-        text.close()
+        return first + 8 * ny * self.__n
+
+    def read(self, filename):
+        """reads an intensity object from a (short or long) text file or a binary file"""
+        objectClass, contents, start = read_object_file(filename)
+        self.read_values(contents, start)
+
+
+class Collection:
+
+    """represents a list of Formant and Intensity objects saved together in one Praat text file"""
+
+    def __init__(self):
+        self.__items = []
+
+    def __str__(self):
+        return '<Collection object with %i items>' % len(self.__items)
+
+    def __iter__(self):
+        return iter(self.__items)
+
+    def __len__(self):
+        return len(self.__items)
+
+    def __getitem__(self, i):
+        """returns the (i+1)th object"""
+        return self.__items[i]
+
+    def read(self, filename):
+        """reads the objects of a Collection (or a single object) from a (short or long) text file or a binary file"""
+        objectClass, contents, pos = read_object_file(filename)
+        if objectClass == "Collection":
+            if isinstance(contents, bytes):
+                size = struct.unpack_from('>i', contents, pos)[0]
+                pos += 4
+            else:
+                size = int(contents[pos])
+                pos += 1
+            for i in range(size):
+                if isinstance(contents, bytes):
+                    itemClass, pos = read_binary_string(contents, pos)
+                    name, pos = read_binary_string(contents, pos, 2)
+                else:
+                    itemClass = contents[pos].strip('"')
+                    # (contents[pos + 1] is the object name)
+                    pos += 2
+                item, pos = self.__read_item(contents, pos, itemClass)
+                self.__items.append(item)
+        else:
+            # Praat saves a single selected object on its own
+            self.__items.append(self.__read_item(contents, pos, objectClass)[0])
+
+    def __read_item(self, tokens, start, itemClass):
+        """reads a single Formant or Intensity object; returns the object and the position after its last value"""
+        if itemClass.startswith("Formant"):
+            item = Formant()
+        elif itemClass.startswith("Intensity"):
+            item = Intensity()
+        else:
+            raise ValueError("Unsupported object class in Collection: %s" % itemClass)
+
+        return item, item.read_values(tokens, start)
 
 
 class TextGrid:
@@ -0,0 +1,67 @@
+"""
+Checks the cache of vowel analyses (--cache):  entries are read back as they
+were stored, and trimming the cache removes the least recently used entries
+first.
+"""
+
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+from fave.extract.cache import CandidateCache
+
+
+class CandidateCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_round_trip(self):
+        cache = CandidateCache(self.directory)
+        key = cache.key('vowel.wav', 0.347, 0.538, (3, 4, 5, 6), 5000.0)
+        self.assertIsNone(cache.get(key))
+        candidates = ([0.35, 0.36], [[575.5, 834.3, 1917.6], [580.25, 840.0, None]], {'nFormants': 6})
+        cache.put(key, candidates)
+        self.assertEqual(cache.get(key), candidates)
+        # (another analysis of the same vowel has another key)
+        self.assertNotEqual(cache.key('vowel.wav', 0.347, 0.538, (3, 4, 5, 6), 5500.0), key)
+        self.assertEqual(cache.key('vowel.wav', 0.347, 0.538, (3, 4, 5, 6), 5000.0), key)
+
+    def test_unreadable_entry(self):
+        cache = CandidateCache(self.directory)
+        key = cache.key('vowel.wav', 0.347, 0.538)
+        cache.put(key, [1.0, 2.0])
+        # (an entry that was cut off is analyzed again)
+        with open(cache.path(key), 'r+b') as f:
+            f.truncate(5)
+        self.assertIsNone(cache.get(key))
+
+    def test_trim(self):
+        cache = CandidateCache(self.directory)
+        keys = [cache.key('vowel.wav', i) for i in range(4)]
+        now = time.time()
+        for i, key in enumerate(keys):
+            cache.put(key, bytes(10000))
+            os.utime(cache.path(key), (now - 100 + i, now - 100 + i))
+        # reading an entry makes it the most recently used one
+        self.assertEqual(cache.get(keys[0]), bytes(10000))
+        size = os.path.getsize(cache.path(keys[0]))
+
+        # room for two entries
+        cache.maxSize = 2 * size
+        cache.trim()
+        self.assertEqual([cache.get(key) is not None for key in keys], [True, False, False, True])
+
+        # nothing is removed from a cache that is small enough
+        cache.trim()
+        self.assertTrue(os.path.exists(cache.path(keys[0])))
+        self.assertTrue(os.path.exists(cache.path(keys[3])))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,87 @@
+"""
+Checks the native formant analysis (--speechSoftware native) on signals with
+known formants:  the roots of LPC coefficients built from known resonances,
+Burg's method on a signal generated by an all-pole filter, and the whole
+analysis of a synthetic vowel (a pulse train filtered by five resonators).
+"""
+
+import math
+import unittest
+
+import numpy as np
+
+from fave.extract import lpc
+
+# formants and bandwidths of the synthetic vowel (a neutral vowel, like schwa)
+FORMANTS = [500.0, 1500.0, 2500.0, 3500.0, 4500.0]
+BANDWIDTHS = [60.0, 90.0, 120.0, 150.0, 200.0]
+
+
+def coefficientsFromFormants(formants, bandwidths, sampleRate):
+    """returns the LPC coefficients of an all-pole filter with the given resonances"""
+
+    # a[k] predicts x[n] as sum(a[k] * x[n-k-1]), as returned by lpc.burg
+    poles = []
+    for f, b in zip(formants, bandwidths):
+        pole = math.exp(-math.pi * b / sampleRate) * np.exp(2j * math.pi * f / sampleRate)
+        poles.extend([pole, np.conj(pole)])
+    return -np.poly(poles).real[1:]
+
+
+def allPoleFilter(excitation, coefficients):
+    """returns the output of an all-pole filter"""
+
+    order = len(coefficients)
+    output = np.zeros(len(excitation) + order)
+    for n in range(len(excitation)):
+        output[n + order] = excitation[n] + np.dot(coefficients, output[n:n + order][::-1])
+    return output[order:]
+
+
+class FormantsTest(unittest.TestCase):
+
+    def test_formants_from_coefficients(self):
+        coefficients = coefficientsFromFormants(FORMANTS, BANDWIDTHS, 10000.0)
+        formants, bandwidths = lpc.formantsFromCoefficients(coefficients, 5000.0)
+        self.assertEqual(len(formants), 1)
+        np.testing.assert_allclose(formants[0], FORMANTS, atol=1e-6)
+        np.testing.assert_allclose(bandwidths[0], BANDWIDTHS, atol=1e-6)
+
+    def test_safety_margin(self):
+        # (resonances too close to 0 Hz or to the Nyquist frequency are left out)
+        coefficients = coefficientsFromFormants([30.0, 1500.0, 4980.0], [60.0, 90.0, 120.0], 10000.0)
+        formants, bandwidths = lpc.formantsFromCoefficients(coefficients, 5000.0)
+        np.testing.assert_allclose(formants[0], [1500.0], atol=1e-6)
+
+    def test_burg(self):
+        rng = np.random.RandomState(1)
+        coefficients = coefficientsFromFormants(FORMANTS, BANDWIDTHS, 10000.0)
+        signal = allPoleFilter(rng.standard_normal(4000), coefficients)
+        frames = np.array([signal[1000:3000], signal[2000:4000]])
+        a = lpc.burg(frames, 10)
+        self.assertEqual(a.shape, (2, 10))
+        formants, bandwidths = lpc.formantsFromCoefficients(a, 5000.0)
+        for frameFormants in formants:
+            np.testing.assert_allclose(frameFormants, FORMANTS, rtol=0.03)
+        # (the models of lower orders are those of the same recursion)
+        models = lpc.burg(frames, 10, [6, 8, 10])
+        self.assertEqual(sorted(models), [6, 8, 10])
+        np.testing.assert_allclose(models[10], a)
+        np.testing.assert_allclose(models[8], lpc.burg(frames, 8))
+
+    def test_synthetic_vowel(self):
+        # 100 Hz pulse train through the resonators, at 16 kHz (resampled to 10 kHz by the analysis)
+        sampleRate = 16000
+        excitation = np.zeros(int(0.3 * sampleRate))
+        excitation[::sampleRate // 100] = 1.0
+        samples = allPoleFilter(excitation, coefficientsFromFormants(FORMANTS, BANDWIDTHS, sampleRate))
+        fmt = lpc.soundToFormant(samples, sampleRate, 5, 5000.0, 0.025, 50.0, 0.01)
+        self.assertGreater(fmt.n(), 20)
+        # (LPC of a pulse train overestimates F1 a little, and so does Praat:  535 Hz instead of 500 Hz)
+        for i, tolerance in enumerate([0.1, 0.03, 0.03]):
+            measured = np.median([frame[i] for frame in fmt.formants() if len(frame) > i])
+            self.assertAlmostEqual(measured / FORMANTS[i], 1.0, delta=tolerance)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,62 @@
+"""
+Checks that mahalanobis_batch computes the same distances as the scalar
+mahalanobis function, which it replaces in the formant prediction, with one
+matrix for all observations, one matrix per observation, and Cholesky
+factors of the matrices.
+"""
+
+import unittest
+
+import numpy as np
+
+from fave.extract.mahalanobis import ClassParameters, mahalanobis, mahalanobis_batch
+
+N = 4  # number of dimensions (F1, F2, B1, B2 in extractFormants)
+
+
+def inverseCovariance(rng):
+    return np.linalg.inv(np.cov(rng.random_sample((N, N * N))))
+
+
+class MahalanobisBatchTest(unittest.TestCase):
+
+    def setUp(self):
+        rng = np.random.RandomState(1)
+        self.U = rng.random_sample((20, N)) * 1000
+        self.v = rng.random_sample(N) * 1000
+        self.V = rng.random_sample((20, N)) * 1000
+        self.ic = inverseCovariance(rng)
+        self.ics = np.array([inverseCovariance(rng) for u in self.U])
+
+    def test_one_matrix(self):
+        distances = mahalanobis_batch(self.U, self.v, self.ic)
+        self.assertEqual(distances.shape, (len(self.U),))
+        np.testing.assert_allclose(distances, [mahalanobis(u, self.v, self.ic) for u in self.U], rtol=1e-12)
+
+    def test_matrix_per_row(self):
+        distances = mahalanobis_batch(self.U, self.V, self.ics)
+        np.testing.assert_allclose(distances, [mahalanobis(u, v, ic) for u, v, ic in zip(self.U, self.V, self.ics)],
+                                   rtol=1e-12)
+
+    def test_cholesky(self):
+        np.testing.assert_allclose(mahalanobis_batch(self.U, self.v, np.linalg.cholesky(self.ic), True),
+                                   [mahalanobis(u, self.v, self.ic) for u in self.U], rtol=1e-9)
+        np.testing.assert_allclose(mahalanobis_batch(self.U, self.V, np.linalg.cholesky(self.ics), True),
+                                   [mahalanobis(u, v, ic) for u, v, ic in zip(self.U, self.V, self.ics)], rtol=1e-9)
+
+    def test_single_observation(self):
+        distances = mahalanobis_batch(self.U[0], self.v, self.ic)
+        np.testing.assert_allclose(distances, [mahalanobis(self.U[0], self.v, self.ic)], rtol=1e-12)
+
+    def test_class_parameters(self):
+        # (the parameters of each observation gathered by class label)
+        means = ClassParameters({'1': self.V[0], '2': self.V[1]})
+        ics = ClassParameters({'1': self.ics[0], '2': self.ics[1]})
+        labels = ['2', '1', '1', '2']
+        distances = mahalanobis_batch(self.U[:4], means.values[means.rows(labels)], ics.values[ics.rows(labels)])
+        np.testing.assert_allclose(distances, [mahalanobis(u, means[label], ics[label])
+                                               for u, label in zip(self.U, labels)], rtol=1e-12)
+
+
+if __name__ == '__main__':
+    unittest.main()
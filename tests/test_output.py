@@ -0,0 +1,130 @@
+"""
+Checks that the MeasurementWriter writes the same tables of measurements
+(outputFile.txt and outputFile_norm.txt) as before.
+
+The files measurements_*.txt in tests/data were written by the earlier
+outputMeasurements function of extractFormants (which wrote the tables one
+field at a time) from the measurements below, once with the Mahalanobis
+method and --candidates, and once with the default method.
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from fave.extract import output
+from fave.extract.records import VowelMeasurement
+from fave.extractFormants import Speaker
+
+DATA = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data')
+
+SPEAKER = {'name': 'Test Speaker', 'first_name': 'Test', 'last_name': 'Speaker', 'age': '40',
+           'sex': 'm', 'ethnicity': '', 'years_of_schooling': '', 'location': 'Philadelphia',
+           'city': '', 'state': 'PA', 'year': '2020', 'tiernum': 0}
+
+MEASUREMENTS = [
+    # all formants and bandwidths
+    {'phone': 'AO', 'stress': '1', 'pre_word': 'SP', 'word': 'BOUGHT', 'fol_word': 'SP',
+     'f1': 575.5, 'f2': 834.3, 'f3': 1917.6, 'b1': 87.6, 'b2': 96.7, 'b3': 886.2,
+     't': 0.411, 'beg': 0.347, 'end': 0.538, 'dur': 0.191,
+     'cd': '42', 'fm': '1', 'fp': '4', 'fv': '1', 'ps': '1', 'fs': '',
+     'pre_seg': 'B', 'fol_seg': 'T', 'context': 'internal', 'p_index': '2',
+     'pre_word_trans': 'SP', 'word_trans': 'B AO1 T', 'fol_word_trans': 'SP',
+     'tracks': [590.04, 841.349, 578.9, 839.75, 566.0, 816.6, 622.6, 985.7, 643.1, 935.3],
+     'nFormants': 6, 'poles': [575.5, 834.3, 1917.6], 'bandwidths': [87.6, 96.7, 886.2],
+     'norm_f1': 612.4, 'norm_f2': 901.1,
+     'norm_tracks': [630.11, 910.0, 618.5, 907.25, 605.0, 882.6, 663.2, 1064.9, 685.0, 1010.4]},
+    # missing (or zero) formants and bandwidths, missing track values, style and glide coding
+    {'phone': 'AY', 'stress': 2, 'pre_word': 'BOUGHT', 'word': 'TIME', 'fol_word': 'PAPA',
+     'f1': 702.1, 'f2': None, 'f3': '', 'b1': 120.0, 'b2': 0.0, 'b3': None,
+     't': 0.61, 'beg': 0.55, 'end': 0.71, 'dur': 0.16,
+     'cd': '41', 'fm': '4', 'fp': '1', 'fv': '', 'ps': '3', 'fs': '1', 'style': 'R', 'glide': 'g',
+     'pre_seg': 'T', 'fol_seg': 'M', 'context': 'final', 'p_index': '1',
+     'pre_word_trans': 'B AO1 T', 'word_trans': 'T AY2 M', 'fol_word_trans': 'P AA1 P AH0',
+     'tracks': [690.0, '', 701.25, 0.0, 705.55, None, 698.4, 1450.05, '', ''],
+     'nFormants': 5, 'poles': [], 'bandwidths': [],
+     'norm_f1': 740.0, 'norm_f2': '',
+     'norm_tracks': [728.3, '', 740.0, '', 745.0, '', 737.1, 1530.6, '', '']},
+    # no formant setting (measured with a fixed number of formants), no normalized tracks
+    {'phone': 'IY', 'stress': '0', 'word': 'PAPA', 'fol_word': 'SP',
+     'f1': 310.0, 'f2': 2210.0, 'f3': 2890.5, 'b1': 45.0, 'b2': 210.3, 'b3': 400.0,
+     't': 1.02, 'beg': 0.98, 'end': 1.06, 'dur': 0.08, 'cd': '11',
+     'tracks': [312.5, 2200.0, 310.0, 2210.0, 308.75, 2215.5, 309.0, 2190.0, 311.25, 2180.0],
+     'poles': [310.0, 2210.0, 2890.5, 3500.0], 'bandwidths': [45.0, 210.3, 400.0, 550.0],
+     'norm_f1': 327.3, 'norm_f2': 2333.4}]
+
+
+def dataFile(name):
+    return os.path.join(DATA, name)
+
+
+def makeSpeaker():
+    speaker = Speaker()
+    for name, value in SPEAKER.items():
+        setattr(speaker, name, value)
+    return speaker
+
+
+def makeMeasurements():
+    measurements = []
+    for fields in MEASUREMENTS:
+        vm = VowelMeasurement()
+        for name, value in fields.items():
+            setattr(vm, name, value)
+        measurements.append(vm)
+    return measurements
+
+
+class MeasurementWriterTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def assertSameFile(self, filename, expected):
+        with open(filename, 'rb') as f:
+            written = f.read()
+        with open(dataFile(expected), 'rb') as f:
+            self.assertEqual(written, f.read())
+
+    def writeMeasurements(self, formantPredictionMethod, candidates):
+        filename = os.path.join(self.directory, 'measurements.txt')
+        normFilename = os.path.join(self.directory, 'measurements_norm.txt')
+        writer = output.MeasurementWriter(filename, normFilename, makeSpeaker(), True,
+                                          formantPredictionMethod, candidates)
+        writer.write_all(makeMeasurements())
+        writer.close()
+        return filename, normFilename
+
+    def test_mahalanobis(self):
+        filename, normFilename = self.writeMeasurements('mahalanobis', True)
+        self.assertSameFile(filename, 'measurements_mahalanobis.txt')
+        self.assertSameFile(normFilename, 'measurements_mahalanobis_norm.txt')
+
+    def test_default(self):
+        filename, normFilename = self.writeMeasurements('default', False)
+        self.assertSameFile(filename, 'measurements_default.txt')
+        self.assertSameFile(normFilename, 'measurements_default_norm.txt')
+
+    def test_blocks(self):
+        # (rows that are written in several blocks, and one at a time)
+        blockRows = output.BLOCK_ROWS
+        output.BLOCK_ROWS = 2
+        try:
+            filename = os.path.join(self.directory, 'measurements.txt')
+            normFilename = os.path.join(self.directory, 'measurements_norm.txt')
+            writer = output.MeasurementWriter(filename, normFilename, makeSpeaker(), True, 'mahalanobis', True)
+            for vm in makeMeasurements():
+                writer.write(vm)
+            writer.close()
+        finally:
+            output.BLOCK_ROWS = blockRows
+        self.assertSameFile(filename, 'measurements_mahalanobis.txt')
+        self.assertSameFile(normFilename, 'measurements_mahalanobis_norm.txt')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,73 @@
+"""
+Checks that Praat binary files (--praatFileFormat binary) are read the same
+as short text files.
+
+The files in tests/data were saved by Praat 6.1 from the same Formant and
+Intensity objects (a vowel of 80 ms, time step 5 ms, up to 6 formants), once
+with "Save as short text file" and once with "Save as binary file";
+vowel_collection*.txt hold both objects together, as written by
+extractBatch.praat.
+"""
+
+import os
+import unittest
+
+import numpy as np
+
+from fave import praat
+
+DATA = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data')
+
+
+def dataFile(name):
+    return os.path.join(DATA, name)
+
+
+class BinaryFileTest(unittest.TestCase):
+
+    def assertSameFormant(self, text, binary):
+        self.assertEqual((text.xmin(), text.xmax(), text.n(), text.dx()),
+                         (binary.xmin(), binary.xmax(), binary.n(), binary.dx()))
+        np.testing.assert_array_equal(text.times(), binary.times())
+        np.testing.assert_array_equal(text.intensities(), binary.intensities())
+        np.testing.assert_array_equal(text.formant_array(), binary.formant_array())
+        np.testing.assert_array_equal(text.bandwidth_array(), binary.bandwidth_array())
+
+    def assertSameIntensity(self, text, binary):
+        self.assertEqual((text.xmin(), text.xmax(), text.len()), (binary.xmin(), binary.xmax(), binary.len()))
+        np.testing.assert_array_equal(text.times(), binary.times())
+        np.testing.assert_array_equal(text.intensities(), binary.intensities())
+
+    def test_formant(self):
+        text = praat.Formant()
+        text.read(dataFile('vowel.Formant'))
+        binary = praat.Formant()
+        binary.read(dataFile('vowel_binary.Formant'))
+        # (the frames have 5 or 6 formants, so that the records of the binary file differ in length)
+        self.assertEqual(binary.n_formants().tolist(), [5, 6, 5, 6, 6, 5, 6])
+        self.assertSameFormant(text, binary)
+
+    def test_intensity(self):
+        text = praat.Intensity()
+        text.read(dataFile('vowel.Intensity'))
+        binary = praat.Intensity()
+        binary.read(dataFile('vowel_binary.Intensity'))
+        self.assertEqual(binary.len(), 4)
+        self.assertSameIntensity(text, binary)
+
+    def test_collection(self):
+        text = praat.Collection()
+        text.read(dataFile('vowel_collection.txt'))
+        binary = praat.Collection()
+        binary.read(dataFile('vowel_collection_binary.txt'))
+        self.assertEqual(len(binary), 2)
+        self.assertSameFormant(text[0], binary[0])
+        self.assertSameIntensity(text[1], binary[1])
+        # (the objects of a Collection are the same as when saved on their own)
+        formant = praat.Formant()
+        formant.read(dataFile('vowel_binary.Formant'))
+        self.assertSameFormant(formant, binary[0])
+
+
+if __name__ == '__main__':
+    unittest.main()